@@ -0,0 +1,44 @@
+"""Product created_at and popularity, listing sort indexes
+
+Revision ID: 2f8d5b7c0e94
+Revises: 6c2e9a4f1b37
+Create Date: 2026-10-20 00:14:27.905113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2f8d5b7c0e94'
+down_revision: Union[str, None] = '6c2e9a4f1b37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('product', sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False))
+    op.add_column('product', sa.Column('popularity', sa.Float(), server_default='0', nullable=False))
+    op.create_index('ix_product_category_slug_id', 'product', ['category_slug', 'id'], unique=False)
+    op.create_index('ix_product_category_slug_price_id', 'product', ['category_slug', 'price', 'id'], unique=False)
+    op.create_index('ix_product_category_slug_created_at_id', 'product', ['category_slug', 'created_at', 'id'], unique=False)
+    op.create_index('ix_product_category_slug_popularity_id', 'product', ['category_slug', 'popularity', 'id'], unique=False)
+    op.create_index('ix_product_price_id', 'product', ['price', 'id'], unique=False)
+    op.create_index('ix_product_created_at_id', 'product', ['created_at', 'id'], unique=False)
+    op.create_index('ix_product_popularity_id', 'product', ['popularity', 'id'], unique=False)
+    # Scores for past sales: python -m scripts.rebuild_rollups --popularity
+
+
+def downgrade() -> None:
+    op.drop_index('ix_product_popularity_id', table_name='product')
+    op.drop_index('ix_product_created_at_id', table_name='product')
+    op.drop_index('ix_product_price_id', table_name='product')
+    op.drop_index('ix_product_category_slug_popularity_id', table_name='product')
+    op.drop_index('ix_product_category_slug_created_at_id', table_name='product')
+    op.drop_index('ix_product_category_slug_price_id', table_name='product')
+    op.drop_index('ix_product_category_slug_id', table_name='product')
+    op.drop_column('product', 'popularity')
+    op.drop_column('product', 'created_at')
@@ -0,0 +1,41 @@
+"""Guest carts: one cart line per variant, cart user index
+
+Revision ID: 6c2e9a4f1b37
+Revises: f4a7d1c3e825
+Create Date: 2026-10-19 23:05:41.318604
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6c2e9a4f1b37'
+down_revision: Union[str, None] = 'f4a7d1c3e825'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Fold duplicate lines into the first one so the unique constraint can be created
+    op.execute(
+        "UPDATE cartitem SET quantity = "
+        "(SELECT SUM(c.quantity) FROM cartitem c WHERE c.cart_id = cartitem.cart_id AND c.variant_id = cartitem.variant_id) "
+        "WHERE id IN (SELECT MIN(id) FROM cartitem GROUP BY cart_id, variant_id HAVING COUNT(*) > 1)"
+    )
+    op.execute(
+        "DELETE FROM cartitem WHERE id NOT IN "
+        "(SELECT MIN(id) FROM cartitem GROUP BY cart_id, variant_id)"
+    )
+    with op.batch_alter_table('cartitem') as batch_op:
+        batch_op.create_unique_constraint('uq_cartitem_cart_id_variant_id', ['cart_id', 'variant_id'])
+    op.create_index(op.f('ix_cart_user_id'), 'cart', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_cart_user_id'), table_name='cart')
+    with op.batch_alter_table('cartitem') as batch_op:
+        batch_op.drop_constraint('uq_cartitem_cart_id_variant_id', type_='unique')
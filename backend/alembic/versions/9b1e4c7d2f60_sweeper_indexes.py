@@ -0,0 +1,37 @@
+"""Sweeper indexes and cart updated_at
+
+Revision ID: 9b1e4c7d2f60
+Revises: 3d6f8a2b91c4
+Create Date: 2026-10-19 19:47:52.114093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b1e4c7d2f60'
+down_revision: Union[str, None] = '3d6f8a2b91c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('cart', sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False))
+    op.create_index(op.f('ix_cart_updated_at'), 'cart', ['updated_at'], unique=False)
+    op.create_index('ix_order_status_created_at', 'order', ['status', 'created_at'], unique=False)
+    op.create_index(op.f('ix_emailverificationtoken_expires_at'), 'emailverificationtoken', ['expires_at'], unique=False)
+    op.create_index(op.f('ix_refreshtoken_expires_at'), 'refreshtoken', ['expires_at'], unique=False)
+    op.create_index(op.f('ix_revokedtoken_expires_at'), 'revokedtoken', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_revokedtoken_expires_at'), table_name='revokedtoken')
+    op.drop_index(op.f('ix_refreshtoken_expires_at'), table_name='refreshtoken')
+    op.drop_index(op.f('ix_emailverificationtoken_expires_at'), table_name='emailverificationtoken')
+    op.drop_index('ix_order_status_created_at', table_name='order')
+    op.drop_index(op.f('ix_cart_updated_at'), table_name='cart')
+    op.drop_column('cart', 'updated_at')
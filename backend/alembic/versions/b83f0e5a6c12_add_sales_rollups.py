@@ -0,0 +1,57 @@
+"""Add sales rollups and order paid_at
+
+Revision ID: b83f0e5a6c12
+Revises: 9b1e4c7d2f60
+Create Date: 2026-10-19 20:31:06.772840
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b83f0e5a6c12'
+down_revision: Union[str, None] = '9b1e4c7d2f60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('order', sa.Column('paid_at', sa.DateTime(timezone=True), nullable=True))
+    # Best available approximation for orders paid before paid_at existed
+    op.execute("UPDATE \"order\" SET paid_at = created_at WHERE status = 'paid'")
+    op.create_table('salesrollup',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('period', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('orders_created', sa.Integer(), nullable=False),
+    sa.Column('orders_paid', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.Column('units', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('period', 'bucket_start')
+    )
+    op.create_table('productsalesrollup',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('period', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('category_slug', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('units', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('period', 'bucket_start', 'product_id')
+    )
+    op.create_index(op.f('ix_productsalesrollup_product_id'), 'productsalesrollup', ['product_id'], unique=False)
+    op.create_index('ix_productsalesrollup_period_category_slug_bucket_start', 'productsalesrollup', ['period', 'category_slug', 'bucket_start'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_productsalesrollup_period_category_slug_bucket_start', table_name='productsalesrollup')
+    op.drop_index(op.f('ix_productsalesrollup_product_id'), table_name='productsalesrollup')
+    op.drop_table('productsalesrollup')
+    op.drop_table('salesrollup')
+    op.drop_column('order', 'paid_at')
@@ -0,0 +1,51 @@
+"""Wishlist constraints
+
+Revision ID: e7b2c94f0d18
+Revises: 5a9e03d1c7f4
+Create Date: 2026-10-19 18:12:30.552907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7b2c94f0d18'
+down_revision: Union[str, None] = '5a9e03d1c7f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Fold each user's extra wishlists into their first one; duplicate items are dropped below
+    op.execute(
+        "UPDATE wishlistitem SET wishlist_id = "
+        "(SELECT MIN(w.id) FROM wishlist w WHERE w.user_id = "
+        "(SELECT o.user_id FROM wishlist o WHERE o.id = wishlistitem.wishlist_id)) "
+        "WHERE wishlist_id NOT IN (SELECT MIN(id) FROM wishlist GROUP BY user_id)"
+    )
+    op.execute("DELETE FROM wishlist WHERE id NOT IN (SELECT MIN(id) FROM wishlist GROUP BY user_id)")
+    # Drop duplicate rows so the unique constraints can be created
+    op.execute(
+        "DELETE FROM wishlistitem WHERE id NOT IN "
+        "(SELECT MIN(id) FROM wishlistitem GROUP BY wishlist_id, product_id)"
+    )
+    op.execute("DELETE FROM wishlistitem WHERE product_id NOT IN (SELECT id FROM product)")
+    with op.batch_alter_table('wishlistitem') as batch_op:
+        batch_op.create_unique_constraint('uq_wishlistitem_wishlist_id_product_id', ['wishlist_id', 'product_id'])
+        batch_op.create_foreign_key('fk_wishlistitem_product_id_product', 'product', ['product_id'], ['id'])
+        batch_op.create_index(batch_op.f('ix_wishlistitem_product_id'), ['product_id'], unique=False)
+    with op.batch_alter_table('wishlist') as batch_op:
+        batch_op.create_unique_constraint('uq_wishlist_user_id', ['user_id'])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('wishlist') as batch_op:
+        batch_op.drop_constraint('uq_wishlist_user_id', type_='unique')
+    with op.batch_alter_table('wishlistitem') as batch_op:
+        batch_op.drop_index(batch_op.f('ix_wishlistitem_product_id'))
+        batch_op.drop_constraint('fk_wishlistitem_product_id_product', type_='foreignkey')
+        batch_op.drop_constraint('uq_wishlistitem_wishlist_id_product_id', type_='unique')
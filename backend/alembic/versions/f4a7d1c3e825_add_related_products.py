@@ -0,0 +1,36 @@
+"""Add related products
+
+Revision ID: f4a7d1c3e825
+Revises: b83f0e5a6c12
+Create Date: 2026-10-19 21:15:40.390217
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4a7d1c3e825'
+down_revision: Union[str, None] = 'b83f0e5a6c12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('relatedproduct',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('related_product_id', sa.Integer(), nullable=False),
+    sa.Column('rank', sa.Integer(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('support', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('product_id', 'rank')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('relatedproduct')
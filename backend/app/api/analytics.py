@@ -0,0 +1,128 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, Query
+from sqlmodel import Session, select, func, col
+from app.db import get_session
+from app.models import (
+    User, Product, SalesRollup, ProductSalesRollup,
+    SalesBucket, SalesReport, ProductSales, CategorySales,
+)
+from app.deps import get_current_superuser
+from app.services.analytics import bucket_start
+
+router = APIRouter()
+
+# Default window when no start is given
+DEFAULT_RANGE = {"hour": timedelta(hours=48), "day": timedelta(days=30)}
+
+def _rate(paid: int, created: int) -> Optional[float]:
+    return round(paid / created, 4) if created else None
+
+def _resolve_range(period: str, start: Optional[datetime], end: Optional[datetime]):
+    end = end or datetime.now(timezone.utc)
+    start = start or end - DEFAULT_RANGE[period]
+    # Naive timestamps are taken as UTC
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    return bucket_start(start, period), end
+
+@router.get("/sales", response_model=SalesReport)
+def get_sales(
+    period: Literal["hour", "day"] = "day",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: User = Depends(get_current_superuser),
+    session: Session = Depends(get_session)
+):
+    """Orders, revenue, units and pending-to-paid conversion per bucket."""
+    start, end = _resolve_range(period, start, end)
+    rows = session.exec(
+        select(SalesRollup)
+        .where(SalesRollup.period == period)
+        .where(SalesRollup.bucket_start >= start, SalesRollup.bucket_start < end)
+        .order_by(SalesRollup.bucket_start)
+    ).all()
+
+    buckets = [
+        SalesBucket(
+            bucket_start=row.bucket_start,
+            orders_created=row.orders_created,
+            orders_paid=row.orders_paid,
+            revenue=round(row.revenue, 2),
+            units=row.units,
+            conversion_rate=_rate(row.orders_paid, row.orders_created),
+        )
+        for row in rows
+    ]
+    orders_created = sum(b.orders_created for b in buckets)
+    orders_paid = sum(b.orders_paid for b in buckets)
+    return SalesReport(
+        period=period,
+        start=start,
+        end=end,
+        orders_created=orders_created,
+        orders_paid=orders_paid,
+        revenue=round(sum(b.revenue for b in buckets), 2),
+        units=sum(b.units for b in buckets),
+        conversion_rate=_rate(orders_paid, orders_created),
+        buckets=buckets,
+    )
+
+@router.get("/products", response_model=List[ProductSales])
+def get_top_products(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    category: Optional[str] = None,
+    order_by: Literal["revenue", "units"] = "revenue",
+    limit: int = Query(default=20, le=100),
+    current_user: User = Depends(get_current_superuser),
+    session: Session = Depends(get_session)
+):
+    """Best selling products over whole days, from the daily rollups."""
+    start, end = _resolve_range("day", start, end)
+    units = func.sum(ProductSalesRollup.units).label("units")
+    revenue = func.sum(ProductSalesRollup.revenue).label("revenue")
+    query = (
+        select(ProductSalesRollup.product_id, ProductSalesRollup.category_slug, units, revenue)
+        .where(ProductSalesRollup.period == "day")
+        .where(ProductSalesRollup.bucket_start >= start, ProductSalesRollup.bucket_start < end)
+        .group_by(ProductSalesRollup.product_id, ProductSalesRollup.category_slug)
+        .order_by((revenue if order_by == "revenue" else units).desc())
+        .limit(limit)
+    )
+    if category:
+        query = query.where(ProductSalesRollup.category_slug == category)
+    rows = session.exec(query).all()
+
+    titles = dict(session.exec(
+        select(Product.id, Product.title).where(col(Product.id).in_([row[0] for row in rows]))
+    ).all()) if rows else {}
+    return [
+        ProductSales(product_id=product_id, title=titles.get(product_id), category_slug=category_slug,
+                     units=units, revenue=round(revenue, 2))
+        for product_id, category_slug, units, revenue in rows
+    ]
+
+@router.get("/categories", response_model=List[CategorySales])
+def get_category_sales(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: User = Depends(get_current_superuser),
+    session: Session = Depends(get_session)
+):
+    """Units and revenue per category over whole days, from the daily rollups."""
+    start, end = _resolve_range("day", start, end)
+    revenue = func.sum(ProductSalesRollup.revenue)
+    rows = session.exec(
+        select(ProductSalesRollup.category_slug, func.sum(ProductSalesRollup.units), revenue)
+        .where(ProductSalesRollup.period == "day")
+        .where(ProductSalesRollup.bucket_start >= start, ProductSalesRollup.bucket_start < end)
+        .group_by(ProductSalesRollup.category_slug)
+        .order_by(revenue.desc())
+    ).all()
+    return [
+        CategorySales(category_slug=category_slug, units=units, revenue=round(revenue, 2))
+        for category_slug, units, revenue in rows
+    ]
@@ -1,21 +1,47 @@
 from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlmodel import Session, select
-from app.db import get_session
-from app.models import User, UserCreate, UserRead, Token
+from sqlmodel import Session, select, update
+from app.db import get_session, upsert
+from app.models import User, UserCreate, UserRead, Token, TokenRefresh, LogoutRequest, RefreshToken, RevokedToken
 from app.models.user import EmailVerificationToken
 from app.security.hashing import get_password_hash, verify_password
-from app.security.token import create_access_token
-from app.deps import get_current_user
+from app.security.token import create_access_token, create_refresh_token, hash_refresh_token
+from app.security.revocation import revocation_list
+from app.api.cart import merge_guest_cart_from_cookie
+from app.deps import get_current_user, get_token_payload, credentials_exception
+from app.services.cache import invalidate_users
 from app.services.email_service import send_verification_email
+import logging
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+def issue_tokens(session: Session, user: User, family_id: str | None = None) -> dict:
+    refresh_token, token_hash, expires_at = create_refresh_token()
+    session.add(RefreshToken(
+        user_id=user.id,
+        token_hash=token_hash,
+        family_id=family_id or uuid.uuid4().hex,
+        expires_at=expires_at
+    ))
+    session.commit()
+    access_token = create_access_token(subject=user.email)
+    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer", "user": user}
+
+def revoke_family(session: Session, family_id: str):
+    session.exec(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id)
+        .where(RefreshToken.revoked_at == None)
+        .values(revoked_at=datetime.now(timezone.utc))
+    )
+    session.commit()
 
 @router.post("/signup", response_model=Token)
-async def signup(user_in: UserCreate, session: Session = Depends(get_session)):
+async def signup(user_in: UserCreate, request: Request, response: Response, session: Session = Depends(get_session)):
     user = session.exec(select(User).where(User.email == user_in.email)).first()
     if user:
         raise HTTPException(
@@ -38,7 +64,7 @@ async def signup(user_in: UserCreate, session: Session = Depends(get_session)):
     verification_token = EmailVerificationToken(
         user_id=user.id,
         token=token_str,
-        expires_at=datetime.utcnow() + timedelta(hours=24)
+        expires_at=datetime.now(timezone.utc) + timedelta(hours=24)
     )
     session.add(verification_token)
     session.commit()
@@ -46,12 +72,12 @@ async def signup(user_in: UserCreate, session: Session = Depends(get_session)):
     # REAL: Send email via Mailtrap
     try:
         await send_verification_email(user.email, token_str)
-    except Exception as e:
-        print(f"ERROR: Failed to send verification email: {e}")
+    except Exception:
+        logger.exception("Failed to send verification email")
         # We don't fail signup if email fails, but we should log it
-    
-    access_token = create_access_token(subject=user.email)
-    return {"access_token": access_token, "token_type": "bearer", "user": user}
+
+    merge_guest_cart_from_cookie(session, request, response, user)
+    return issue_tokens(session, user)
 
 @router.post("/verify-email")
 def verify_email(token: str, session: Session = Depends(get_session)):
@@ -59,7 +85,7 @@ def verify_email(token: str, session: Session = Depends(get_session)):
         select(EmailVerificationToken)
         .where(EmailVerificationToken.token == token)
         .where(EmailVerificationToken.is_used == False)
-        .where(EmailVerificationToken.expires_at > datetime.utcnow())
+        .where(EmailVerificationToken.expires_at > datetime.now(timezone.utc))
     ).first()
     
     if not db_token:
@@ -74,19 +100,81 @@ def verify_email(token: str, session: Session = Depends(get_session)):
     session.add(user)
     session.add(db_token)
     session.commit()
+    invalidate_users([user.email])
     
     return {"status": "success", "message": "Email verified successfully"}
 
 @router.post("/login", response_model=Token)
-def login(form_data: Annotated[OAuth2PasswordRequestForm, Depends()], session: Session = Depends(get_session)):
+def login(
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
+    request: Request,
+    response: Response,
+    session: Session = Depends(get_session)
+):
     user = session.exec(select(User).where(User.email == form_data.username)).first()
     if not user or not verify_password(form_data.password, user.hashed_password):
         raise HTTPException(status_code=400, detail="Incorrect email or password")
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-    
-    access_token = create_access_token(subject=user.email)
-    return {"access_token": access_token, "token_type": "bearer", "user": user}
+
+    merge_guest_cart_from_cookie(session, request, response, user)
+    return issue_tokens(session, user)
+
+@router.post("/refresh", response_model=Token)
+def refresh(body: TokenRefresh, session: Session = Depends(get_session)):
+    """Exchanges a refresh token for a new access token and a new refresh token (rotation)."""
+    now = datetime.now(timezone.utc)
+    db_token = session.exec(
+        select(RefreshToken).where(RefreshToken.token_hash == hash_refresh_token(body.refresh_token))
+    ).first()
+    if not db_token or db_token.expires_at <= now:
+        raise credentials_exception
+    if db_token.revoked_at is not None:
+        # A rotated token was presented again: assume it leaked and end the whole session
+        revoke_family(session, db_token.family_id)
+        raise credentials_exception
+
+    # Conditional update so that only one of several concurrent refreshes wins
+    result = session.exec(
+        update(RefreshToken)
+        .where(RefreshToken.id == db_token.id)
+        .where(RefreshToken.revoked_at == None)
+        .values(revoked_at=now)
+    )
+    if result.rowcount != 1:
+        session.rollback()
+        raise credentials_exception
+
+    user = session.get(User, db_token.user_id)
+    if not user or not user.is_active:
+        session.commit()
+        raise credentials_exception
+    return issue_tokens(session, user, db_token.family_id)
+
+@router.post("/logout")
+def logout(
+    body: LogoutRequest | None = None,
+    payload: dict = Depends(get_token_payload),
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    jti = payload.get("jti")
+    if jti is not None:
+        expires_at = datetime.fromtimestamp(payload["exp"], timezone.utc)
+        upsert(session, RevokedToken, [{"jti": jti, "expires_at": expires_at}], ["jti"])
+        session.commit()
+        revocation_list.add(jti, expires_at)
+
+    if body and body.refresh_token:
+        db_token = session.exec(
+            select(RefreshToken)
+            .where(RefreshToken.token_hash == hash_refresh_token(body.refresh_token))
+            .where(RefreshToken.user_id == current_user.id)
+        ).first()
+        if db_token:
+            revoke_family(session, db_token.family_id)
+
+    return {"status": "success", "message": "Logged out"}
 
 @router.get("/me", response_model=UserRead)
 def read_users_me(current_user: User = Depends(get_current_user)):
@@ -1,17 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
+from datetime import datetime, timezone
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlmodel import Session, select, update, delete, literal, func
 from sqlalchemy.orm import selectinload
-from app.db import get_session
+from app.config import settings
+from app.db import get_session, dialect_insert, upsert
 from app.models import Cart, CartItem, CartRead, CartItemCreate, User, CartItemRead
 from app.models.product import ProductVariant, Product
-from app.deps import get_current_user
+from app.deps import get_optional_user
+from app.security.token import sign_guest_cart, read_guest_cart
+from app.responses import fast_response
 
 router = APIRouter()
 
-def get_cart_with_items(session: Session, user_id: int):
+def _load_cart(session: Session, *conditions):
     statement = (
         select(Cart)
-        .where(Cart.user_id == user_id)
+        .where(*conditions)
         .options(
             selectinload(Cart.items)
             .selectinload(CartItem.variant)
@@ -20,19 +25,34 @@ def get_cart_with_items(session: Session, user_id: int):
     )
     return session.exec(statement).first()
 
-@router.get("/", response_model=CartRead)
-def get_cart(
-    current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session)
-):
-    cart = get_cart_with_items(session, current_user.id)
-    if not cart:
-        cart = Cart(user_id=current_user.id)
-        session.add(cart)
-        session.commit()
-        session.refresh(cart)
-        cart = get_cart_with_items(session, current_user.id)
-    
+def get_cart_with_items(session: Session, user_id: int):
+    return _load_cart(session, Cart.user_id == user_id)
+
+def get_guest_cart_id(request: Request) -> Optional[int]:
+    return read_guest_cart(request.cookies.get(settings.GUEST_CART_COOKIE))
+
+def set_guest_cookie(response: Response, cart_id: int):
+    response.set_cookie(
+        settings.GUEST_CART_COOKIE,
+        sign_guest_cart(cart_id),
+        max_age=settings.GUEST_CART_RETENTION_DAYS * 86400,
+        httponly=True,
+        samesite="lax",
+        secure=settings.GUEST_CART_COOKIE_SECURE,
+    )
+
+def find_cart(session: Session, current_user: Optional[User], request: Request):
+    """The user's cart, or for anonymous requests the guest cart named by the cookie."""
+    if current_user is not None:
+        return get_cart_with_items(session, current_user.id)
+    guest_cart_id = get_guest_cart_id(request)
+    if guest_cart_id is None:
+        return None
+    return _load_cart(session, Cart.id == guest_cart_id, Cart.user_id == None)
+
+def cart_read(cart: Optional[Cart]) -> CartRead:
+    if cart is None:
+        return CartRead(id=None, items=[])
     subtotal = 0.0
     count = 0
     for item in cart.items:
@@ -41,55 +61,134 @@ def get_cart(
             adjustment = item.variant.price_adjustment
             subtotal += (base_price + adjustment) * item.quantity
         count += item.quantity
-        
     return CartRead(id=cart.id, items=cart.items, count=count, subtotal=subtotal)
 
+def merge_guest_cart(session: Session, guest_cart_id: int, user_id: int) -> bool:
+    """
+    Moves a guest cart's items into the user's cart, adding up quantities of
+    variants in both; such lines take the guest line's selected_options, the
+    more recent choice, unless it has none. Returns False if the guest cart no
+    longer exists. Commits.
+    """
+    now = datetime.now(timezone.utc)
+    # Claiming the cart first makes concurrent logins with the same cookie merge it once
+    claimed = session.exec(
+        update(Cart)
+        .where(Cart.id == guest_cart_id)
+        .where(Cart.user_id == None)
+        .values(user_id=user_id, updated_at=now)
+    )
+    if claimed.rowcount != 1:
+        session.rollback()
+        return False
+    target_id = session.exec(
+        select(Cart.id).where(Cart.user_id == user_id).where(Cart.id != guest_cart_id).order_by(Cart.id)
+    ).first()
+    if target_id is None:
+        # No cart of their own: the guest cart simply becomes theirs
+        session.commit()
+        return True
+
+    insert = dialect_insert(session)
+    statement = insert(CartItem).from_select(
+        ["cart_id", "variant_id", "quantity", "selected_options"],
+        select(literal(target_id), CartItem.variant_id, CartItem.quantity, CartItem.selected_options)
+        .where(CartItem.cart_id == guest_cart_id),
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=["cart_id", "variant_id"],
+        set_={
+            "quantity": CartItem.__table__.c.quantity + statement.excluded.quantity,
+            "selected_options": func.coalesce(statement.excluded.selected_options, CartItem.__table__.c.selected_options),
+        },
+    )
+    session.execute(statement)
+    session.exec(delete(CartItem).where(CartItem.cart_id == guest_cart_id))
+    session.exec(delete(Cart).where(Cart.id == guest_cart_id))
+    session.exec(update(Cart).where(Cart.id == target_id).values(updated_at=now))
+    session.commit()
+    return True
+
+def merge_guest_cart_from_cookie(session: Session, request: Request, response: Response, user: User):
+    """Called on login/signup: folds the anonymous cart into the user's and drops the cookie."""
+    guest_cart_id = get_guest_cart_id(request)
+    if guest_cart_id is None:
+        return
+    merge_guest_cart(session, guest_cart_id, user.id)
+    response.delete_cookie(settings.GUEST_CART_COOKIE, httponly=True, samesite="lax", secure=settings.GUEST_CART_COOKIE_SECURE)
+
+@router.get("/", response_model=CartRead)
+def get_cart(
+    request: Request,
+    current_user: Optional[User] = Depends(get_optional_user),
+    session: Session = Depends(get_session)
+):
+    cart = find_cart(session, current_user, request)
+    if not cart and current_user is not None:
+        cart = Cart(user_id=current_user.id)
+        session.add(cart)
+        session.commit()
+        session.refresh(cart)
+        cart = get_cart_with_items(session, current_user.id)
+    # Guests get an empty cart without a row until they add something
+    return fast_response(cart_read(cart))
+
 @router.post("/items", response_model=CartRead)
 def add_to_cart(
     item_in: CartItemCreate,
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    response: Response,
+    current_user: Optional[User] = Depends(get_optional_user),
     session: Session = Depends(get_session)
 ):
-    cart = get_cart_with_items(session, current_user.id)
+    cart = find_cart(session, current_user, request)
+    new_guest_cart = False
     if not cart:
-        cart = Cart(user_id=current_user.id)
+        cart = Cart(user_id=current_user.id if current_user else None)
         session.add(cart)
         session.commit()
         session.refresh(cart)
-        cart = get_cart_with_items(session, current_user.id)
-        
-    # Check if this specific variant exists in cart
-    existing_item = next((i for i in cart.items if i.variant_id == item_in.variant_id), None)
-    
-    if existing_item:
-        existing_item.quantity += item_in.quantity
-        session.add(existing_item)
-    else:
-        new_item = CartItem(
-            cart_id=cart.id,
-            variant_id=item_in.variant_id,
-            quantity=item_in.quantity,
-            selected_options=item_in.selected_options
-        )
-        session.add(new_item)
-        
+        new_guest_cart = current_user is None
+
+    # One line per variant: adding it again adds to the quantity
+    upsert(
+        session, CartItem,
+        [{"cart_id": cart.id, "variant_id": item_in.variant_id, "quantity": item_in.quantity, "selected_options": item_in.selected_options}],
+        ["cart_id", "variant_id"], increment_columns=["quantity"],
+    )
+    cart.updated_at = datetime.now(timezone.utc)
+    session.add(cart)
     session.commit()
-    return get_cart(current_user, session)
+
+    session.expire_all()
+    result = fast_response(cart_read(_load_cart(session, Cart.id == cart.id)))
+    if new_guest_cart:
+        # fast_response may be a Response of its own, which FastAPI sends as is
+        set_guest_cookie(result if isinstance(result, Response) else response, cart.id)
+    return result
 
 @router.delete("/items/{item_id}", response_model=CartRead)
 def remove_from_cart(
     item_id: int,
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    current_user: Optional[User] = Depends(get_optional_user),
     session: Session = Depends(get_session)
 ):
     item = session.get(CartItem, item_id)
     if not item:
         raise HTTPException(status_code=404, detail="Item not found")
-        
+
     cart = session.get(Cart, item.cart_id)
-    if not cart or cart.user_id != current_user.id:
+    if current_user is not None:
+        allowed = cart is not None and cart.user_id == current_user.id
+    else:
+        allowed = cart is not None and cart.user_id is None and cart.id == get_guest_cart_id(request)
+    if not allowed:
          raise HTTPException(status_code=403, detail="Not authorized")
-        
+
     session.delete(item)
+    cart.updated_at = datetime.now(timezone.utc)
+    session.add(cart)
     session.commit()
-    return get_cart(current_user, session)
\ No newline at end of file
+    session.expire_all()
+    return fast_response(cart_read(_load_cart(session, Cart.id == cart.id)))
@@ -0,0 +1,75 @@
+import csv
+from dataclasses import asdict
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import Session, SQLModel
+from app.db import get_session
+from app.models import User
+from app.deps import get_current_superuser
+from app.services.inventory import (
+    DEFAULT_BATCH_SIZE, InvalidHeader, InventoryReport, RecordParser, apply_batch, iter_lines, parse_update,
+)
+
+router = APIRouter()
+
+CONTENT_TYPES = {
+    "application/x-ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "text/csv": "csv",
+}
+
+class InventoryRowError(SQLModel):
+    line: int
+    sku: Optional[str]
+    error: str
+
+class InventoryUpdateReport(SQLModel):
+    received: int
+    updated: int
+    failed: int
+    batches: int
+    errors: List[InventoryRowError]
+
+@router.post("/variants", response_model=InventoryUpdateReport)
+async def bulk_update_variants(
+    request: Request,
+    format: Optional[Literal["ndjson", "csv"]] = Query(None, description="Defaults to the Content-Type"),
+    current_user: User = Depends(get_current_superuser),
+    session: Session = Depends(get_session)
+):
+    """
+    Sets `stock_quantity` and/or `price_adjustment` of variants by SKU, from an
+    NDJSON or CSV body of any size. Rows that fail are listed in `errors`.
+    """
+    format = format or CONTENT_TYPES.get(request.headers.get("content-type", "").split(";")[0].strip())
+    if format is None:
+        raise HTTPException(status_code=415, detail="Send NDJSON (application/x-ndjson) or CSV (text/csv)")
+
+    parser = RecordParser(format)
+    report = InventoryReport()
+    batch = []
+    async for line, text in iter_lines(request.stream()):
+        try:
+            record = parser.parse(text)
+        except InvalidHeader as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except (ValueError, csv.Error) as e:
+            report.received += 1
+            report.fail(line, None, f"unreadable row: {e}")
+            continue
+        if record is None:
+            continue
+        report.received += 1
+        try:
+            batch.append(parse_update(line, record))
+        except (ValueError, TypeError) as e:
+            report.fail(line, record.get("sku"), str(e))
+            continue
+        if len(batch) >= DEFAULT_BATCH_SIZE:
+            await run_in_threadpool(apply_batch, session, batch, report)
+            batch = []
+    if batch:
+        await run_in_threadpool(apply_batch, session, batch, report)
+    report.errors.sort(key=lambda error: error["line"])
+    return InventoryUpdateReport.model_validate(asdict(report))
@@ -1,13 +1,23 @@
-from typing import Annotated, List
+import asyncio
+from typing import Annotated, List, Literal, Optional
+from datetime import datetime, timezone
 from fastapi import APIRouter, Depends, HTTPException, Request, BackgroundTasks
-from sqlmodel import Session, select
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session, select, update, col
 from sqlalchemy.orm import selectinload
-from app.db import get_session
+from app.config import settings
+from app.db import engine, get_session
 from app.models import Cart, Order, OrderItem, User
-from app.deps import get_current_user
+from app.deps import get_current_user, get_current_superuser, get_stream_user
 from app.services.razorpay_service import create_razorpay_order, verify_payment_signature
-from app.services.email_service import send_order_confirmation
+from app.services.email_service import send_order_confirmation, queue_email
+from app.models.order import PAID_STATUSES
+from app.services.analytics import record_order_created, record_order_paid, record_order_unpaid
 from app.api.cart import get_cart_with_items
+from app.services.order_export import MEDIA_TYPES, encode, iter_order_rows
+from app.services.order_events import ORDER_TRANSITIONS, PAYABLE_STATUSES, order_events, publish_order_status
+from app.responses import dump_json, fast_response
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -17,6 +27,9 @@ class PaymentVerify(BaseModel):
     razorpay_payment_id: str
     razorpay_signature: str
 
+class OrderStatusUpdate(BaseModel):
+    status: str
+
 @router.post("/create-order")
 def create_order(
     current_user: User = Depends(get_current_user),
@@ -31,8 +44,8 @@ def create_order(
     # 2. Calculate Total
     total_amount = 0.0
     for item in cart.items:
-        if item.product:
-            total_amount += item.product.price * item.quantity
+        if item.variant and item.variant.product:
+            total_amount += (item.variant.product.price + item.variant.price_adjustment) * item.quantity
             
     # Razorpay expects amount in paise (integers)
     # Assuming price is in INR or we convert it. DummyJSON is USD, 
@@ -51,16 +64,17 @@ def create_order(
     
     # Add items to order
     for item in cart.items:
-        if item.product:
+        if item.variant and item.variant.product:
             order_item = OrderItem(
                 order_id=db_order.id,
-                product_id=item.product_id,
+                product_id=item.variant.product_id,
                 quantity=item.quantity,
-                price_at_purchase=item.product.price
+                price_at_purchase=item.variant.product.price + item.variant.price_adjustment
             )
             session.add(order_item)
     
     session.commit()
+    record_order_created(db_order.created_at)
     
     # 4. Create Razorpay Order
     try:
@@ -101,26 +115,43 @@ async def verify_payment(
         raise HTTPException(status_code=400, detail="Invalid payment signature")
         
     # 2. Update Order Status
-    statement = select(Order).where(Order.razorpay_order_id == data.razorpay_order_id)
+    statement = (
+        select(Order)
+        .where(Order.razorpay_order_id == data.razorpay_order_id)
+        .where(Order.user_id == current_user.id)
+    )
     order = session.exec(statement).first()
     
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
         
-    order.status = "paid"
-    order.razorpay_payment_id = data.razorpay_payment_id
-    session.add(order)
+    previous_status = order.status
+    # Conditional update: a repeated verify must not count the order twice in the rollups,
+    # and a replayed one must not revive a cancelled order
+    paid_at = datetime.now(timezone.utc)
+    result = session.exec(
+        update(Order)
+        .where(Order.id == order.id)
+        .where(col(Order.status).in_(PAYABLE_STATUSES))
+        .values(status="paid", razorpay_payment_id=data.razorpay_payment_id, paid_at=paid_at)
+    )
+    newly_paid = result.rowcount == 1
     
-    # 3. Clear Cart
-    cart_statement = select(Cart).where(Cart.user_id == current_user.id)
-    cart = session.exec(cart_statement).first()
-    if cart:
-        session.delete(cart)
+    # 3. Clear Cart, only for the verify that paid the order: the user may have filled a new one since
+    if newly_paid:
+        cart_statement = select(Cart).where(Cart.user_id == current_user.id)
+        cart = session.exec(cart_statement).first()
+        if cart:
+            session.delete(cart)
         
     session.commit()
+    if newly_paid:
+        record_order_paid(session, order.id, order.total_amount, paid_at)
+        publish_order_status(order.id, order.user_id, "paid", previous_status)
 
-    # 4. Send Confirmation Email (Background)
-    background_tasks.add_task(send_order_confirmation, current_user.email, order.id, order.total_amount)
+    # 4. Send Confirmation Email (Background), once
+    if newly_paid:
+        queue_email(background_tasks, send_order_confirmation, current_user.email, order.id, order.total_amount)
     
     return {"status": "success", "order_id": order.id}
 
@@ -135,4 +166,118 @@ def get_my_orders(
         .order_by(Order.created_at.desc())
         .options(selectinload(Order.items))
     )
-    return session.exec(statement).all()
\ No newline at end of file
+    return fast_response(session.exec(statement).all())
+
+@router.patch("/orders/{order_id}/status")
+def update_order_status(
+    order_id: int,
+    data: OrderStatusUpdate,
+    current_user: User = Depends(get_current_superuser),
+    session: Session = Depends(get_session)
+):
+    order = session.get(Order, order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
+    previous_status = order.status
+    paid_at = order.paid_at
+    if data.status not in ORDER_TRANSITIONS.get(previous_status, ()):
+        raise HTTPException(status_code=409, detail=f"Cannot change order status from {previous_status} to {data.status}")
+
+    values = {"status": data.status}
+    if data.status == "paid":
+        values["paid_at"] = datetime.now(timezone.utc)
+    # Only applies if nobody changed the status since we read it
+    result = session.exec(
+        update(Order)
+        .where(Order.id == order_id)
+        .where(Order.status == previous_status)
+        .values(**values)
+    )
+    if result.rowcount != 1:
+        session.rollback()
+        raise HTTPException(status_code=409, detail="Order status was changed concurrently")
+    session.commit()
+    if data.status == "paid":
+        record_order_paid(session, order_id, order.total_amount, values["paid_at"])
+    elif previous_status in PAID_STATUSES and data.status not in PAID_STATUSES and paid_at is not None:
+        # e.g. a paid order cancelled: take it back out of the buckets it was counted in
+        record_order_unpaid(session, order_id, order.total_amount, paid_at)
+    publish_order_status(order_id, order.user_id, data.status, previous_status)
+    return {"order_id": order_id, "status": data.status, "previous": previous_status}
+
+@router.get("/orders/export")
+def export_orders(
+    start: datetime,
+    end: Optional[datetime] = None,
+    by: Literal["created", "paid"] = "created",
+    format: Literal["csv", "ndjson"] = "csv",
+    status: Optional[str] = None,
+    current_user: User = Depends(get_current_superuser)
+):
+    """
+    Streams orders (one row per item) created, or paid, in [start, end) for
+    reconciliation against payment settlements. Naive timestamps are UTC.
+    """
+    end = end or datetime.now(timezone.utc)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+
+    def chunks():
+        # Own session, open only while the export streams
+        with Session(engine) as session:
+            yield from encode(iter_order_rows(session, start, end, by=by, status=status), format)
+
+    filename = f"orders-{start:%Y%m%d}-{end:%Y%m%d}.{format}"
+    return StreamingResponse(
+        chunks(),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+def get_open_order_statuses(user_id: int) -> List[dict]:
+    # Own short-lived session: the stream must not keep a connection checked out
+    with Session(engine) as session:
+        rows = session.exec(
+            select(Order.id, Order.status)
+            .where(Order.user_id == user_id)
+            .where(col(Order.status).in_(list(ORDER_TRANSITIONS)))
+            .order_by(Order.id)
+        ).all()
+    return [{"order_id": order_id, "status": status} for order_id, status in rows]
+
+def format_event(event: str, data) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + dump_json(data) + b"\n\n"
+
+@router.get("/orders/stream")
+async def stream_order_status(request: Request, current_user: User = Depends(get_stream_user)):
+    """
+    Server-sent events for the current user's orders: a `snapshot` of the orders
+    whose status can still change, then a `status` event per transition, and
+    `resync` when events may have been missed (refetch the orders then).
+    """
+    async def events():
+        # Subscribe before taking the snapshot so no transition falls in between
+        subscription = order_events.subscribe(current_user.id)
+        try:
+            yield b"retry: 5000\n\n"
+            yield format_event("snapshot", await run_in_threadpool(get_open_order_statuses, current_user.id))
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), settings.SSE_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    # Comment line: keeps proxies from closing an idle connection
+                    yield b": ping\n\n"
+                    continue
+                yield format_event(event["type"], event)
+        finally:
+            order_events.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
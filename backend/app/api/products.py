@@ -1,10 +1,21 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, Query, HTTPException
+import base64
+import json
+import math
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Literal, Optional
+from fastapi import APIRouter, Depends, Query, HTTPException, Request
 from sqlmodel import Session, select, col, func, SQLModel
-from sqlalchemy.orm import selectinload
+from sqlalchemy import and_, case, tuple_
+from sqlalchemy.orm import aliased, selectinload
 from app.db import get_session
-from app.models import Product, Category
+from app.models import Product, Category, CategoryRead
 from app.models.product import ProductVariant, ProductImage
+from app.responses import CachedPayload, cached_response, fast_response
+from app.services.cache import category_cache, product_cache
+from app.services.facets import FacetFilters, facet_index
+from app.services.recommendations import related_index
+from app.services.suggest import Suggestion, suggest_index
 
 router = APIRouter()
 
@@ -37,48 +48,367 @@ class ProductDetail(SQLModel):
     variants: List[ProductVariantRead]
     product_images: List[ProductImageRead]
 
+# Schema for listing pages: one row per product, no nested collections
+# unless asked for with `expand`
+class ProductCard(SQLModel):
+    id: int
+    title: str
+    price: float
+    brand: Optional[str]
+    thumbnail: Optional[str]
+    category_slug: str
+    primary_image: Optional[str]
+    min_price: float
+    max_price: float
+    in_stock: bool
+    variants: Optional[List[ProductVariantRead]] = None
+    product_images: Optional[List[ProductImageRead]] = None
+
+EXPANDABLE = {"variants", "images"}
+
+class Facets(SQLModel):
+    brand: Dict[str, int]
+    size: Dict[str, int]
+    color: Dict[str, int]
+    material: Dict[str, int]
+    in_stock: int
+    price_min: Optional[float]
+    price_max: Optional[float]
+
 class ProductList(SQLModel):
-    items: List[ProductDetail]
+    items: List[ProductCard]
     total: int
     skip: int
     limit: int
+    # Pass back as `cursor` for the next page; None on the last page
+    next_cursor: Optional[str] = None
+    facets: Optional[Facets] = None
+
+# Listing sorts: column and direction. Ties, and the default order, go by id, so every
+# sort matches one of the (category_slug, column, id) / (column, id) indexes on Product
+LISTING_SORTS = {
+    "price_asc": (Product.price, False),
+    "price_desc": (Product.price, True),
+    "newest": (Product.created_at, True),
+    "popular": (Product.popularity, True),
+}
+
+def apply_filters(query, filters: FacetFilters):
+    """Adds the listing filters to a Product query. Variant facets match if any variant has the value."""
+    if filters.category:
+        query = query.where(Product.category_slug == filters.category)
+    if filters.q:
+        # A literal substring, as the facet index matches it: % and _ are not wildcards here
+        pattern = filters.q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        query = query.where(col(Product.title).ilike(f"%{pattern}%", escape="\\"))
+    if filters.brand:
+        query = query.where(col(Product.brand).in_(filters.brand))
+    # Aliased so the subqueries don't correlate with a ProductVariant join in `query`
+    variant = aliased(ProductVariant)
+    for attr in ("size", "color", "material"):
+        values = getattr(filters, attr)
+        if values:
+            query = query.where(
+                select(variant.id)
+                .where(variant.product_id == Product.id)
+                .where(getattr(variant, attr).in_(values))
+                .exists()
+            )
+    if filters.price_min is not None:
+        query = query.where(Product.price >= filters.price_min)
+    if filters.price_max is not None:
+        query = query.where(Product.price <= filters.price_max)
+    if filters.in_stock:
+        query = query.where(
+            select(variant.id)
+            .where(variant.product_id == Product.id)
+            .where(variant.stock_quantity > 0)
+            .where(variant.is_available == True)
+            .exists()
+        )
+    return query
 
-@router.get("/products", response_model=ProductList)
+def encode_cursor(sort: Optional[str], value, product_id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort, value, product_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+def decode_cursor(cursor: str, sort: Optional[str]):
+    """Returns the (sort value, id) the previous page ended on."""
+    try:
+        cursor_sort, value, product_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if cursor_sort != sort or not isinstance(product_id, int) or isinstance(product_id, bool):
+            raise ValueError
+        if sort == "newest":
+            value = datetime.fromisoformat(value)
+            if value.tzinfo is None:
+                value = value.replace(tzinfo=timezone.utc)
+        elif sort is not None:
+            # price_* and popular: bound against a numeric column
+            if not isinstance(value, (int, float)) or isinstance(value, bool) or not math.isfinite(value):
+                raise ValueError
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor for this sort")
+    return value, product_id
+
+def page_query(filters: FacetFilters, sort: Optional[str], cursor: Optional[str]):
+    """
+    Ids (and sort values) of one listing page, without the card aggregates so the
+    database can walk a sort index and stop at the limit.
+    """
+    column, descending = LISTING_SORTS[sort] if sort else (None, False)
+    keys = [column, Product.id] if column is not None else [Product.id]
+    query = apply_filters(select(*keys), filters)
+    if cursor:
+        value, product_id = decode_cursor(cursor, sort)
+        after = tuple_(*keys) if column is not None else Product.id
+        bound = tuple_(value, product_id) if column is not None else product_id
+        query = query.where(after < bound if descending else after > bound)
+    order = [key.desc() for key in keys] if descending else keys
+    return query.order_by(*order)
+
+def card_query():
+    """Product cards with variant prices and stock aggregated in the same query."""
+    primary_image = (
+        select(ProductImage.image_url)
+        .where(ProductImage.product_id == Product.id)
+        .order_by(col(ProductImage.is_primary).desc(), ProductImage.display_order)
+        .limit(1)
+        .scalar_subquery()
+    )
+    available = and_(ProductVariant.stock_quantity > 0, ProductVariant.is_available == True)
+    return (
+        select(
+            Product.id,
+            Product.title,
+            Product.price,
+            Product.brand,
+            Product.thumbnail,
+            Product.category_slug,
+            primary_image.label("primary_image"),
+            (Product.price + func.coalesce(func.min(ProductVariant.price_adjustment), 0)).label("min_price"),
+            (Product.price + func.coalesce(func.max(ProductVariant.price_adjustment), 0)).label("max_price"),
+            func.coalesce(func.max(case((available, 1), else_=0)), 0).label("in_stock"),
+        )
+        .outerjoin(ProductVariant, ProductVariant.product_id == Product.id)
+        .group_by(Product.id)
+    )
+
+def load_cards(session: Session, query, expand: set[str] = frozenset()) -> List[ProductCard]:
+    """Runs a `card_query()` and attaches the requested relations, one query per relation."""
+    cards = [ProductCard.model_validate(row._mapping) for row in session.exec(query)]
+    if not cards or not expand:
+        return cards
+
+    by_id = {card.id: card for card in cards}
+    if "variants" in expand:
+        for card in cards:
+            card.variants = []
+        for variant in session.exec(select(ProductVariant).where(col(ProductVariant.product_id).in_(by_id))):
+            by_id[variant.product_id].variants.append(ProductVariantRead.model_validate(variant))
+    if "images" in expand:
+        for card in cards:
+            card.product_images = []
+        images = session.exec(
+            select(ProductImage)
+            .where(col(ProductImage.product_id).in_(by_id))
+            .order_by(ProductImage.product_id, ProductImage.display_order)
+        )
+        for image in images:
+            by_id[image.product_id].product_images.append(ProductImageRead.model_validate(image))
+    return cards
+
+def parse_expand(expand: List[str]) -> set[str]:
+    requested = {part.strip() for value in expand for part in value.split(",") if part.strip()}
+    unknown = requested - EXPANDABLE
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Cannot expand: {', '.join(sorted(unknown))}")
+    return requested
+
+@router.get("/products", response_model=ProductList, response_model_exclude_unset=True)
 def get_products(
     session: Session = Depends(get_session),
     skip: int = 0,
     limit: int = 24,
+    sort: Optional[Literal["price_asc", "price_desc", "newest", "popular"]] = None,
+    cursor: Optional[str] = Query(default=None, description="next_cursor of the previous page; replaces skip"),
     category: Optional[str] = None,
-    q: Optional[str] = None
+    q: Optional[str] = None,
+    brand: List[str] = Query(default=[]),
+    size: List[str] = Query(default=[]),
+    color: List[str] = Query(default=[]),
+    material: List[str] = Query(default=[]),
+    price_min: Optional[float] = None,
+    price_max: Optional[float] = None,
+    in_stock: bool = False,
+    expand: List[str] = Query(default=[], description="Nested collections to include: variants, images"),
 ):
-    query = select(Product).options(
-        selectinload(Product.variants),
-        selectinload(Product.product_images)
+    filters = FacetFilters(
+        category=category, q=q, brand=brand, size=size, color=color, material=material,
+        price_min=price_min, price_max=price_max, in_stock=in_stock,
     )
-    
-    if category:
-        query = query.where(Product.category_slug == category)
-    if q:
-        query = query.where(col(Product.title).ilike(f"%{q}%"))
-        
-    count_query = select(func.count()).select_from(query.subquery())
-    total = session.exec(count_query).one()
-
-    results = session.exec(query.offset(skip).limit(limit)).all()
-    
-    return ProductList(items=results, total=total, skip=skip, limit=limit)
+    query = page_query(filters, sort, cursor).limit(limit)
+    if not cursor:
+        query = query.offset(skip)
+    page = session.exec(query).all()
+    ids = [row[-1] for row in page] if sort else list(page)
+    next_cursor = None
+    if page and len(page) == limit:
+        last = page[-1]
+        next_cursor = encode_cursor(sort, last[0], last[1]) if sort else encode_cursor(None, None, last)
+
+    # Total and facet counts come from the facet index rather than a COUNT over variants
+    facet_result = facet_index.search(session, filters)
+
+    cards = load_cards(session, card_query().where(col(Product.id).in_(ids)), parse_expand(expand)) if ids else []
+    position = {product_id: i for i, product_id in enumerate(ids)}
+    cards.sort(key=lambda card: position[card.id])
+
+    return fast_response(ProductList(
+        items=cards,
+        total=facet_result.total,
+        skip=skip,
+        limit=limit,
+        next_cursor=next_cursor,
+        facets=Facets(
+            **facet_result.counts,
+            in_stock=facet_result.in_stock,
+            price_min=facet_result.price_min,
+            price_max=facet_result.price_max,
+        ),
+    ), exclude_unset=True)
+
+@router.get("/products/suggest", response_model=List[Suggestion])
+def suggest_products(
+    q: str = "",
+    limit: int = Query(default=8, ge=1, le=20),
+    session: Session = Depends(get_session),
+):
+    """Search-as-you-type: products, brands and categories matching the prefix `q`, most popular first."""
+    return fast_response(suggest_index.suggest(session, q, limit))
+
+class ProductBatch(SQLModel):
+    items: List[ProductDetail]
+    missing: List[int]
+
+class ProductBatchRequest(SQLModel):
+    ids: List[int]
+
+MAX_BATCH_IDS = 100
+
+def get_product_details(session: Session, product_ids: List[int]) -> ProductBatch:
+    """Looks products up in the product cache first, then loads the rest in one query per relation."""
+    details: Dict[int, ProductDetail] = {}
+    misses = []
+    for product_id in product_ids:
+        payload = product_cache.get(product_id)
+        if payload is not None:
+            details[product_id] = payload.value
+        else:
+            misses.append(product_id)
+
+    if misses:
+        statement = select(Product).where(col(Product.id).in_(misses)).options(
+            selectinload(Product.variants),
+            selectinload(Product.product_images)
+        )
+        for product in session.exec(statement):
+            detail = ProductDetail.model_validate(product)
+            product_cache.set(product.id, CachedPayload(detail))
+            details[product.id] = detail
+
+    return ProductBatch(
+        items=[details[i] for i in product_ids if i in details],
+        missing=[i for i in product_ids if i not in details],
+    )
+
+def _unique_ids(ids: List[int]) -> List[int]:
+    ids = list(dict.fromkeys(ids))
+    if len(ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per request")
+    return ids
+
+@router.get("/products/batch", response_model=ProductBatch)
+def get_products_batch(
+    session: Session = Depends(get_session),
+    ids: str = Query(..., description="Comma-separated product ids, e.g. 1,2,3"),
+):
+    try:
+        product_ids = [int(i) for i in ids.split(",") if i.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    return fast_response(get_product_details(session, _unique_ids(product_ids)))
+
+@router.post("/products/batch", response_model=ProductBatch)
+def post_products_batch(batch: ProductBatchRequest, session: Session = Depends(get_session)):
+    return fast_response(get_product_details(session, _unique_ids(batch.ids)))
 
 @router.get("/products/{product_id}", response_model=ProductDetail)
-def get_product(product_id: int, session: Session = Depends(get_session)):
-    statement = select(Product).where(Product.id == product_id).options(
-        selectinload(Product.variants),
-        selectinload(Product.product_images)
+def get_product(product_id: int, request: Request, session: Session = Depends(get_session)):
+    payload = product_cache.get(product_id)
+    if payload is None:
+        statement = select(Product).where(Product.id == product_id).options(
+            selectinload(Product.variants),
+            selectinload(Product.product_images)
+        )
+        product = session.exec(statement).first()
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        # Cached already serialized (and compressed on demand), so hits skip both
+        payload = CachedPayload(ProductDetail.model_validate(product))
+        product_cache.set(product_id, payload)
+    return cached_response(request, payload)
+
+@router.get("/products/{product_id}/related", response_model=List[ProductCard], response_model_exclude_unset=True)
+def get_related_products(
+    product_id: int,
+    limit: int = Query(default=8, le=50),
+    session: Session = Depends(get_session),
+):
+    """Products most often bought together with this one (see scripts/build_related.py)."""
+    related_ids = related_index.get(session, product_id)[:limit]
+    if not related_ids:
+        return []
+    cards = {card.id: card for card in load_cards(session, card_query().where(col(Product.id).in_(related_ids)))}
+    return fast_response([cards[i] for i in related_ids if i in cards], exclude_unset=True)
+
+def load_category_counts(session: Session) -> List[CategoryRead]:
+    """Every category with its product and in-stock counts, in one grouped query."""
+    variant = aliased(ProductVariant)
+    in_stock = (
+        select(variant.id)
+        .where(variant.product_id == Product.id)
+        .where(variant.stock_quantity > 0)
+        .where(variant.is_available == True)
+        .exists()
+    )
+    rows = session.exec(
+        select(
+            Category.id,
+            Category.name,
+            Category.slug,
+            func.count(Product.id).label("product_count"),
+            func.coalesce(func.sum(case((in_stock, 1), else_=0)), 0).label("in_stock_count"),
+        )
+        .outerjoin(Product, Product.category_slug == Category.slug)
+        .group_by(Category.id, Category.name, Category.slug)
+        .order_by(Category.name)
     )
-    product = session.exec(statement).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    return product
-
-@router.get("/categories", response_model=List[Category])
-def get_categories(session: Session = Depends(get_session)):
-    return session.exec(select(Category)).all()
\ No newline at end of file
+    return [CategoryRead.model_validate(row._mapping) for row in rows]
+
+# Only one request recomputes the counts after an invalidation; the others wait for it
+_categories_lock = threading.Lock()
+
+@router.get("/categories", response_model=List[CategoryRead])
+def get_categories(request: Request, session: Session = Depends(get_session)):
+    payload = category_cache.get("all")
+    if payload is None:
+        with _categories_lock:
+            payload = category_cache.get("all")
+            if payload is None:
+                # Counts read before a concurrent stock change are served but not cached
+                generation = category_cache.generation
+                payload = CachedPayload(load_category_counts(session))
+                category_cache.set("all", payload, generation)
+    return cached_response(request, payload)
\ No newline at end of file
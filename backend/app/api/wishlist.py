@@ -0,0 +1,107 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel import Session, SQLModel, select, delete, func, col
+from app.db import get_session, upsert
+from app.models import Product, User, Wishlist, WishlistItem, WishlistStatus, WishlistMembership
+from app.deps import get_current_user
+from app.api.products import ProductCard, card_query, load_cards, MAX_BATCH_IDS
+from app.responses import fast_response
+
+router = APIRouter()
+
+class WishlistPage(SQLModel):
+    items: List[ProductCard]
+    total: int
+    skip: int
+    limit: int
+
+def get_wishlist_id(session: Session, user_id: int) -> int | None:
+    return session.exec(select(Wishlist.id).where(Wishlist.user_id == user_id)).first()
+
+def ensure_wishlist_id(session: Session, user_id: int) -> int:
+    wishlist_id = get_wishlist_id(session, user_id)
+    if wishlist_id is None:
+        upsert(session, Wishlist, [{"user_id": user_id}], ["user_id"])
+        wishlist_id = get_wishlist_id(session, user_id)
+    return wishlist_id
+
+@router.get("/", response_model=WishlistPage, response_model_exclude_unset=True)
+def get_wishlist(
+    skip: int = 0,
+    limit: int = 24,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    wishlist_id = get_wishlist_id(session, current_user.id)
+    if wishlist_id is None:
+        return WishlistPage(items=[], total=0, skip=skip, limit=limit)
+
+    total = session.exec(
+        select(func.count()).select_from(WishlistItem).where(WishlistItem.wishlist_id == wishlist_id)
+    ).one()
+    # Most recently added first; product cards come from the same query
+    query = (
+        card_query()
+        .join(WishlistItem, WishlistItem.product_id == Product.id)
+        .where(WishlistItem.wishlist_id == wishlist_id)
+        .group_by(WishlistItem.id)
+        .order_by(col(WishlistItem.id).desc())
+        .offset(skip)
+        .limit(limit)
+    )
+    return fast_response(
+        WishlistPage(items=load_cards(session, query), total=total, skip=skip, limit=limit),
+        exclude_unset=True,
+    )
+
+@router.get("/contains", response_model=WishlistMembership)
+def wishlist_contains(
+    ids: str = Query(..., description="Comma-separated product ids, e.g. the products on a page"),
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    try:
+        product_ids = list(dict.fromkeys(int(i) for i in ids.split(",") if i.strip()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    if len(product_ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per request")
+
+    statement = (
+        select(WishlistItem.product_id)
+        .join(Wishlist, Wishlist.id == WishlistItem.wishlist_id)
+        .where(Wishlist.user_id == current_user.id)
+        .where(col(WishlistItem.product_id).in_(product_ids))
+    )
+    found = set(session.exec(statement).all())
+    return WishlistMembership(product_ids=[i for i in product_ids if i in found])
+
+@router.put("/items/{product_id}", response_model=WishlistStatus)
+def add_to_wishlist(
+    product_id: int,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    if session.exec(select(Product.id).where(Product.id == product_id)).first() is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    wishlist_id = ensure_wishlist_id(session, current_user.id)
+    # Adding twice is a no-op thanks to the (wishlist_id, product_id) constraint
+    upsert(session, WishlistItem, [{"wishlist_id": wishlist_id, "product_id": product_id}], ["wishlist_id", "product_id"])
+    session.commit()
+    return WishlistStatus(product_id=product_id, in_wishlist=True)
+
+@router.delete("/items/{product_id}", response_model=WishlistStatus)
+def remove_from_wishlist(
+    product_id: int,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session)
+):
+    wishlist_id = get_wishlist_id(session, current_user.id)
+    if wishlist_id is not None:
+        session.exec(
+            delete(WishlistItem)
+            .where(WishlistItem.wishlist_id == wishlist_id)
+            .where(WishlistItem.product_id == product_id)
+        )
+        session.commit()
+    return WishlistStatus(product_id=product_id, in_wishlist=False)
@@ -10,6 +10,9 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "unsafe_default"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+    # How often each worker reloads revoked access tokens from the database
+    REVOCATION_SYNC_INTERVAL: float = 30.0
     
     RAZORPAY_KEY_ID: str = ""
     RAZORPAY_KEY_SECRET: str = ""
@@ -20,6 +23,64 @@ class Settings(BaseSettings):
     SMTP_PASSWORD: str = ""
     SMTP_FROM: str = "noreply@womanly.com"
 
+    # Serialize product, cart and order responses directly instead of re-validating them
+    FAST_JSON_RESPONSES: bool = False
+
+    # Responses smaller than this are sent uncompressed
+    COMPRESSION_MIN_SIZE: int = 1024
+
+    PRODUCT_CACHE_TTL: int = 300
+    PRODUCT_CACHE_SIZE: int = 10000
+    # Category navigation with product counts; any catalog change also clears it
+    CATEGORY_CACHE_TTL: int = 300
+    # Listing totals and facet counts per filter combination; cleared whenever the facet index is refreshed
+    FACET_CACHE_SIZE: int = 1024
+    USER_CACHE_TTL: int = 60
+    USER_CACHE_SIZE: int = 10000
+
+    # How cache invalidations reach the other workers: "postgres" (LISTEN/NOTIFY),
+    # "memory" (this process only) or "auto" (postgres when the database is)
+    INVALIDATION_BUS: str = "auto"
+
+    # Background cleanup of expired tokens, idle carts and unpaid orders
+    SWEEPER_ENABLED: bool = True
+    SWEEPER_INTERVAL: float = 3600.0
+    SWEEPER_BATCH_SIZE: int = 500
+    # Pause between batches so the sweeper never competes with requests for long
+    SWEEPER_BATCH_PAUSE: float = 0.05
+    CART_RETENTION_DAYS: int = 90
+    # Carts of anonymous shoppers, identified by a signed cookie
+    GUEST_CART_RETENTION_DAYS: int = 7
+    GUEST_CART_COOKIE: str = "guest_cart"
+    GUEST_CART_COOKIE_SECURE: bool = False
+    PENDING_ORDER_TTL_HOURS: int = 24
+
+    # Order status streams: seconds between keep-alive comments on an idle
+    # stream, and events buffered per stream before the oldest are dropped
+    SSE_HEARTBEAT_INTERVAL: float = 15.0
+    SSE_QUEUE_SIZE: int = 32
+
+    # Co-purchase recommendations: neighbours kept per product, and how often workers
+    # reload them if they missed the invalidation sent by scripts/build_related.py
+    RELATED_PRODUCTS_TOP_K: int = 10
+    RELATED_INDEX_TTL: float = 3600.0
+
+    # "json" (one object per line) or "text"; records are written by a background thread
+    # from a queue of at most LOG_QUEUE_SIZE records, beyond which they are dropped
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"
+    LOG_QUEUE_SIZE: int = 10000
+    # Statements slower than this are logged (parameters redacted), a sample of them
+    SLOW_QUERY_THRESHOLD_MS: float = 200.0
+    SLOW_QUERY_SAMPLE_RATE: float = 0.1
+
+    # Seconds between writes of buffered sales rollup and popularity increments
+    ROLLUP_FLUSH_INTERVAL: float = 2.0
+
+    # Set when running several uvicorn workers so /metrics covers all of them
+    METRICS_MULTIPROC_DIR: str | None = None
+    METRICS_FLUSH_INTERVAL: float = 5.0
+
     class Config:
         env_file = ".env"
 
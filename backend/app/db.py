@@ -1,10 +1,53 @@
+from typing import Iterable, Sequence
 from sqlmodel import SQLModel, create_engine, Session
 from app.config import settings
+from app.logging_config import track_slow_queries
 
 # Create the engine. 
 # We use settings.sync_database_url which we defined in config.py
-engine = create_engine(settings.sync_database_url, echo=True)
+engine = create_engine(
+    settings.sync_database_url,
+    # SQLite connections may be used by the threadpool thread that runs the route
+    connect_args={"check_same_thread": False} if settings.sync_database_url.startswith("sqlite") else {},
+)
+track_slow_queries(engine)
 
 def get_session():
     with Session(engine) as session:
         yield session
+
+def dialect_insert(session: Session):
+    """The dialect's `insert`, which supports ON CONFLICT (PostgreSQL and SQLite only)."""
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"upsert is not supported on {dialect}")
+    return insert
+
+def upsert(
+    session: Session,
+    model,
+    rows: list[dict],
+    index_elements: Sequence[str],
+    update_columns: Iterable[str] = (),
+    increment_columns: Iterable[str] = (),
+):
+    """
+    Batched INSERT ... ON CONFLICT for PostgreSQL and SQLite.
+    Conflicting rows get `update_columns` overwritten and `increment_columns` added to
+    (counters), or are left alone when neither is given.
+    """
+    if not rows:
+        return
+    statement = dialect_insert(session)(model)
+    set_ = {column: statement.excluded[column] for column in update_columns}
+    table = model.__table__
+    set_.update({column: table.c[column] + statement.excluded[column] for column in increment_columns})
+    if set_:
+        statement = statement.on_conflict_do_update(index_elements=list(index_elements), set_=set_)
+    else:
+        statement = statement.on_conflict_do_nothing(index_elements=list(index_elements))
+    session.execute(statement, rows)
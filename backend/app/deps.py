@@ -1,33 +1,83 @@
-from typing import Annotated
-from fastapi import Depends, HTTPException, status
+from typing import Annotated, Optional
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from sqlmodel import Session
-from app.db import get_session
+from app.db import engine, get_session
 from app.config import settings
 from app.models import User
-from app.security.token import create_access_token # not used here but related
+from app.security.revocation import revocation_list
+from app.services.cache import user_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
 
-def get_current_user(token: Annotated[str, Depends(oauth2_scheme)], session: Session = Depends(get_session)) -> User:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+def decode_access_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
     except JWTError:
         raise credentials_exception
-        
-    user = session.exec(select(User).where(User.email == email)).first()
+    if payload.get("sub") is None or payload.get("type", "access") != "access":
+        raise credentials_exception
+    # In-memory check, no database round trip
+    if revocation_list.is_revoked(payload.get("jti")):
+        raise credentials_exception
+    return payload
+
+def get_token_payload(token: Annotated[str, Depends(oauth2_scheme)]) -> dict:
+    return decode_access_token(token)
+
+def load_user(session: Session, email: str) -> User:
+    user = user_cache.get(email)
     if user is None:
+        user = session.exec(select(User).where(User.email == email)).first()
+        if user is None:
+            raise credentials_exception
+        # Cached as a detached copy: treat current_user as read-only and load the
+        # row from the session to change it (then call invalidate_users)
+        user = User.model_validate(user.model_dump())
+        user_cache.set(email, user)
+    if not user.is_active:
         raise credentials_exception
     return user
 
+def get_current_user(payload: dict = Depends(get_token_payload), session: Session = Depends(get_session)) -> User:
+    return load_user(session, payload["sub"])
+
+def get_optional_user(
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    session: Session = Depends(get_session)
+) -> Optional[User]:
+    """The current user, or None for anonymous requests. An invalid token is still rejected."""
+    if not token:
+        return None
+    return load_user(session, decode_access_token(token)["sub"])
+
+def get_stream_user(
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    access_token: Optional[str] = Query(None, description="Access token, for EventSource clients that can't send headers"),
+) -> User:
+    """
+    get_current_user for long-lived streams: the user is loaded in a session
+    that is closed right away, so an open stream holds no database connection.
+    """
+    token = token or access_token
+    if not token:
+        raise credentials_exception
+    payload = decode_access_token(token)
+    with Session(engine) as session:
+        return load_user(session, payload["sub"])
+
+def get_current_superuser(current_user: User = Depends(get_current_user)) -> User:
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough privileges")
+    return current_user
+
 # Avoid circular import issues by importing select inside function or standard top level if Safe
 from sqlmodel import select
@@ -0,0 +1,148 @@
+"""
+Structured logging.
+
+Records are written as one JSON object per line, tagged with the id of the
+request they were logged in (taken from an incoming X-Request-ID header or
+generated by RequestContextMiddleware). Loggers only put records on a bounded
+in-memory queue; a single background thread formats and writes them, so a
+slow stdout never holds up a request. When the queue is full, records are
+dropped and counted in `log_records_dropped_total`.
+
+Queries slower than SLOW_QUERY_THRESHOLD_MS are logged on the "app.sql"
+logger, a SLOW_QUERY_SAMPLE_RATE fraction of them, with their bound
+parameters redacted.
+"""
+import atexit
+import json
+import logging
+import queue
+import random
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from sqlalchemy import event
+
+from app.config import settings
+from app.metrics import LOG_RECORDS_DROPPED
+
+# Set per request by RequestContextMiddleware; copied into threadpool calls with the context
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has (and uvicorn's colored duplicate); anything else was passed with `extra=`
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id", "taskName", "color_message"}
+
+# Longest statement text kept in a slow query record
+MAX_STATEMENT_LENGTH = 2000
+
+_listener: Optional[QueueListener] = None
+_exception_formatter = logging.Formatter()
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request = getattr(record, "request_id", None)
+        if request is not None:
+            entry["request_id"] = request
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _QueueHandler(QueueHandler):
+    """Hands records to the listener thread without blocking or formatting them."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Runs in the thread that logged: capture what is only known there, and make the
+        # record safe to hand to another thread (args may be mutated, tracebacks freed)
+        record = logging.makeLogRecord(vars(record))
+        record.request_id = request_id.get()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+def setup_logging():
+    """Routes the root logger (and uvicorn's) through the queue. Safe to call more than once."""
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler()
+    if settings.LOG_FORMAT == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+    log_queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger()
+    root.handlers = [_QueueHandler(log_queue)]
+    root.setLevel(settings.LOG_LEVEL)
+    for name in ("uvicorn", "uvicorn.error"):
+        logger = logging.getLogger(name)
+        logger.handlers = []
+        logger.propagate = True
+    # RequestContextMiddleware writes the access log, with the request id
+    logging.getLogger("uvicorn.access").disabled = True
+
+
+def _redact(parameters):
+    """Keeps the shape of bound parameters (names, counts) but none of the values."""
+    if isinstance(parameters, dict):
+        return {key: "?" for key in parameters}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            # executemany
+            return {"rows": len(parameters), "first": _redact(parameters[0])}
+        return ["?"] * len(parameters)
+    return "?"
+
+
+def track_slow_queries(engine, threshold_ms: float = None, sample_rate: float = None):
+    """Logs a sample of the statements on `engine` that take longer than `threshold_ms`."""
+    threshold = (settings.SLOW_QUERY_THRESHOLD_MS if threshold_ms is None else threshold_ms) / 1000
+    sample_rate = settings.SLOW_QUERY_SAMPLE_RATE if sample_rate is None else sample_rate
+    logger = logging.getLogger("app.sql")
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before(conn, cursor, statement, parameters, context, executemany):
+        context._slow_query_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._slow_query_start
+        if elapsed < threshold or random.random() >= sample_rate:
+            return
+        logger.warning(
+            "Slow query",
+            extra={
+                "duration_ms": round(elapsed * 1000, 1),
+                "statement": statement[:MAX_STATEMENT_LENGTH],
+                "parameters": _redact(parameters),
+            },
+        )
@@ -1,9 +1,20 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.config import settings
-from app.api import products, auth, cart, payments, addresses
+from app.api import products, auth, cart, payments, addresses, wishlist, analytics, inventory
 from app.db import engine
-from sqlmodel import SQLModel
+from app.logging_config import setup_logging
+from app.middleware import CompressionMiddleware, MetricsMiddleware, RequestContextMiddleware
+from app import metrics
+from app.security.revocation import revocation_list
+from app.services.sweeper import sweeper
+from app.services.cache import bus
+from app.services.analytics import rollup_buffer
+from app.services.facets import facet_index
+from sqlmodel import Session, SQLModel
+
+setup_logging()
 
 app = FastAPI(title="Womanly API", version="1.0.0")
 
@@ -11,6 +22,19 @@ app = FastAPI(title="Womanly API", version="1.0.0")
 def on_startup():
     # Automatically create tables/columns if they don't exist
     SQLModel.metadata.create_all(engine)
+    metrics.track_pool(engine.pool)
+    metrics.REGISTRY.start_flusher()
+    revocation_list.start_syncer(engine)
+    sweeper.start(engine)
+    bus.start()
+    rollup_buffer.start_flusher(engine)
+    facet_index.start_refresher(engine)
+
+@app.on_event("shutdown")
+def on_shutdown():
+    # Write the increments of the last few seconds before the worker exits
+    with Session(engine) as session:
+        rollup_buffer.flush(session)
 
 # CORS Configuration
 origins = [
@@ -25,12 +49,19 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MIN_SIZE)
+app.add_middleware(MetricsMiddleware)
+# Outermost, so the request id is set for everything below it
+app.add_middleware(RequestContextMiddleware)
 
 app.include_router(products.router, tags=["products"])
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(cart.router, prefix="/cart", tags=["cart"])
 app.include_router(payments.router, prefix="/payments", tags=["payments"])
 app.include_router(addresses.router, prefix="/addresses", tags=["addresses"])
+app.include_router(wishlist.router, prefix="/wishlist", tags=["wishlist"])
+app.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
+app.include_router(inventory.router, prefix="/inventory", tags=["inventory"])
 
 @app.get("/")
 def read_root():
@@ -38,4 +69,8 @@ def read_root():
 
 @app.get("/health")
 def health_check():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def read_metrics():
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,364 @@
+"""
+Minimal Prometheus-compatible metrics.
+
+Every metric keeps its values in per-thread shards: a thread only ever writes
+to its own dict, so recording a sample never takes a lock. Shards are summed
+when `/metrics` is scraped.
+
+With METRICS_MULTIPROC_DIR set, each worker process also dumps a snapshot of
+its values to `<dir>/<pid>.json` every METRICS_FLUSH_INTERVAL seconds, and the
+scrape merges the snapshots of all workers.
+"""
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.config import settings
+
+LabelKey = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Child:
+    """A metric bound to a fixed set of label values."""
+
+    __slots__ = ("_metric", "_key")
+
+    def __init__(self, metric: "_Metric", key: LabelKey):
+        self._metric = metric
+        self._key = key
+
+    def inc(self, amount: float = 1.0):
+        self._metric._add(self._key, amount)
+
+    def dec(self, amount: float = 1.0):
+        self._metric._add(self._key, -amount)
+
+    def observe(self, value: float):
+        self._metric._observe(self._key, value)
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[dict] = []
+        self._shards_lock = threading.Lock()
+        self._children: Dict[LabelKey, _Child] = {}
+        REGISTRY.register(self)
+
+    def labels(self, *values, **kwargs) -> _Child:
+        if kwargs:
+            values = tuple(str(kwargs[name]) for name in self.labelnames)
+        else:
+            values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            child = self._children.setdefault(values, _Child(self, values))
+        return child
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.values
+        except AttributeError:
+            values: dict = {}
+            # Only taken once per thread, when its shard is created
+            with self._shards_lock:
+                self._shards.append(values)
+            self._local.values = values
+            return values
+
+    def _add(self, key: LabelKey, amount: float):
+        shard = self._shard()
+        shard[key] = shard.get(key, 0.0) + amount
+
+    def _observe(self, key: LabelKey, value: float):
+        raise TypeError(f"{self.type} metrics do not support observe()")
+
+    def collect(self) -> Dict[LabelKey, float]:
+        totals: Dict[LabelKey, float] = {}
+        with self._shards_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for key, value in shard.copy().items():
+                totals[key] = totals.get(key, 0.0) + value
+        return totals
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0):
+        self._add((), amount)
+
+
+class Gauge(_Metric):
+    """
+    A gauge that is moved with inc()/dec(), or computed at scrape time from
+    a function registered with set_function().
+    """
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._function: Optional[Callable[[], Dict[LabelKey, float]]] = None
+
+    def inc(self, amount: float = 1.0):
+        self._add((), amount)
+
+    def dec(self, amount: float = 1.0):
+        self._add((), -amount)
+
+    def set_function(self, function: Callable[[], float | Dict[LabelKey, float]]):
+        self._function = function
+
+    def collect(self) -> Dict[LabelKey, float]:
+        if self._function is None:
+            return super().collect()
+        value = self._function()
+        return value if isinstance(value, dict) else {(): float(value)}
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def observe(self, value: float):
+        self._observe((), value)
+
+    def _observe(self, key: LabelKey, value: float):
+        shard = self._shard()
+        slots = shard.get(key)
+        if slots is None:
+            # One slot per bucket plus +Inf, then sum
+            slots = shard[key] = [0.0] * (len(self.buckets) + 2)
+        slots[bisect_left(self.buckets, value)] += 1
+        slots[-1] += value
+
+    def collect(self) -> Dict[LabelKey, List[float]]:
+        totals: Dict[LabelKey, List[float]] = {}
+        with self._shards_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for key, slots in shard.copy().items():
+                merged = totals.setdefault(key, [0.0] * len(slots))
+                for i, value in enumerate(list(slots)):
+                    merged[i] += value
+        return totals
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._flusher: Optional[threading.Thread] = None
+
+    def register(self, metric: _Metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric {metric.name}")
+        self._metrics[metric.name] = metric
+
+    def snapshot(self) -> dict:
+        return {
+            name: {"samples": [[list(key), value] for key, value in metric.collect().items()]}
+            for name, metric in self._metrics.items()
+        }
+
+    # --- multiprocess mode ---
+
+    def _snapshot_path(self, pid: int) -> str:
+        return os.path.join(settings.METRICS_MULTIPROC_DIR, f"{pid}.json")
+
+    def flush(self):
+        """Writes this process' values where the other workers can read them."""
+        path = self._snapshot_path(os.getpid())
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+    def start_flusher(self):
+        if not settings.METRICS_MULTIPROC_DIR or self._flusher is not None:
+            return
+        os.makedirs(settings.METRICS_MULTIPROC_DIR, exist_ok=True)
+
+        def run():
+            while True:
+                try:
+                    self.flush()
+                except OSError:
+                    pass
+                time.sleep(settings.METRICS_FLUSH_INTERVAL)
+
+        self._flusher = threading.Thread(target=run, name="metrics-flusher", daemon=True)
+        self._flusher.start()
+
+    def _merged_snapshot(self) -> dict:
+        if not settings.METRICS_MULTIPROC_DIR:
+            return self.snapshot()
+
+        self.flush()
+        # Gauges describe live processes, so ignore workers that stopped flushing
+        stale_before = time.time() - 3 * settings.METRICS_FLUSH_INTERVAL
+        merged: Dict[str, Dict[LabelKey, object]] = {name: {} for name in self._metrics}
+        for filename in os.listdir(settings.METRICS_MULTIPROC_DIR):
+            if not filename.endswith(".json"):
+                continue
+            path = os.path.join(settings.METRICS_MULTIPROC_DIR, filename)
+            try:
+                is_stale = os.path.getmtime(path) < stale_before
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, entry in data.items():
+                metric = self._metrics.get(name)
+                if metric is None or (is_stale and metric.type == "gauge"):
+                    continue
+                samples = merged[name]
+                for key, value in entry["samples"]:
+                    key = tuple(key)
+                    if isinstance(value, list):
+                        current = samples.setdefault(key, [0.0] * len(value))
+                        for i, v in enumerate(value):
+                            current[i] += v
+                    else:
+                        samples[key] = samples.get(key, 0.0) + value
+        return {name: {"samples": [[list(k), v] for k, v in samples.items()]} for name, samples in merged.items()}
+
+    # --- exposition ---
+
+    def render(self) -> str:
+        snapshot = self._merged_snapshot()
+        lines: List[str] = []
+        for name, metric in self._metrics.items():
+            lines.append(f"# HELP {name} {_escape_help(metric.documentation)}")
+            lines.append(f"# TYPE {name} {metric.type}")
+            for key, value in snapshot[name]["samples"]:
+                labels = list(zip(metric.labelnames, key))
+                if isinstance(metric, Histogram):
+                    cumulative = 0.0
+                    for bound, count in zip(metric.buckets + (math.inf,), value):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(labels + [('le', _format_value(bound))])} {_format_value(cumulative)}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value[-1])}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {_format_value(cumulative)}")
+                else:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        lines.extend(_cache_hit_ratios(snapshot))
+        return "\n".join(lines) + "\n"
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for name, value in labels:
+        value = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{name}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return f"{value:.1f}"
+    return repr(float(value))
+
+
+def _cache_hit_ratios(snapshot: dict) -> List[str]:
+    totals: Dict[str, List[float]] = {}
+    for (cache, result), value in ((tuple(k), v) for k, v in snapshot["cache_requests_total"]["samples"]):
+        hits_misses = totals.setdefault(cache, [0.0, 0.0])
+        hits_misses[0 if result == "hit" else 1] += value
+    lines = [
+        "# HELP cache_hit_ratio Fraction of cache lookups served from the cache.",
+        "# TYPE cache_hit_ratio gauge",
+    ]
+    for cache, (hits, misses) in sorted(totals.items()):
+        if hits + misses:
+            lines.append(f"cache_hit_ratio{_format_labels([('cache', cache)])} {_format_value(hits / (hits + misses))}")
+    return lines
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests handled.", ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ["method", "route"]
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled."
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections", "Database connections in the pool by state.", ["state"]
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Cache lookups by cache and result (hit/miss).", ["cache", "result"]
+)
+PAYMENT_GATEWAY_DURATION = Histogram(
+    "payment_gateway_duration_seconds", "Latency of payment gateway calls.", ["operation"]
+)
+PAYMENT_GATEWAY_ERRORS = Counter(
+    "payment_gateway_errors_total", "Failed payment gateway calls.", ["operation"]
+)
+EMAIL_QUEUE_DEPTH = Gauge(
+    "email_queue_depth", "Emails queued for background delivery and not yet sent."
+)
+EMAILS_SENT = Counter(
+    "emails_sent_total", "Emails handed to the SMTP server by result.", ["result"]
+)
+ROWS_SWEPT = Counter(
+    "sweeper_rows_total", "Rows deleted or archived by the maintenance sweeper.", ["task", "action"]
+)
+SWEEP_DURATION = Histogram(
+    "sweeper_run_duration_seconds", "Duration of a sweeper task run.", ["task"]
+)
+SSE_CONNECTIONS = Gauge(
+    "sse_connections", "Open order status streams."
+)
+SSE_EVENTS_DROPPED = Counter(
+    "sse_events_dropped_total", "Order status events dropped because a stream's queue was full."
+)
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped_total", "Log records dropped because the log queue was full."
+)
+
+
+def track_pool(pool):
+    """Reports the state of a SQLAlchemy connection pool on every scrape."""
+
+    def collect() -> Dict[LabelKey, float]:
+        stats = {}
+        for state, attr in (("size", "size"), ("checked_out", "checkedout"), ("overflow", "overflow"), ("idle", "checkedin")):
+            getter = getattr(pool, attr, None)
+            if getter is not None:
+                stats[(state,)] = float(getter())
+        return stats
+
+    DB_POOL_CONNECTIONS.set_function(collect)
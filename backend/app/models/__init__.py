@@ -1,6 +1,8 @@
-from .category import Category
+from .category import Category, CategoryRead
 from .product import Product, ProductVariant, ProductImage
-from .user import User, UserCreate, UserRead, Token, Address, AddressRead, EmailVerificationToken
+from .user import User, UserCreate, UserRead, Token, Address, AddressRead, EmailVerificationToken, RefreshToken, RevokedToken, TokenRefresh, LogoutRequest
 from .cart import Cart, CartItem, CartItemRead, CartRead, CartItemCreate
-from .wishlist import Wishlist, WishlistItem
+from .wishlist import Wishlist, WishlistItem, WishlistStatus, WishlistMembership
 from .order import Order, OrderItem
+from .analytics import SalesRollup, ProductSalesRollup, SalesBucket, SalesReport, ProductSales, CategorySales
+from .recommendation import RelatedProduct
@@ -0,0 +1,64 @@
+from typing import List, Optional
+from datetime import datetime
+from sqlmodel import SQLModel, Field, UniqueConstraint, Index
+
+# Rollups are keyed by period ("hour" or "day") and the UTC start of the bucket.
+# They are incremented as orders are created and paid (app.services.analytics),
+# so dashboards never aggregate Order/OrderItem directly.
+
+class SalesRollup(SQLModel, table=True):
+    __table_args__ = (UniqueConstraint("period", "bucket_start"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    period: str
+    bucket_start: datetime
+    orders_created: int = 0
+    orders_paid: int = 0
+    revenue: float = 0.0
+    units: int = 0
+
+class ProductSalesRollup(SQLModel, table=True):
+    __table_args__ = (
+        UniqueConstraint("period", "bucket_start", "product_id"),
+        Index("ix_productsalesrollup_period_category_slug_bucket_start", "period", "category_slug", "bucket_start"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    period: str
+    bucket_start: datetime
+    product_id: int = Field(index=True)
+    category_slug: str
+    units: int = 0
+    revenue: float = 0.0
+
+# Schemas
+class SalesBucket(SQLModel):
+    bucket_start: datetime
+    orders_created: int
+    orders_paid: int
+    revenue: float
+    units: int
+    conversion_rate: Optional[float] = None
+
+class SalesReport(SQLModel):
+    period: str
+    start: datetime
+    end: datetime
+    orders_created: int
+    orders_paid: int
+    revenue: float
+    units: int
+    conversion_rate: Optional[float] = None
+    buckets: List[SalesBucket]
+
+class ProductSales(SQLModel):
+    product_id: int
+    title: Optional[str] = None
+    category_slug: str
+    units: int
+    revenue: float
+
+class CategorySales(SQLModel):
+    category_slug: str
+    units: int
+    revenue: float
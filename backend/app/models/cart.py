@@ -1,5 +1,6 @@
 from typing import List, Optional, TYPE_CHECKING
-from sqlmodel import SQLModel, Field, Relationship
+from datetime import datetime, timezone
+from sqlmodel import SQLModel, Field, Relationship, UniqueConstraint
 
 from .product import Product, ProductVariant
 
@@ -10,6 +11,9 @@ class CartItemBase(SQLModel):
     selected_options: Optional[str] = None 
 
 class CartItem(CartItemBase, table=True):
+    # One line per variant, so merging carts can add quantities with ON CONFLICT
+    __table_args__ = (UniqueConstraint("cart_id", "variant_id", name="uq_cartitem_cart_id_variant_id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     cart_id: Optional[int] = Field(default=None, foreign_key="cart.id")
     cart: Optional["Cart"] = Relationship(back_populates="items")
@@ -18,7 +22,10 @@ class CartItem(CartItemBase, table=True):
 
 class Cart(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: Optional[int] = Field(default=None, foreign_key="user.id")
+    # None for guest carts
+    user_id: Optional[int] = Field(default=None, foreign_key="user.id", index=True)
+    # Bumped whenever items change; the sweeper removes carts idle for CART_RETENTION_DAYS
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), index=True)
     
     items: List[CartItem] = Relationship(back_populates="cart")
 
@@ -31,7 +38,8 @@ class CartItemRead(CartItemBase):
     variant: Optional["ProductVariant"] = None
 
 class CartRead(SQLModel):
-    id: int
+    # None until a guest adds their first item
+    id: Optional[int]
     items: List[CartItemRead]
     count: int = 0
     subtotal: float = 0.0
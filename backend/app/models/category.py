@@ -9,3 +9,9 @@ class Category(CategoryBase, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     
     products: List["Product"] = Relationship(back_populates="category_link")
+
+class CategoryRead(CategoryBase):
+    id: int
+    product_count: int = 0
+    # Products with at least one available variant in stock
+    in_stock_count: int = 0
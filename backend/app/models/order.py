@@ -1,6 +1,9 @@
 from typing import List, Optional
 from datetime import datetime, timezone
-from sqlmodel import SQLModel, Field, Relationship
+from sqlmodel import SQLModel, Field, Relationship, Index
+
+# Statuses of orders that have been paid for (they move on to shipped and delivered)
+PAID_STATUSES = ("paid", "shipped", "delivered")
 
 class OrderItem(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -12,6 +15,9 @@ class OrderItem(SQLModel, table=True):
     order: Optional["Order"] = Relationship(back_populates="items")
 
 class Order(SQLModel, table=True):
+    # Lets the sweeper find stale pending orders without scanning order history
+    __table_args__ = (Index("ix_order_status_created_at", "status", "created_at"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id")
     status: str = "pending"
@@ -19,5 +25,6 @@ class Order(SQLModel, table=True):
     razorpay_order_id: Optional[str] = None
     razorpay_payment_id: Optional[str] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    paid_at: Optional[datetime] = None
     
     items: List[OrderItem] = Relationship(back_populates="order")
@@ -1,6 +1,7 @@
 from typing import List, Optional
-from sqlmodel import SQLModel, Field, Relationship
-from sqlalchemy import Column, JSON
+from datetime import datetime, timezone
+from sqlmodel import SQLModel, Field, Relationship, Index
+from sqlalchemy import Column, JSON, func
 from decimal import Decimal
 
 # Forward reference
@@ -10,7 +11,7 @@ if TYPE_CHECKING:
 
 class ProductImage(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    product_id: int = Field(foreign_key="product.id")
+    product_id: int = Field(foreign_key="product.id", index=True)
     image_url: str
     alt_text: Optional[str] = None
     display_order: int = Field(default=0)
@@ -20,7 +21,7 @@ class ProductImage(SQLModel, table=True):
 
 class ProductVariant(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    product_id: int = Field(foreign_key="product.id")
+    product_id: int = Field(foreign_key="product.id", index=True)
     sku: str = Field(unique=True, index=True)
     size: Optional[str] = None
     color: Optional[str] = None
@@ -40,7 +41,30 @@ class ProductBase(SQLModel):
     category_slug: str
 
 class Product(ProductBase, table=True):
+    # One index per listing sort, with and without a category, ending in id for
+    # keyset pagination (the default order is by id); see LISTING_SORTS in app.api.products
+    __table_args__ = (
+        Index("ix_product_category_slug_id", "category_slug", "id"),
+        Index("ix_product_category_slug_price_id", "category_slug", "price", "id"),
+        Index("ix_product_category_slug_created_at_id", "category_slug", "created_at", "id"),
+        Index("ix_product_category_slug_popularity_id", "category_slug", "popularity", "id"),
+        Index("ix_product_price_id", "price", "id"),
+        Index("ix_product_created_at_id", "created_at", "id"),
+        Index("ix_product_popularity_id", "popularity", "id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
+    # Identifier from the catalog feed, used as the upsert key on import
+    external_id: Optional[str] = Field(default=None, unique=True, index=True)
+    # Hash of the last imported feed record, to skip unchanged products on sync
+    content_hash: Optional[str] = None
+    # Server defaults too: the catalog import and benchmark insert rows through Core
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_column_kwargs={"server_default": func.now()},
+    )
+    # Time-decayed units sold, kept current by app.services.analytics
+    popularity: float = Field(default=0.0, sa_column_kwargs={"server_default": "0"})
     
     category_id: Optional[int] = Field(default=None, foreign_key="category.id")
     category_link: Optional["Category"] = Relationship(back_populates="products")
@@ -0,0 +1,15 @@
+from typing import Optional
+from sqlmodel import SQLModel, Field, UniqueConstraint
+
+class RelatedProduct(SQLModel, table=True):
+    """Top co-purchased products per product, written by scripts/build_related.py."""
+    # Also serves lookups by product_id
+    __table_args__ = (UniqueConstraint("product_id", "rank"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    product_id: int
+    related_product_id: int
+    rank: int
+    score: float
+    # Number of paid orders containing both products
+    support: int
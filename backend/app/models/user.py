@@ -25,9 +25,26 @@ class EmailVerificationToken(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id")
     token: str = Field(unique=True, index=True)
-    expires_at: datetime
+    expires_at: datetime = Field(index=True)
     is_used: bool = Field(default=False)
 
+class RefreshToken(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id", index=True)
+    # Only a SHA-256 of the token is stored
+    token_hash: str = Field(unique=True, index=True)
+    # Every token rotated from the same login shares a family, so reuse of an
+    # already-rotated token can revoke the whole chain
+    family_id: str = Field(index=True)
+    expires_at: datetime = Field(index=True)
+    revoked_at: Optional[datetime] = None
+
+class RevokedToken(SQLModel, table=True):
+    """Access tokens revoked before they expire (e.g. on logout), keyed by their jti."""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    jti: str = Field(unique=True, index=True)
+    expires_at: datetime = Field(index=True)
+
 class UserBase(SQLModel):
     email: EmailStr = Field(unique=True, index=True)
     full_name: Optional[str] = None
@@ -52,5 +69,12 @@ class AddressRead(AddressBase):
 
 class Token(SQLModel):
     access_token: str
+    refresh_token: Optional[str] = None
     token_type: str = "bearer"
     user: UserRead
+
+class TokenRefresh(SQLModel):
+    refresh_token: str
+
+class LogoutRequest(SQLModel):
+    refresh_token: Optional[str] = None
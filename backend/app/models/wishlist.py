@@ -1,15 +1,27 @@
 from typing import List, Optional
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import UniqueConstraint
 
 class WishlistItem(SQLModel, table=True):
+    # One row per product per wishlist, so adds can be idempotent upserts
+    __table_args__ = (UniqueConstraint("wishlist_id", "product_id"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     wishlist_id: Optional[int] = Field(default=None, foreign_key="wishlist.id")
-    product_id: int # Just the ID, or link to Product
+    product_id: int = Field(foreign_key="product.id", index=True)
     
     wishlist: Optional["Wishlist"] = Relationship(back_populates="items")
 
 class Wishlist(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int = Field(foreign_key="user.id")
+    user_id: int = Field(foreign_key="user.id", unique=True)
     
     items: List[WishlistItem] = Relationship(back_populates="wishlist")
+
+# Schemas
+class WishlistStatus(SQLModel):
+    product_id: int
+    in_wishlist: bool
+
+class WishlistMembership(SQLModel):
+    product_ids: List[int]
@@ -0,0 +1,112 @@
+"""
+Fast JSON responses for large payloads.
+
+Routes build their response models themselves, so FastAPI validating them a
+second time against `response_model` and running the generic encoder is pure
+overhead. With FAST_JSON_RESPONSES on, `fast_response()` hands back a response
+that is serialized directly: pydantic models through their compiled
+serializer, everything else through orjson when it is installed.
+
+Payloads that are cached keep their serialized and compressed bodies next to
+them (`CachedPayload`), so cache hits skip both serialization and compression.
+A body is first compressed at the cheap per-request level; a background thread
+then recompresses it at the maximum level and swaps it in for later hits.
+"""
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+
+from app.compression import compress, negotiate
+from app.config import settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+
+def dump_json(content: Any, exclude_unset: bool = False) -> bytes:
+    if isinstance(content, BaseModel):
+        return content.model_dump_json(exclude_unset=exclude_unset).encode()
+    if isinstance(content, list) and content and isinstance(content[0], BaseModel):
+        return b"[" + b",".join(item.model_dump_json(exclude_unset=exclude_unset).encode() for item in content) + b"]"
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def __init__(self, content: Any, status_code: int = 200, exclude_unset: bool = False, **kwargs):
+        self.exclude_unset = exclude_unset
+        super().__init__(content, status_code=status_code, **kwargs)
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dump_json(content, self.exclude_unset)
+
+
+def fast_response(content: Any, exclude_unset: bool = False):
+    """
+    Returns `content` pre-serialized when FAST_JSON_RESPONSES is on, otherwise
+    unchanged so FastAPI validates and encodes it against the route's response_model.
+    `content` must already match that response_model.
+    """
+    if settings.FAST_JSON_RESPONSES:
+        return FastJSONResponse(content, exclude_unset=exclude_unset)
+    return content
+
+
+# Max-quality brotli takes milliseconds per body, so it never runs on the request path
+_recompressor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="recompress")
+
+
+class CachedPayload:
+    """A cacheable response payload plus its encoded bodies, each built once on first use."""
+
+    __slots__ = ("value", "_bodies", "_lock", "__weakref__")
+
+    def __init__(self, value: Any):
+        self.value = value
+        self._bodies: Dict[str, bytes] = {}
+        self._lock = threading.RLock()
+
+    def body(self, encoding: Optional[str] = None) -> bytes:
+        key = encoding or "identity"
+        body = self._bodies.get(key)
+        if body is None:
+            with self._lock:
+                body = self._bodies.get(key)
+                if body is None:
+                    body = dump_json(self.value) if encoding is None else compress(self.body(), encoding)
+                    self._bodies[key] = body
+                    if encoding is not None:
+                        # Submitted after storing, so the upgrade can't be overwritten by this body
+                        _recompressor.submit(_recompress, weakref.ref(self), encoding)
+        return body
+
+
+def _recompress(ref: weakref.ref, encoding: str):
+    payload = ref()
+    # Skip payloads that were evicted while waiting
+    if payload is not None:
+        payload._bodies[encoding] = compress(payload.body(), encoding, cached=True)
+
+
+def cached_response(request: Request, payload: CachedPayload) -> Response:
+    """Serves a CachedPayload in the best encoding the client accepts."""
+    encoding = negotiate(request.headers.get("accept-encoding", ""))
+    if encoding is not None and len(payload.body()) < settings.COMPRESSION_MIN_SIZE:
+        encoding = None
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(payload.body(encoding), media_type="application/json", headers=headers)
@@ -0,0 +1,115 @@
+"""
+In-memory list of revoked access tokens.
+
+Access tokens are validated without touching the database: each worker keeps
+the jtis of revoked, not yet expired tokens in a Bloom filter backed by an
+exact set, and a background thread reloads them from the RevokedToken table
+every REVOCATION_SYNC_INTERVAL seconds. Almost every lookup is a miss that the
+Bloom filter answers on its own; the exact set rules out false positives.
+
+A token revoked in this worker is blocked immediately, in other workers after
+their next sync.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from sqlmodel import Session, select
+from app.config import settings
+from app.models import RevokedToken
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    def __init__(self, capacity: int = 10000, error_rate: float = 0.001):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, key: str):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RevocationList:
+    def __init__(self, capacity: int = 10000):
+        self._capacity = capacity
+        self._expiry: Dict[str, datetime] = {}
+        self._bloom = BloomFilter(capacity)
+        self._lock = threading.Lock()
+        self._syncer: Optional[threading.Thread] = None
+
+    def add(self, jti: str, expires_at: datetime):
+        with self._lock:
+            self._expiry[jti] = expires_at
+            if len(self._expiry) > self._bloom.capacity:
+                self._rebuild()
+            else:
+                self._bloom.add(jti)
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        if jti is None:
+            return False
+        return jti in self._bloom and jti in self._expiry
+
+    def sync(self, session: Session):
+        """
+        Reloads the unexpired revoked tokens. The table only ever holds a token
+        lifetime's worth of logouts, so a full reload is cheap and, unlike an
+        incremental one by id, can't miss rows committed out of order.
+        """
+        now = datetime.now(timezone.utc)
+        rows = session.exec(
+            select(RevokedToken.jti, RevokedToken.expires_at).where(RevokedToken.expires_at > now)
+        ).all()
+        expiry = dict(rows)
+        with self._lock:
+            # Keep tokens revoked locally while the query was running
+            for jti, expires_at in self._expiry.items():
+                if expires_at > now:
+                    expiry.setdefault(jti, expires_at)
+            self._expiry = expiry
+            self._rebuild()
+
+    def _rebuild(self):
+        capacity = self._capacity
+        while capacity < len(self._expiry):
+            capacity *= 2
+        bloom = BloomFilter(capacity)
+        for jti in self._expiry:
+            bloom.add(jti)
+        self._bloom = bloom
+
+    def start_syncer(self, engine):
+        if self._syncer is not None:
+            return
+
+        def run():
+            while True:
+                try:
+                    with Session(engine) as session:
+                        self.sync(session)
+                except Exception:
+                    logger.exception("Failed to sync revoked tokens")
+                time.sleep(settings.REVOCATION_SYNC_INTERVAL)
+
+        self._syncer = threading.Thread(target=run, name="revocation-sync", daemon=True)
+        self._syncer.start()
+
+
+revocation_list = RevocationList()
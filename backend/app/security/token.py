@@ -1,3 +1,8 @@
+import base64
+import hashlib
+import hmac
+import secrets
+import uuid
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Any
 from jose import jwt
@@ -9,6 +14,37 @@ def create_access_token(subject: str | Any, expires_delta: Optional[timedelta] =
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode = {"exp": expire, "sub": str(subject)}
+    # jti lets a single token be revoked (see app.security.revocation)
+    to_encode = {"exp": expire, "sub": str(subject), "jti": uuid.uuid4().hex, "type": "access"}
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
+
+def create_refresh_token() -> tuple[str, str, datetime]:
+    """
+    Returns an opaque refresh token, the hash to store for it and its expiry.
+    Refresh tokens are checked against the database, so they carry no claims.
+    """
+    token = secrets.token_urlsafe(32)
+    expires_at = datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    return token, hash_refresh_token(token), expires_at
+
+def hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def _guest_cart_signature(cart_id: int) -> str:
+    # Keyed with a purpose prefix so the signature can't be reused as anything else
+    digest = hmac.new(settings.SECRET_KEY.encode(), f"guest-cart:{cart_id}".encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest[:16]).rstrip(b"=").decode()
+
+def sign_guest_cart(cart_id: int) -> str:
+    """Cookie value identifying a guest cart: its id plus an HMAC, so ids can't be guessed."""
+    return f"{cart_id}.{_guest_cart_signature(cart_id)}"
+
+def read_guest_cart(value: Optional[str]) -> Optional[int]:
+    """Returns the cart id from a guest cart cookie, or None if it is missing or tampered with."""
+    if not value or "." not in value:
+        return None
+    cart_id, signature = value.split(".", 1)
+    if not cart_id.isdigit() or not hmac.compare_digest(signature, _guest_cart_signature(int(cart_id))):
+        return None
+    return int(cart_id)
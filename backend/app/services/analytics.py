@@ -0,0 +1,287 @@
+"""
+Hourly and daily sales rollups.
+
+Rollup rows are hot: every checkout in the same hour increments the same
+two rows. So requests don't write them. Once an order is created, paid or
+cancelled after payment and committed, its increments (negative for a
+cancellation) are added to `rollup_buffer`, which merges them in
+memory. A background thread writes them every ROLLUP_FLUSH_INTERVAL seconds,
+with one INSERT ... ON CONFLICT per table, in one short transaction per worker.
+Increments still in the buffer when a worker is killed are lost, until the
+next `rebuild_rollups` of that range. Orders count towards the bucket they
+were created in; revenue and units towards the bucket they were paid in.
+
+`rebuild_rollups` recomputes a time range from Order/OrderItem, for backfills
+or after fixing data by hand (`python -m scripts.rebuild_rollups`).
+
+`Product.popularity`, which the "popular" listing sort uses, is the number of
+units sold with each sale's weight halving every POPULARITY_HALF_LIFE_DAYS.
+Instead of decaying every score over time, new sales are weighted up relative
+to a fixed epoch (2 ** (days since epoch / half-life)). All scores keep the same
+order, so paying an order is a single increment per product and no job has to
+touch the whole catalog. `rebuild_popularity` recomputes them from the orders.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import bindparam
+from sqlmodel import Session, select, delete, update, col
+from app.config import settings
+from app.db import upsert
+from app.models import Order, OrderItem, Product, SalesRollup, ProductSalesRollup
+from app.models.order import PAID_STATUSES
+
+PERIODS = ("hour", "day")
+UNCATEGORIZED = "uncategorized"
+
+POPULARITY_HALF_LIFE_DAYS = 14
+POPULARITY_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+SALES_COLUMNS = ("orders_created", "orders_paid", "revenue", "units")
+
+logger = logging.getLogger(__name__)
+
+
+def as_utc(timestamp: datetime) -> datetime:
+    """Naive timestamps (as SQLite returns them) are UTC, not server-local time."""
+    if timestamp.tzinfo is None:
+        return timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(timezone.utc)
+
+
+def bucket_start(timestamp: datetime, period: str) -> datetime:
+    timestamp = as_utc(timestamp)
+    if period == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def popularity_weight(sold_at: datetime) -> float:
+    """
+    Weight of one unit sold at `sold_at`. It doubles every half-life, so float64
+    overflows around 2063: move the epoch forward and rebuild before then.
+    """
+    days = (as_utc(sold_at) - POPULARITY_EPOCH).total_seconds() / 86400
+    return 2.0 ** (days / POPULARITY_HALF_LIFE_DAYS)
+
+
+def _add_popularity(session: Session, scores: Dict[int, float]):
+    if not scores:
+        return
+    table = Product.__table__
+    statement = (
+        update(table)
+        .where(table.c.id == bindparam("product_id"))
+        .values(popularity=table.c.popularity + bindparam("score"))
+    )
+    # Sorted so concurrent payments lock product rows in the same order
+    session.execute(statement, [{"product_id": product_id, "score": scores[product_id]} for product_id in sorted(scores)])
+
+
+class RollupBuffer:
+    """Rollup and popularity increments waiting to be written, merged per row."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sales: Dict[Tuple[str, datetime], Dict[str, float]] = {}
+        self._products: Dict[Tuple[str, datetime, int], Dict] = {}
+        self._popularity: Dict[int, float] = {}
+        self._flusher: Optional[threading.Thread] = None
+
+    def add_sales(self, period: str, start: datetime, **increments):
+        with self._lock:
+            bucket = self._sales.setdefault((period, start), dict.fromkeys(SALES_COLUMNS, 0))
+            for column, amount in increments.items():
+                bucket[column] += amount
+
+    def add_product(self, period: str, start: datetime, product_id: int, category_slug: str, units: int, revenue: float):
+        with self._lock:
+            entry = self._products.setdefault((period, start, product_id), {"category_slug": category_slug, "units": 0, "revenue": 0.0})
+            entry["units"] += units
+            entry["revenue"] += revenue
+
+    def add_popularity(self, product_id: int, score: float):
+        with self._lock:
+            self._popularity[product_id] = self._popularity.get(product_id, 0.0) + score
+
+    def clear(self):
+        with self._lock:
+            self._sales, self._products, self._popularity = {}, {}, {}
+
+    def flush(self, session: Session) -> int:
+        """Writes and clears the buffered increments. Returns the number of rows written. Commits."""
+        with self._lock:
+            sales, products, popularity = self._sales, self._products, self._popularity
+            self._sales, self._products, self._popularity = {}, {}, {}
+        if not (sales or products or popularity):
+            return 0
+        # Sorted so concurrent flushes from several workers lock rows in the same order
+        sales_rows = [{"period": period, "bucket_start": start, **values} for (period, start), values in sorted(sales.items())]
+        product_rows = [
+            {"period": period, "bucket_start": start, "product_id": product_id, **values}
+            for (period, start, product_id), values in sorted(products.items())
+        ]
+        try:
+            upsert(session, SalesRollup, sales_rows, ["period", "bucket_start"], increment_columns=SALES_COLUMNS)
+            upsert(session, ProductSalesRollup, product_rows, ["period", "bucket_start", "product_id"], increment_columns=["units", "revenue"])
+            _add_popularity(session, popularity)
+            session.commit()
+        except Exception:
+            session.rollback()
+            # Put them back for the next attempt
+            for (period, start), values in sales.items():
+                self.add_sales(period, start, **values)
+            for (period, start, product_id), values in products.items():
+                self.add_product(period, start, product_id, **values)
+            for product_id, score in popularity.items():
+                self.add_popularity(product_id, score)
+            raise
+        return len(sales_rows) + len(product_rows) + len(popularity)
+
+    def start_flusher(self, engine):
+        if self._flusher is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(settings.ROLLUP_FLUSH_INTERVAL)
+                try:
+                    with Session(engine) as session:
+                        self.flush(session)
+                except Exception:
+                    logger.exception("Failed to write sales rollups")
+
+        self._flusher = threading.Thread(target=run, name="rollup-flusher", daemon=True)
+        self._flusher.start()
+
+
+rollup_buffer = RollupBuffer()
+
+
+def record_order_created(created_at: datetime):
+    """Counts a new order in the rollups. Call once the order is committed."""
+    for period in PERIODS:
+        rollup_buffer.add_sales(period, bucket_start(created_at, period), orders_created=1)
+
+
+def record_order_paid(session: Session, order_id: int, total_amount: float, paid_at: datetime):
+    """
+    Adds a newly paid order to the rollups and product popularity. Call exactly
+    once per order, after the transaction that marks it paid has committed.
+    """
+    _record_payment(session, order_id, total_amount, paid_at, 1)
+
+
+def record_order_unpaid(session: Session, order_id: int, total_amount: float, paid_at: datetime):
+    """
+    Takes a paid order back out of the rollups and product popularity, from the
+    buckets it was counted in. Call once the order has left PAID_STATUSES
+    (e.g. was cancelled) and that change has committed.
+    """
+    _record_payment(session, order_id, total_amount, paid_at, -1)
+
+
+def _record_payment(session: Session, order_id: int, total_amount: float, paid_at: datetime, sign: int):
+    items = session.exec(
+        select(OrderItem.product_id, OrderItem.quantity, OrderItem.price_at_purchase, Product.category_slug)
+        .outerjoin(Product, Product.id == OrderItem.product_id)
+        .where(OrderItem.order_id == order_id)
+    ).all()
+
+    per_product: Dict[int, list] = {}
+    for product_id, quantity, price, category_slug in items:
+        entry = per_product.setdefault(product_id, [category_slug or UNCATEGORIZED, 0, 0.0])
+        entry[1] += sign * quantity
+        entry[2] += sign * quantity * price
+    units = sum(entry[1] for entry in per_product.values())
+
+    for period in PERIODS:
+        start = bucket_start(paid_at, period)
+        rollup_buffer.add_sales(period, start, orders_paid=sign, revenue=sign * total_amount, units=units)
+        for product_id, (category_slug, quantity, revenue) in per_product.items():
+            rollup_buffer.add_product(period, start, product_id, category_slug, quantity, revenue)
+    weight = popularity_weight(paid_at)
+    for product_id, (_, quantity, _) in per_product.items():
+        rollup_buffer.add_popularity(product_id, quantity * weight)
+
+
+def rebuild_rollups(session: Session, start: datetime, end: datetime, batch_size: int = 5000) -> int:
+    """
+    Recomputes the rollups for whole days in [start, end) from the order tables.
+    Returns the number of rollup rows written. Commits.
+    """
+    start = bucket_start(start, "day")
+    if bucket_start(end, "day") < end:
+        end = bucket_start(end, "day") + timedelta(days=1)
+
+    sales: Dict[Tuple[str, datetime], Dict[str, float]] = defaultdict(
+        lambda: {"orders_created": 0, "orders_paid": 0, "revenue": 0.0, "units": 0}
+    )
+    products: Dict[Tuple[str, datetime, int], Dict] = {}
+
+    created = select(Order.created_at).where(Order.created_at >= start, Order.created_at < end)
+    for created_at in session.exec(created.execution_options(yield_per=batch_size)):
+        for period in PERIODS:
+            sales[(period, bucket_start(created_at, period))]["orders_created"] += 1
+
+    paid = (
+        select(Order.paid_at, Order.total_amount)
+        .where(col(Order.status).in_(PAID_STATUSES), Order.paid_at >= start, Order.paid_at < end)
+    )
+    for paid_at, total_amount in session.exec(paid.execution_options(yield_per=batch_size)):
+        for period in PERIODS:
+            bucket = sales[(period, bucket_start(paid_at, period))]
+            bucket["orders_paid"] += 1
+            bucket["revenue"] += total_amount
+
+    items = (
+        select(Order.paid_at, OrderItem.product_id, OrderItem.quantity, OrderItem.price_at_purchase, Product.category_slug)
+        .select_from(OrderItem)
+        .join(Order, Order.id == OrderItem.order_id)
+        .outerjoin(Product, Product.id == OrderItem.product_id)
+        .where(col(Order.status).in_(PAID_STATUSES), Order.paid_at >= start, Order.paid_at < end)
+    )
+    for paid_at, product_id, quantity, price, category_slug in session.exec(items.execution_options(yield_per=batch_size)):
+        for period in PERIODS:
+            bucket = bucket_start(paid_at, period)
+            sales[(period, bucket)]["units"] += quantity
+            entry = products.setdefault((period, bucket, product_id), {
+                "period": period, "bucket_start": bucket, "product_id": product_id,
+                "category_slug": category_slug or UNCATEGORIZED, "units": 0, "revenue": 0.0,
+            })
+            entry["units"] += quantity
+            entry["revenue"] += quantity * price
+
+    for model in (SalesRollup, ProductSalesRollup):
+        session.exec(delete(model).where(col(model.bucket_start) >= start, col(model.bucket_start) < end))
+    sales_rows = [{"period": period, "bucket_start": bucket, **values} for (period, bucket), values in sales.items()]
+    product_rows = list(products.values())
+    for rows, model in ((sales_rows, SalesRollup), (product_rows, ProductSalesRollup)):
+        for i in range(0, len(rows), batch_size):
+            session.execute(model.__table__.insert(), rows[i:i + batch_size])
+    session.commit()
+    return len(sales_rows) + len(product_rows)
+
+
+def rebuild_popularity(session: Session, batch_size: int = 5000) -> int:
+    """Recomputes Product.popularity from all paid orders. Returns the number of products with sales. Commits."""
+    scores: Dict[int, float] = defaultdict(float)
+    items = (
+        select(Order.paid_at, OrderItem.product_id, OrderItem.quantity)
+        .select_from(OrderItem)
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(col(Order.status).in_(PAID_STATUSES), Order.paid_at != None)
+    )
+    for paid_at, product_id, quantity in session.exec(items.execution_options(yield_per=batch_size)):
+        scores[product_id] += quantity * popularity_weight(paid_at)
+
+    session.exec(update(Product).where(Product.popularity != 0).values(popularity=0.0))
+    ids = sorted(scores)
+    for i in range(0, len(ids), batch_size):
+        _add_popularity(session, {product_id: scores[product_id] for product_id in ids[i:i + batch_size]})
+    session.commit()
+    return len(scores)
@@ -0,0 +1,120 @@
+"""
+In-process caches for catalog and user reads.
+
+Writes to the catalog call `invalidate_products()` with the ids they touched
+(`invalidate_categories()`, `invalidate_users()` likewise); anything else
+derived from the catalog registers a listener with `on_catalog_change()` to be
+told about those ids. Invalidations go through the invalidation bus, so they
+reach every worker, not just the one that handled the write.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterable, List, Optional
+
+from app.config import settings
+from app.db import engine
+from app.metrics import CACHE_REQUESTS
+from app.services.invalidation import create_bus
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after `ttl` seconds.
+
+    Every invalidation bumps `generation`. A caller that computes a value from
+    the database reads it first and passes it to `set()`, which then drops the
+    value if an invalidation came in meanwhile, as it may predate that change.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._hits = CACHE_REQUESTS.labels(name, "hit")
+        self._misses = CACHE_REQUESTS.labels(name, "miss")
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._data.move_to_end(key)
+                    self._hits.inc()
+                    return entry[1]
+                del self._data[key]
+        self._misses.inc()
+        return None
+
+    def set(self, key: Hashable, value: Any, generation: Optional[int] = None):
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete_many(self, keys: Iterable[Hashable]):
+        with self._lock:
+            self.generation += 1
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+product_cache = TTLCache("product", maxsize=settings.PRODUCT_CACHE_SIZE, ttl=settings.PRODUCT_CACHE_TTL)
+# A single entry: the category list with product counts
+category_cache = TTLCache("category", maxsize=1, ttl=settings.CATEGORY_CACHE_TTL)
+# Keyed by email (the access token subject)
+user_cache = TTLCache("user", maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL)
+
+bus = create_bus(engine)
+
+
+def _evictor(cache: TTLCache) -> Callable[[Optional[List]], None]:
+    def evict(keys: Optional[List]):
+        if keys is None:
+            cache.clear()
+        else:
+            cache.delete_many(keys)
+    return evict
+
+
+def on_catalog_change(listener: Callable[[Optional[List[int]]], None]):
+    """Registers a callback run with the ids of products that changed, or None if any may have."""
+    return bus.subscribe("product", listener)
+
+
+def on_category_change(listener: Callable[[Optional[List[str]]], None]):
+    """Registers a callback run with the slugs of categories that changed, or None if any may have."""
+    return bus.subscribe("category", listener)
+
+
+def invalidate_products(product_ids: Iterable[int]):
+    bus.publish("product", product_ids)
+
+
+def invalidate_categories(slugs: Optional[Iterable[str]] = None):
+    bus.publish("category", slugs)
+
+
+def invalidate_users(emails: Iterable[str]):
+    bus.publish("user", emails)
+
+
+on_catalog_change(_evictor(product_cache))
+# Counts depend on every product's category and stock, so any change clears them
+on_catalog_change(lambda keys: category_cache.clear())
+on_category_change(lambda keys: category_cache.clear())
+bus.subscribe("user", _evictor(user_cache))
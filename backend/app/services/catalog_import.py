@@ -0,0 +1,446 @@
+"""
+Streaming catalog import.
+
+Records are read one at a time from JSON, NDJSON or CSV files, normalized,
+de-duplicated per batch and upserted with one statement per table per batch:
+
+    with Session(engine) as session:
+        stats = import_catalog(session, iter_records("catalog.ndjson"))
+
+Products are keyed by `external_id`, variants by `sku`. A product's images are
+replaced by the ones in the feed. Products created before external ids existed
+are matched by title the first time their record is imported.
+
+In incremental mode (`incremental=True`) each record is hashed and compared
+with the `content_hash` stored on its product; unchanged products are skipped,
+and for changed ones only the variants and images that differ are written.
+Catalog caches are invalidated only for the products a batch wrote.
+"""
+import csv
+import hashlib
+import io
+import json
+import time
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Optional
+
+from sqlalchemy import bindparam
+from sqlmodel import Session, select, delete, update, col
+from app.db import upsert
+from app.models import Category, Product
+from app.models.product import ProductImage, ProductVariant
+from app.services.cache import invalidate_categories, invalidate_products
+
+DEFAULT_BATCH_SIZE = 1000
+
+PRODUCT_COLUMNS = ["title", "description", "price", "brand", "thumbnail", "category_slug", "category_id", "content_hash"]
+VARIANT_COLUMNS = ["product_id", "size", "color", "material", "price_adjustment", "stock_quantity", "is_available"]
+
+
+@dataclass
+class ImportStats:
+    products: int = 0
+    variants: int = 0
+    images: int = 0
+    categories: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    unchanged: int = 0
+    batches: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    @property
+    def products_per_second(self) -> float:
+        return self.products / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.products} products, {self.variants} variants, {self.images} images "
+            f"({self.unchanged} unchanged, {self.duplicates} duplicates, {self.invalid} invalid) in {self.elapsed:.1f}s "
+            f"- {self.products_per_second:,.0f} products/s"
+        )
+
+
+# --- Readers ---
+
+def iter_records(path: str, format: Optional[str] = None) -> Iterator[dict]:
+    """Yields raw product records from a file, picking the reader from its extension."""
+    format = format or path.rsplit(".", 1)[-1].lower()
+    with open(path, newline="" if format == "csv" else None, encoding="utf-8") as f:
+        if format in ("ndjson", "jsonl"):
+            yield from _iter_ndjson(f)
+        elif format == "json":
+            yield from _iter_json(f)
+        elif format == "csv":
+            yield from _iter_csv(f)
+        else:
+            raise ValueError(f"Unsupported catalog format: {format}")
+
+
+def _iter_ndjson(f) -> Iterator[dict]:
+    for line in f:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def _iter_json(f, chunk_size: int = 1 << 16) -> Iterator[dict]:
+    """
+    Streams the elements of a top-level JSON array. Objects such as a DummyJSON
+    response (`{"products": [...]}`) are small API dumps and are loaded whole.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    while not buffer:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            return
+        buffer = chunk.lstrip()
+    if buffer.startswith("{"):
+        data = json.loads(buffer + f.read())
+        yield from data.get("products", [])
+        return
+    if not buffer.startswith("["):
+        raise ValueError("Expected a JSON array of products")
+
+    pos = 1
+    while True:
+        # Skip whitespace and separators between elements
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buffer):
+                break
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            buffer, pos = chunk, 0
+        if buffer[pos] == "]":
+            return
+        try:
+            record, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                raise
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        yield record
+        pos = end
+
+
+def _iter_csv(f) -> Iterator[dict]:
+    """
+    One row per variant. Consecutive rows sharing an `external_id` form one
+    product; `images` holds `|`-separated URLs.
+    """
+    current: Optional[dict] = None
+    for row in csv.DictReader(f):
+        key = row.get("external_id") or row.get("title")
+        if current is None or current["external_id"] != key:
+            if current is not None:
+                yield current
+            current = {
+                "external_id": key,
+                "title": row.get("title"),
+                "description": row.get("description") or "",
+                "price": row.get("price"),
+                "brand": row.get("brand") or None,
+                "thumbnail": row.get("thumbnail") or None,
+                "category": row.get("category"),
+                "images": [url for url in (row.get("images") or "").split("|") if url],
+                "variants": [],
+            }
+        if row.get("sku"):
+            current["variants"].append({
+                "sku": row["sku"],
+                "size": row.get("size") or None,
+                "color": row.get("color") or None,
+                "material": row.get("material") or None,
+                "price_adjustment": row.get("price_adjustment") or 0,
+                "stock_quantity": row.get("stock_quantity") or 0,
+            })
+    if current is not None:
+        yield current
+
+
+# --- Normalization ---
+
+def slugify(text: str) -> str:
+    return text.lower().replace(" ", "-").replace("'", "")
+
+
+def normalize_record(raw: dict) -> dict:
+    """Maps a feed record (our own format or DummyJSON's) onto the import format."""
+    title = raw["title"].strip()
+    category = raw.get("category") or raw.get("category_slug")
+    if not category:
+        raise ValueError("missing category")
+    images = raw.get("images") or []
+    return {
+        "external_id": str(raw.get("external_id") or raw.get("id") or title),
+        "title": title,
+        "description": raw.get("description") or "",
+        "price": float(raw["price"]),
+        "brand": raw.get("brand"),
+        "thumbnail": raw.get("thumbnail"),
+        "category_slug": slugify(category),
+        "category_name": raw.get("category_name") or category.title().replace("-", " "),
+        "images": [img if isinstance(img, str) else img["image_url"] for img in images],
+        "variants": [
+            {
+                "sku": str(v["sku"]),
+                "size": v.get("size"),
+                "color": v.get("color"),
+                "material": v.get("material"),
+                "price_adjustment": float(v.get("price_adjustment") or 0),
+                "stock_quantity": int(v.get("stock_quantity") or 0),
+                "is_available": bool(v.get("is_available", True)),
+            }
+            for v in raw.get("variants") or []
+        ],
+    }
+
+
+def content_hash(record: dict) -> str:
+    """Stable hash of a normalized record, covering its variants and images."""
+    payload = json.dumps(record, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def _variant_values(variant: dict) -> tuple:
+    return tuple(variant[c] for c in VARIANT_COLUMNS)
+
+
+def _batched(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+# --- Pipeline ---
+
+class CatalogImporter:
+    def __init__(self, session: Session, batch_size: int = DEFAULT_BATCH_SIZE, incremental: bool = False):
+        self.session = session
+        self.batch_size = batch_size
+        self.incremental = incremental
+        self.stats = ImportStats()
+        self._category_ids: dict[str, int] = dict(session.exec(select(Category.slug, Category.id)).all())
+
+    def run(self, records: Iterable[dict], on_batch: Optional[Callable[[ImportStats], None]] = None) -> ImportStats:
+        for batch in _batched(records, self.batch_size):
+            self.import_batch(batch)
+            if on_batch:
+                on_batch(self.stats)
+        return self.stats
+
+    def _normalize(self, batch: List[dict]) -> List[dict]:
+        # Last occurrence wins, both for products and for SKUs
+        products: dict[str, dict] = {}
+        for raw in batch:
+            try:
+                record = normalize_record(raw)
+            except (KeyError, TypeError, ValueError):
+                self.stats.invalid += 1
+                continue
+            if record["external_id"] in products:
+                self.stats.duplicates += 1
+                del products[record["external_id"]]
+            products[record["external_id"]] = record
+
+        owners: dict[str, dict] = {}
+        for record in products.values():
+            unique = {}
+            for variant in record["variants"]:
+                owner = owners.get(variant["sku"])
+                if owner is not None and owner is not record:
+                    owner["variants"] = [v for v in owner["variants"] if v["sku"] != variant["sku"]]
+                owners[variant["sku"]] = record
+                unique[variant["sku"]] = variant
+            record["variants"] = list(unique.values())
+        for record in products.values():
+            record["content_hash"] = content_hash(record)
+        return list(products.values())
+
+    def _ensure_categories(self, records: List[dict]) -> List[str]:
+        """Creates missing categories and returns their slugs."""
+        missing = {
+            r["category_slug"]: {"name": r["category_name"], "slug": r["category_slug"]}
+            for r in records if r["category_slug"] not in self._category_ids
+        }
+        if not missing:
+            return []
+        upsert(self.session, Category, list(missing.values()), ["slug"])
+        self.stats.categories += len(missing)
+        rows = self.session.exec(select(Category.slug, Category.id).where(col(Category.slug).in_(list(missing)))).all()
+        self._category_ids.update(dict(rows))
+        return list(missing)
+
+    def _existing_hashes(self, records: List[dict]) -> dict[str, tuple[int, Optional[str]]]:
+        rows = self.session.exec(
+            select(Product.external_id, Product.id, Product.content_hash)
+            .where(col(Product.external_id).in_([r["external_id"] for r in records]))
+        ).all()
+        return {external_id: (product_id, digest) for external_id, product_id, digest in rows}
+
+    def _adopt_legacy_products(self, records: List[dict]):
+        """
+        Gives products without an external_id (seeded before it existed) the id of
+        the record with the same title, so the upsert updates them instead of
+        inserting duplicates that would take over their variants' SKUs.
+        """
+        by_title = {r["title"]: r["external_id"] for r in records}
+        known = set(self.session.exec(
+            select(Product.external_id).where(col(Product.external_id).in_(list(by_title.values())))
+        ).all())
+        wanted = {title: external_id for title, external_id in by_title.items() if external_id not in known}
+        if not wanted:
+            return
+        adopted: dict[str, int] = {}
+        for product_id, title in self.session.exec(
+            select(Product.id, Product.title)
+            .where(Product.external_id == None)
+            .where(col(Product.title).in_(list(wanted)))
+            .order_by(Product.id)
+        ).all():
+            adopted.setdefault(title, product_id)
+        if not adopted:
+            return
+        table = Product.__table__
+        self.session.execute(
+            update(table).where(table.c.id == bindparam("product_id")).values(external_id=bindparam("new_external_id")),
+            [{"product_id": product_id, "new_external_id": wanted[title]} for title, product_id in adopted.items()],
+        )
+
+    def import_batch(self, batch: List[dict]) -> dict[str, int]:
+        """Upserts one batch and returns the ids of the products written, keyed by external_id."""
+        records = self._normalize(batch)
+        if not records:
+            return {}
+        session = self.session
+        self._adopt_legacy_products(records)
+
+        existing: dict[str, tuple[int, Optional[str]]] = {}
+        if self.incremental:
+            existing = self._existing_hashes(records)
+            changed = [r for r in records if existing.get(r["external_id"], (None, None))[1] != r["content_hash"]]
+            self.stats.unchanged += len(records) - len(changed)
+            records = changed
+            if not records:
+                self.stats.batches += 1
+                return {}
+
+        new_categories = self._ensure_categories(records)
+        upsert(session, Product, [
+            {
+                "external_id": r["external_id"],
+                "title": r["title"],
+                "description": r["description"],
+                "price": r["price"],
+                "brand": r["brand"],
+                "thumbnail": r["thumbnail"],
+                "category_slug": r["category_slug"],
+                "category_id": self._category_ids.get(r["category_slug"]),
+                "content_hash": r["content_hash"],
+            }
+            for r in records
+        ], ["external_id"], PRODUCT_COLUMNS)
+        product_ids = dict(session.exec(
+            select(Product.external_id, Product.id).where(col(Product.external_id).in_([r["external_id"] for r in records]))
+        ).all())
+
+        image_rows = self._write_images(records, product_ids, existing)
+        variant_rows = self._write_variants(records, product_ids, existing)
+        session.commit()
+
+        self.stats.batches += 1
+        self.stats.products += len(records)
+        self.stats.variants += variant_rows
+        self.stats.images += image_rows
+        invalidate_products(product_ids.values())
+        if new_categories:
+            invalidate_categories(new_categories)
+        return product_ids
+
+    def _write_images(self, records: List[dict], product_ids: dict[str, int], existing: dict) -> int:
+        if existing:
+            # Only rewrite the images of products whose image list changed
+            current: dict[int, list] = {}
+            for product_id, url in self.session.exec(
+                select(ProductImage.product_id, ProductImage.image_url)
+                .where(col(ProductImage.product_id).in_([product_ids[r["external_id"]] for r in records]))
+                .order_by(ProductImage.product_id, ProductImage.display_order)
+            ).all():
+                current.setdefault(product_id, []).append(url)
+            records = [r for r in records if current.get(product_ids[r["external_id"]], []) != r["images"]]
+            if not records:
+                return 0
+
+        rows = [
+            {
+                "product_id": product_ids[r["external_id"]],
+                "image_url": url,
+                "alt_text": r["title"],
+                "display_order": i,
+                "is_primary": i == 0,
+            }
+            for r in records for i, url in enumerate(r["images"])
+        ]
+        self.session.exec(delete(ProductImage).where(
+            col(ProductImage.product_id).in_([product_ids[r["external_id"]] for r in records])
+        ))
+        self._insert_images(rows)
+        return len(rows)
+
+    def _write_variants(self, records: List[dict], product_ids: dict[str, int], existing: dict) -> int:
+        rows = [
+            {**v, "product_id": product_ids[r["external_id"]]}
+            for r in records for v in r["variants"]
+        ]
+        if existing and rows:
+            # Only write stock/price/attribute deltas
+            current = {
+                sku: values
+                for sku, *values in self.session.exec(
+                    select(ProductVariant.sku, *(getattr(ProductVariant, c) for c in VARIANT_COLUMNS))
+                    .where(col(ProductVariant.sku).in_([row["sku"] for row in rows]))
+                ).all()
+            }
+            rows = [row for row in rows if tuple(current.get(row["sku"], ())) != _variant_values(row)]
+        upsert(self.session, ProductVariant, rows, ["sku"], VARIANT_COLUMNS)
+        return len(rows)
+
+    def _insert_images(self, rows: List[dict]):
+        if not rows:
+            return
+        connection = self.session.connection()
+        if connection.dialect.name != "postgresql":
+            self.session.execute(ProductImage.__table__.insert(), rows)
+            return
+        # Images are plain inserts, so PostgreSQL can take them through COPY
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([row["product_id"], row["image_url"], row["alt_text"], row["display_order"], row["is_primary"]])
+        buffer.seek(0)
+        cursor = connection.connection.cursor()
+        cursor.copy_expert(
+            "COPY productimage (product_id, image_url, alt_text, display_order, is_primary) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+
+
+def import_catalog(
+    session: Session,
+    records: Iterable[dict],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    on_batch: Optional[Callable[[ImportStats], None]] = None,
+    incremental: bool = False,
+) -> ImportStats:
+    return CatalogImporter(session, batch_size, incremental).run(records, on_batch)
@@ -1,7 +1,9 @@
 import ssl
 from email.message import EmailMessage
 from aiosmtplib import send
+from fastapi import BackgroundTasks
 from app.config import settings
+from app.metrics import EMAIL_QUEUE_DEPTH, EMAILS_SENT
 
 async def send_email(subject: str, to: str, html_content: str):
     """Core async email sender."""
@@ -12,14 +14,30 @@ async def send_email(subject: str, to: str, html_content: str):
     message.add_alternative(html_content, subtype="html")
 
     # Connect and send
-    await send(
-        message,
-        hostname=settings.SMTP_HOST,
-        port=settings.SMTP_PORT,
-        username=settings.SMTP_USER,
-        password=settings.SMTP_PASSWORD,
-        use_tls=settings.SMTP_PORT == 587,
-    )
+    try:
+        await send(
+            message,
+            hostname=settings.SMTP_HOST,
+            port=settings.SMTP_PORT,
+            username=settings.SMTP_USER,
+            password=settings.SMTP_PASSWORD,
+            use_tls=settings.SMTP_PORT == 587,
+        )
+    except Exception:
+        EMAILS_SENT.labels("error").inc()
+        raise
+    EMAILS_SENT.labels("sent").inc()
+
+def queue_email(background_tasks: BackgroundTasks, sender, *args):
+    """Schedules one of the senders below as a background task, tracking queue depth."""
+    async def run():
+        try:
+            await sender(*args)
+        finally:
+            EMAIL_QUEUE_DEPTH.dec()
+
+    EMAIL_QUEUE_DEPTH.inc()
+    background_tasks.add_task(run)
 
 async def send_verification_email(email: str, token: str):
     """Sends the VEXO-styled verification email."""
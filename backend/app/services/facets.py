@@ -0,0 +1,358 @@
+"""
+In-memory facet index for product listings.
+
+For every facet value the index keeps the set of product ids that have it,
+so a listing's facet counts are set intersections instead of a scan over
+ProductVariant.
+
+The index is published as immutable snapshots. Searches read the current one
+without taking a lock, so listings never wait for each other or for a
+rebuild. Catalog change notifications only record which ids changed; once
+`start_refresher()` has been called a background thread reloads them and
+swaps in the next snapshot, copying only the sets that changed (or rebuilds
+it, after a change to much of the catalog). Until then listings are served
+from the previous snapshot. Without the refresher (tests, scripts) changes
+are applied by the next search.
+
+Counts are disjunctive: the counts for a facet apply every filter except the
+facet's own selection, so shoppers can see what widening it would give.
+
+Results are cached per filter combination until the next snapshot, so
+repeated listings intersect nothing. On a miss, id sets are intersected
+smallest first and the full catalog is never copied. `q` matches a
+case-insensitive substring of the title, as the listing query does.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlmodel import Session, select, col
+from app.models import Product
+from app.models.product import ProductVariant
+from app.config import settings
+from app.services.cache import TTLCache, on_catalog_change
+
+FACETS = ("brand", "size", "color", "material")
+
+# Above this share of the catalog a full rebuild is cheaper than per-id reloads
+FULL_REBUILD_RATIO = 0.2
+# Seconds the refresher waits after a failed refresh before trying again
+REFRESH_RETRY_DELAY = 1.0
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FacetFilters:
+    category: Optional[str] = None
+    q: Optional[str] = None
+    brand: List[str] = field(default_factory=list)
+    size: List[str] = field(default_factory=list)
+    color: List[str] = field(default_factory=list)
+    material: List[str] = field(default_factory=list)
+    price_min: Optional[float] = None
+    price_max: Optional[float] = None
+    in_stock: bool = False
+
+
+@dataclass
+class FacetResult:
+    total: int
+    counts: Dict[str, Dict[str, int]]
+    in_stock: int
+    price_min: Optional[float]
+    price_max: Optional[float]
+
+
+@dataclass
+class _Entry:
+    category: str
+    title: str
+    price: float
+    in_stock: bool
+    values: Dict[str, Set[str]]
+
+
+def _load(session: Session, product_ids: Optional[List[int]]) -> Dict[int, _Entry]:
+    """Entries for `product_ids` (all products when None); ids missing from the result no longer exist."""
+    products = select(Product.id, Product.category_slug, Product.title, Product.price, Product.brand)
+    variants = select(
+        ProductVariant.product_id, ProductVariant.size, ProductVariant.color, ProductVariant.material,
+        (col(ProductVariant.stock_quantity) > 0) & col(ProductVariant.is_available),
+    ).distinct()
+    if product_ids is not None:
+        products = products.where(col(Product.id).in_(product_ids))
+        variants = variants.where(col(ProductVariant.product_id).in_(product_ids))
+
+    entries: Dict[int, _Entry] = {}
+    for product_id, category, title, price, brand in session.exec(products):
+        entries[product_id] = _Entry(
+            category=category,
+            title=title.lower(),
+            price=price,
+            in_stock=False,
+            values={"brand": {brand} if brand else set(), "size": set(), "color": set(), "material": set()},
+        )
+    for product_id, size, color, material, available in session.exec(variants):
+        entry = entries.get(product_id)
+        if entry is None:
+            continue
+        for facet, value in (("size", size), ("color", color), ("material", material)):
+            if value:
+                entry.values[facet].add(value)
+        entry.in_stock = entry.in_stock or bool(available)
+    return entries
+
+
+class _Snapshot:
+    """One version of the index. Never modified once published; `replace()` returns the next one."""
+
+    def __init__(
+        self,
+        entries: Dict[int, _Entry],
+        postings: Dict[str, Dict[str, Set[int]]],
+        categories: Dict[str, Set[int]],
+        in_stock: Set[int],
+    ):
+        self.entries = entries
+        self.postings = postings
+        self.categories = categories
+        self.in_stock = in_stock
+
+    @classmethod
+    def build(cls, entries: Dict[int, _Entry]) -> "_Snapshot":
+        writer = _Writer(cls({}, {facet: {} for facet in FACETS}, {}, set()))
+        for product_id, entry in entries.items():
+            writer.add(product_id, entry)
+        return writer.snapshot()
+
+    def replace(self, product_ids: Iterable[int], entries: Dict[int, _Entry]) -> "_Snapshot":
+        """A copy with `product_ids` reloaded from `entries`; ids missing from it are dropped."""
+        writer = _Writer(self)
+        for product_id in product_ids:
+            writer.remove(product_id)
+            if product_id in entries:
+                writer.add(product_id, entries[product_id])
+        return writer.snapshot()
+
+    # --- queries ---
+
+    def search(self, filters: FacetFilters) -> FacetResult:
+        base = self._base_ids(filters)
+        selected = {
+            facet: self._union(facet, getattr(filters, facet))
+            for facet in FACETS if getattr(filters, facet)
+        }
+
+        counts: Dict[str, Dict[str, int]] = {}
+        for facet in FACETS:
+            others = _intersect([base] + [ids for other, ids in selected.items() if other != facet])
+            postings = self.postings[facet]
+            if others is None:
+                counts[facet] = {value: len(ids) for value, ids in postings.items()}
+            else:
+                counts[facet] = {value: n for value, ids in postings.items() if (n := len(ids & others))}
+
+        matched = _intersect([base, *selected.values()])
+        if matched is None:
+            prices = [entry.price for entry in self.entries.values()]
+            total, in_stock = len(self.entries), len(self.in_stock)
+        else:
+            prices = [self.entries[i].price for i in matched]
+            total, in_stock = len(matched), len(matched & self.in_stock)
+        return FacetResult(
+            total=total,
+            counts=counts,
+            in_stock=in_stock,
+            price_min=min(prices) if prices else None,
+            price_max=max(prices) if prices else None,
+        )
+
+    def _base_ids(self, filters: FacetFilters) -> Optional[Set[int]]:
+        """Ids matching the non-facet filters, or None for the whole catalog. Never modify the result."""
+        sets = []
+        if filters.category:
+            sets.append(self.categories.get(filters.category, set()))
+        if filters.in_stock:
+            sets.append(self.in_stock)
+        ids = _intersect(sets)
+        needle = filters.q.lower() if filters.q else None
+        if needle or filters.price_min is not None or filters.price_max is not None:
+            entries = self.entries
+            ids = {
+                i for i in (entries if ids is None else ids)
+                if (needle is None or needle in entries[i].title)
+                and (filters.price_min is None or entries[i].price >= filters.price_min)
+                and (filters.price_max is None or entries[i].price <= filters.price_max)
+            }
+        return ids
+
+    def _union(self, facet: str, values: List[str]) -> Set[int]:
+        postings = self.postings[facet]
+        if len(values) == 1:
+            return postings.get(values[0], set())
+        ids: Set[int] = set()
+        for value in values:
+            ids |= postings.get(value, set())
+        return ids
+
+
+class _Writer:
+    """Builds the snapshot after `base`, copying each id set the first time it changes."""
+
+    def __init__(self, base: _Snapshot):
+        self.entries = dict(base.entries)
+        self.postings = {facet: dict(values) for facet, values in base.postings.items()}
+        self.categories = dict(base.categories)
+        self.in_stock = base.in_stock
+        self._owned: Set[int] = set()
+
+    def _own(self, ids: Optional[Set[int]]) -> Set[int]:
+        if ids is None or id(ids) not in self._owned:
+            ids = set(ids or ())
+            self._owned.add(id(ids))
+        return ids
+
+    def _update(self, mapping: Dict[str, Set[int]], key: str, product_id: int, add: bool):
+        ids = self._own(mapping.get(key))
+        if add:
+            ids.add(product_id)
+        else:
+            ids.discard(product_id)
+        if ids:
+            mapping[key] = ids
+        else:
+            mapping.pop(key, None)
+
+    def add(self, product_id: int, entry: _Entry):
+        self.entries[product_id] = entry
+        self._update(self.categories, entry.category, product_id, True)
+        if entry.in_stock:
+            self.in_stock = self._own(self.in_stock)
+            self.in_stock.add(product_id)
+        for facet, values in entry.values.items():
+            for value in values:
+                self._update(self.postings[facet], value, product_id, True)
+
+    def remove(self, product_id: int):
+        entry = self.entries.pop(product_id, None)
+        if entry is None:
+            return
+        self._update(self.categories, entry.category, product_id, False)
+        if product_id in self.in_stock:
+            self.in_stock = self._own(self.in_stock)
+            self.in_stock.discard(product_id)
+        for facet, values in entry.values.items():
+            for value in values:
+                self._update(self.postings[facet], value, product_id, False)
+
+    def snapshot(self) -> _Snapshot:
+        return _Snapshot(self.entries, self.postings, self.categories, self.in_stock)
+
+
+class FacetIndex:
+    def __init__(self):
+        self._results = TTLCache("facets", maxsize=settings.FACET_CACHE_SIZE, ttl=settings.PRODUCT_CACHE_TTL)
+        self._snapshot: Optional[_Snapshot] = None
+        self._stale = True
+        self._pending: Set[int] = set()
+        # Guards _stale and _pending; held only to swap them
+        self._lock = threading.Lock()
+        # One refresh at a time
+        self._refresh_lock = threading.Lock()
+        self._changed = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+
+    # --- maintenance ---
+
+    def invalidate(self, product_ids: Optional[Iterable[int]] = None):
+        with self._lock:
+            if product_ids is None:
+                self._stale = True
+            else:
+                self._pending.update(product_ids)
+        self._changed.set()
+
+    def refresh(self, session: Session):
+        """Reloads the changed products and publishes the next snapshot."""
+        with self._refresh_lock:
+            with self._lock:
+                pending, self._pending = self._pending, set()
+                stale, self._stale = self._stale, False
+            snapshot = self._snapshot
+            if snapshot is not None and not stale and not pending:
+                return
+            try:
+                if snapshot is None or stale or len(pending) > FULL_REBUILD_RATIO * max(len(snapshot.entries), 1):
+                    snapshot = _Snapshot.build(_load(session, None))
+                else:
+                    snapshot = snapshot.replace(pending, _load(session, list(pending)))
+            except Exception:
+                with self._lock:
+                    self._pending |= pending
+                    self._stale = self._stale or stale
+                self._changed.set()
+                raise
+            self._snapshot = snapshot
+            self._results.clear()
+
+    def start_refresher(self, engine):
+        """Applies catalog changes on a background thread from now on, instead of in the next search."""
+        if self._refresher is not None:
+            return
+
+        def run():
+            while True:
+                self._changed.wait()
+                self._changed.clear()
+                try:
+                    with Session(engine) as session:
+                        self.refresh(session)
+                except Exception:
+                    logger.exception("Failed to refresh the facet index")
+                    time.sleep(REFRESH_RETRY_DELAY)
+
+        self._refresher = threading.Thread(target=run, name="facet-refresher", daemon=True)
+        self._refresher.start()
+
+    # --- queries ---
+
+    def search(self, session: Session, filters: FacetFilters) -> FacetResult:
+        if self._snapshot is None or (self._refresher is None and (self._stale or self._pending)):
+            self.refresh(session)
+        key = _cache_key(filters)
+        # Read before the snapshot: a result computed from a replaced snapshot is not cached
+        generation = self._results.generation
+        result = self._results.get(key)
+        if result is None:
+            result = self._snapshot.search(filters)
+            self._results.set(key, result, generation)
+        return result
+
+
+def _intersect(sets: List[Optional[Set[int]]]) -> Optional[Set[int]]:
+    """Intersection of the given sets (None stands for everything), walking the smallest."""
+    sets = sorted((ids for ids in sets if ids is not None), key=len)
+    if not sets:
+        return None
+    smallest, rest = sets[0], sets[1:]
+    if not rest:
+        return smallest
+    return {i for i in smallest if all(i in ids for ids in rest)}
+
+
+def _cache_key(filters: FacetFilters) -> tuple:
+    return (
+        filters.category,
+        filters.q.lower() if filters.q else None,
+        *(tuple(sorted(set(getattr(filters, facet)))) for facet in FACETS),
+        filters.price_min,
+        filters.price_max,
+        filters.in_stock,
+    )
+
+
+facet_index = FacetIndex()
+on_catalog_change(facet_index.invalidate)
@@ -0,0 +1,179 @@
+"""
+Invalidation bus for in-process caches.
+
+Every worker keeps its own caches (products, facet and suggestion indexes,
+users), so a write handled by one worker has to evict the matching entries
+in all the others. Writers call `bus.publish(topic, keys)` after committing;
+the bus runs this worker's handlers right away and broadcasts a compact
+message that every other worker's listener turns into the same handler calls.
+
+`PostgresBus` broadcasts with `pg_notify` on one channel and listens on a
+dedicated connection. If that connection drops, messages may have been
+missed, so after reconnecting every topic is invalidated in full. A handler
+receives a list of keys, or None for "everything".
+
+`InMemoryBus` delivers to the buses sharing its hub instead, which is enough
+for a single process (e.g. SQLite in development) and lets tests simulate
+several workers.
+"""
+import json
+import logging
+import select
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterable, List, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Optional[List]], None]
+
+CHANNEL = "cache_invalidation"
+# Budget for the keys of one message; pg_notify payloads are limited to 8000 bytes
+MAX_PAYLOAD = 7500
+
+
+class InvalidationBus:
+    def __init__(self):
+        self.origin = uuid.uuid4().hex[:12]
+        self._handlers: Dict[str, List[Handler]] = {}
+
+    def subscribe(self, topic: str, handler: Handler) -> Handler:
+        self._handlers.setdefault(topic, []).append(handler)
+        return handler
+
+    def publish(self, topic: str, keys: Optional[Iterable] = None):
+        """Invalidates `keys` (all keys when None) of `topic` in this worker and every other one."""
+        keys = list(keys) if keys is not None else None
+        if keys is not None and not keys:
+            return
+        self.dispatch(topic, keys)
+        try:
+            self._broadcast(topic, keys)
+        except Exception as e:
+            # The write itself succeeded; other workers catch up when their entries expire
+            logger.error("Failed to broadcast %s invalidation: %s", topic, e)
+
+    def dispatch(self, topic: str, keys: Optional[List]):
+        for handler in self._handlers.get(topic, ()):
+            try:
+                handler(keys)
+            except Exception:
+                logger.exception("Invalidation handler for %s failed", topic)
+
+    def dispatch_all(self):
+        for topic in list(self._handlers):
+            self.dispatch(topic, None)
+
+    def _broadcast(self, topic: str, keys: Optional[List]):
+        raise NotImplementedError
+
+    def start(self):
+        pass
+
+
+class InMemoryBus(InvalidationBus):
+    def __init__(self, hub: Optional[List["InMemoryBus"]] = None):
+        super().__init__()
+        self.hub = hub if hub is not None else []
+        self.hub.append(self)
+
+    def _broadcast(self, topic: str, keys: Optional[List]):
+        for bus in self.hub:
+            if bus is not self:
+                bus.dispatch(topic, keys)
+
+
+def encode_messages(origin: str, topic: str, keys: Optional[List]) -> List[str]:
+    """Splits an invalidation into payloads that fit in a notification."""
+    if keys is None:
+        return [json.dumps({"o": origin, "t": topic, "k": None}, separators=(",", ":"))]
+    messages, chunk, size = [], [], 0
+    for key in keys:
+        key_size = len(json.dumps(key)) + 1
+        if chunk and size + key_size > MAX_PAYLOAD:
+            messages.append(json.dumps({"o": origin, "t": topic, "k": chunk}, separators=(",", ":")))
+            chunk, size = [], 0
+        chunk.append(key)
+        size += key_size
+    messages.append(json.dumps({"o": origin, "t": topic, "k": chunk}, separators=(",", ":")))
+    return messages
+
+
+class PostgresBus(InvalidationBus):
+    def __init__(self, engine):
+        super().__init__()
+        self.engine = engine
+        self._listener: Optional[threading.Thread] = None
+
+    def _broadcast(self, topic: str, keys: Optional[List]):
+        from sqlalchemy import text
+
+        # Own short transaction: publish() is called after the write committed
+        with self.engine.begin() as connection:
+            for payload in encode_messages(self.origin, topic, keys):
+                connection.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": payload})
+
+    def handle(self, payload: str):
+        message = json.loads(payload)
+        if message.get("o") == self.origin:
+            return
+        self.dispatch(message["t"], message["k"])
+
+    def _connect(self):
+        import psycopg2
+        import psycopg2.extensions
+
+        url = self.engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        connection = psycopg2.connect(url)
+        connection.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {CHANNEL}")
+        return connection
+
+    def _listen(self):
+        delay = 1.0
+        first = True
+        while True:
+            try:
+                connection = self._connect()
+            except Exception as e:
+                logger.error("Invalidation listener could not connect: %s", e)
+                time.sleep(delay)
+                delay = min(delay * 2, 30.0)
+                continue
+            delay = 1.0
+            if not first:
+                # Anything published while we were disconnected is lost
+                self.dispatch_all()
+            first = False
+            try:
+                while True:
+                    if select.select([connection], [], [], 5.0) == ([], [], []):
+                        continue
+                    connection.poll()
+                    while connection.notifies:
+                        self.handle(connection.notifies.pop(0).payload)
+            except Exception as e:
+                logger.error("Invalidation listener disconnected: %s", e)
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+
+    def start(self):
+        if self._listener is not None:
+            return
+        self._listener = threading.Thread(target=self._listen, name="invalidation-listener", daemon=True)
+        self._listener.start()
+
+
+def create_bus(engine) -> InvalidationBus:
+    kind = settings.INVALIDATION_BUS
+    if kind == "auto":
+        kind = "postgres" if engine.dialect.name == "postgresql" else "memory"
+    if kind == "postgres":
+        return PostgresBus(engine)
+    return InMemoryBus()
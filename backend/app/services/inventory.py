@@ -0,0 +1,179 @@
+"""
+Bulk stock and price updates for product variants, keyed by SKU.
+
+Updates arrive as NDJSON (`{"sku": "...", "stock_quantity": 5}`) or CSV with a
+header row, and are read line by line from the request body. Each batch is
+applied with one statement:
+
+    WITH v(sku, stock_quantity, price_adjustment) AS (VALUES ...)
+    UPDATE productvariant SET ... FROM v WHERE productvariant.sku = v.sku
+    RETURNING productvariant.sku, productvariant.product_id
+
+A field left out of a row (or NULL) keeps its current value. Rows that don't
+parse, or whose SKU matches no variant, are reported back with their line
+number instead of failing the upload. Every batch commits on its own, and
+only the products it touched are invalidated.
+"""
+import codecs
+import csv
+import json
+import math
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from sqlalchemy import Float, Integer, String, cast, column, func, update, values
+from sqlmodel import Session
+from app.models.product import ProductVariant
+from app.services.cache import invalidate_products
+
+DEFAULT_BATCH_SIZE = 1000
+# Beyond this the report only counts failures
+MAX_REPORTED_ERRORS = 1000
+
+FORMATS = ("ndjson", "csv")
+
+
+@dataclass
+class InventoryUpdate:
+    line: int
+    sku: str
+    stock_quantity: Optional[int] = None
+    price_adjustment: Optional[float] = None
+
+
+@dataclass
+class InventoryReport:
+    received: int = 0
+    updated: int = 0
+    failed: int = 0
+    batches: int = 0
+    errors: List[dict] = field(default_factory=list)
+
+    def fail(self, line: int, sku: Optional[str], error: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "sku": sku, "error": error})
+
+
+# --- Parsing ---
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, str]]:
+    """Yields (line number, text) for each non-blank line of a streamed UTF-8 body."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer, line_no = "", 0
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            line_no += 1
+            if line.strip():
+                yield line_no, line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer.strip():
+        yield line_no + 1, buffer.rstrip("\r")
+
+
+def _number(name: str, value) -> float:
+    """A JSON number or numeric CSV field. Booleans, NaN and infinities are not numbers here."""
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            raise ValueError(f"{name} must be a number")
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"{name} must be a number")
+    if isinstance(value, float) and not math.isfinite(value):
+        raise ValueError(f"{name} must be finite")
+    return value
+
+
+def parse_update(line: int, record: dict) -> InventoryUpdate:
+    sku = record.get("sku")
+    if sku is None or not str(sku).strip():
+        raise ValueError("missing sku")
+    stock = record.get("stock_quantity")
+    price = record.get("price_adjustment")
+    if stock in (None, ""):
+        stock = None
+    else:
+        stock = _number("stock_quantity", stock)
+        if stock != int(stock):
+            raise ValueError("stock_quantity must be a whole number")
+        stock = int(stock)
+    price = None if price in (None, "") else float(_number("price_adjustment", price))
+    if stock is None and price is None:
+        raise ValueError("nothing to update: give stock_quantity and/or price_adjustment")
+    if stock is not None and stock < 0:
+        raise ValueError("stock_quantity must not be negative")
+    return InventoryUpdate(line=line, sku=str(sku).strip(), stock_quantity=stock, price_adjustment=price)
+
+
+class InvalidHeader(ValueError):
+    pass
+
+
+class RecordParser:
+    """Turns body lines into field dicts; CSV takes its column names from the first line."""
+
+    def __init__(self, format: str):
+        if format not in FORMATS:
+            raise ValueError(f"Unsupported inventory format: {format}")
+        self.format = format
+        self.header: Optional[List[str]] = None
+
+    def parse(self, text: str) -> Optional[dict]:
+        if self.format == "ndjson":
+            record = json.loads(text)
+            if not isinstance(record, dict):
+                raise ValueError("expected a JSON object")
+            return record
+        row = next(csv.reader([text]))
+        if self.header is None:
+            if "sku" not in (name.strip() for name in row):
+                raise InvalidHeader("CSV header must include sku")
+            self.header = [name.strip() for name in row]
+            return None
+        return dict(zip(self.header, row))
+
+
+# --- Applying ---
+
+def apply_batch(session: Session, updates: List[InventoryUpdate], report: InventoryReport):
+    # The last row for a SKU wins, field by field
+    merged: Dict[str, InventoryUpdate] = {}
+    for item in updates:
+        current = merged.get(item.sku)
+        if current is None:
+            merged[item.sku] = InventoryUpdate(item.line, item.sku, item.stock_quantity, item.price_adjustment)
+            continue
+        current.line = item.line
+        if item.stock_quantity is not None:
+            current.stock_quantity = item.stock_quantity
+        if item.price_adjustment is not None:
+            current.price_adjustment = item.price_adjustment
+    if not merged:
+        return
+
+    v = values(
+        column("sku", String), column("stock_quantity", Integer), column("price_adjustment", Float), name="v"
+    ).data([(item.sku, item.stock_quantity, item.price_adjustment) for item in merged.values()]).cte("v")
+    # CASTs: a VALUES column that is NULL in every row has no type on PostgreSQL
+    statement = (
+        update(ProductVariant)
+        .where(ProductVariant.sku == v.c.sku)
+        .values(
+            stock_quantity=func.coalesce(cast(v.c.stock_quantity, Integer), ProductVariant.stock_quantity),
+            price_adjustment=func.coalesce(cast(v.c.price_adjustment, Float), ProductVariant.price_adjustment),
+        )
+        .returning(ProductVariant.sku, ProductVariant.product_id)
+    )
+    updated = session.execute(statement).all()
+    session.commit()
+
+    found = {sku for sku, _ in updated}
+    invalidate_products({product_id for _, product_id in updated})
+    report.updated += len(updated)
+    report.batches += 1
+    for item in merged.values():
+        if item.sku not in found:
+            report.fail(item.line, item.sku, "unknown sku")
@@ -0,0 +1,119 @@
+"""
+In-process pub/sub for order status changes, feeding the SSE stream.
+
+Every open stream holds one `Subscription`: a small bounded asyncio queue
+registered under its user id. Idle connections therefore cost a queue and a
+suspended coroutine, and publishing to a user with no open stream is a dict
+lookup.
+
+Status changes are published with `publish_order_status()` after the write
+commits. The event travels over the invalidation bus, so it reaches streams
+held by any worker. When the bus reconnects after losing messages, every
+stream is told to resync instead.
+"""
+import asyncio
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set
+
+from app.config import settings
+from app.metrics import SSE_CONNECTIONS, SSE_EVENTS_DROPPED
+from app.services.cache import bus
+
+TOPIC = "order_status"
+
+# Transitions accepted by the admin status endpoint; payment verification moves pending/expired orders to paid
+ORDER_TRANSITIONS = {
+    "pending": {"paid", "cancelled"},
+    "expired": {"paid", "cancelled"},
+    "paid": {"shipped", "cancelled"},
+    "shipped": {"delivered"},
+}
+# Statuses a verified payment may move to paid
+PAYABLE_STATUSES = tuple(status for status, targets in ORDER_TRANSITIONS.items() if "paid" in targets)
+
+
+class Subscription:
+    def __init__(self, user_id: int, loop: asyncio.AbstractEventLoop, maxsize: int):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+
+    def push(self, event: dict):
+        # Runs on the subscriber's loop. A client that can't keep up loses its
+        # oldest events, which newer statuses for the same order supersede anyway.
+        if self.queue.full():
+            self.queue.get_nowait()
+            SSE_EVENTS_DROPPED.inc()
+        self.queue.put_nowait(event)
+
+
+class OrderEventBroker:
+    def __init__(self, maxsize: Optional[int] = None):
+        self.maxsize = maxsize or settings.SSE_QUEUE_SIZE
+        self._subscriptions: Dict[int, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id: int) -> Subscription:
+        """Registers a stream for `user_id`. Call from the event loop that will read the queue."""
+        subscription = Subscription(user_id, asyncio.get_running_loop(), self.maxsize)
+        with self._lock:
+            self._subscriptions.setdefault(user_id, set()).add(subscription)
+        SSE_CONNECTIONS.inc()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is None or subscription not in subscriptions:
+                return
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.user_id]
+        SSE_CONNECTIONS.dec()
+
+    def deliver(self, events: Optional[List[dict]]):
+        """Bus handler: hands events to the matching local streams, from any thread."""
+        with self._lock:
+            if events is None:
+                targets = [
+                    (subscription, {"type": "resync"})
+                    for subscriptions in self._subscriptions.values()
+                    for subscription in subscriptions
+                ]
+            else:
+                targets = [
+                    (subscription, event)
+                    for event in events
+                    for subscription in self._subscriptions.get(event["user_id"], ())
+                ]
+        for subscription, event in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.push, event)
+            except RuntimeError:
+                # The stream's loop has shut down
+                self.unsubscribe(subscription)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+
+order_events = OrderEventBroker()
+bus.subscribe(TOPIC, order_events.deliver)
+
+
+def order_status_event(order_id: int, user_id: int, status: str, previous: Optional[str]) -> dict:
+    return {
+        "type": "status",
+        "order_id": order_id,
+        "user_id": user_id,
+        "status": status,
+        "previous": previous,
+        "at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def publish_order_status(order_id: int, user_id: int, status: str, previous: Optional[str] = None):
+    """Notifies the user's open streams on every worker. Call after the change committed."""
+    bus.publish(TOPIC, [order_status_event(order_id, user_id, status, previous)])
@@ -1,6 +1,10 @@
+import logging
 import razorpay
+from time import perf_counter
 from app.config import settings
+from app.metrics import PAYMENT_GATEWAY_DURATION, PAYMENT_GATEWAY_ERRORS
 
+logger = logging.getLogger(__name__)
 client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
 
 def create_razorpay_order(amount: int, currency: str = "INR", notes: dict = None):
@@ -13,14 +17,19 @@ def create_razorpay_order(amount: int, currency: str = "INR", notes: dict = None
         "notes": notes or {},
         "payment_capture": 1 # Auto-capture
     }
+    start = perf_counter()
     try:
         order = client.order.create(data=data)
         return order
     except Exception as e:
-        print(f"Razorpay error: {e}")
+        PAYMENT_GATEWAY_ERRORS.labels("create_order").inc()
+        logger.error("Razorpay create_order failed: %s", e)
         raise e
+    finally:
+        PAYMENT_GATEWAY_DURATION.labels("create_order").observe(perf_counter() - start)
 
 def verify_payment_signature(razorpay_order_id: str, razorpay_payment_id: str, razorpay_signature: str):
+    start = perf_counter()
     try:
         params_dict = {
             'razorpay_order_id': razorpay_order_id,
@@ -30,3 +39,5 @@ def verify_payment_signature(razorpay_order_id: str, razorpay_payment_id: str, r
         return client.utility.verify_payment_signature(params_dict)
     except Exception:
         return False
+    finally:
+        PAYMENT_GATEWAY_DURATION.labels("verify_signature").observe(perf_counter() - start)
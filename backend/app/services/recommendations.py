@@ -0,0 +1,127 @@
+"""
+"Frequently bought together" recommendations.
+
+`build_related` is a batch job: it turns paid orders into a sparse
+order x product matrix B, computes the co-occurrence matrix C = BᵀB with
+SciPy, scores every pair by cosine similarity (C[i, j] / sqrt(C[i, i] * C[j, j]))
+and keeps the top K neighbours per product, all without a Python loop over
+products. The result replaces the RelatedProduct table.
+
+Requests read from `related_index`, a dict of product id -> neighbour ids
+loaded once per worker and refreshed every RELATED_INDEX_TTL seconds. A
+build publishes on the invalidation bus, so every worker reloads right away.
+"""
+import threading
+import time
+from array import array
+from typing import Dict, Optional, Tuple
+
+from sqlmodel import Session, select, delete, col
+from app.config import settings
+from app.models import Order, OrderItem, RelatedProduct
+from app.models.order import PAID_STATUSES
+from app.services.cache import bus
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # pragma: no cover - only the batch job needs them
+    np = None
+    sparse = None
+
+INSERT_BATCH_SIZE = 5000
+
+TOPIC = "related"
+
+
+def build_related(session: Session, top_k: Optional[int] = None, min_support: int = 2, batch_size: int = 10000) -> int:
+    """Recomputes RelatedProduct from paid orders. Returns the number of rows written. Commits."""
+    if np is None or sparse is None:
+        raise RuntimeError("numpy and scipy are required to build related products")
+    top_k = top_k or settings.RELATED_PRODUCTS_TOP_K
+
+    order_ids, product_ids = array("q"), array("q")
+    pairs = (
+        select(OrderItem.order_id, OrderItem.product_id)
+        .join(Order, Order.id == OrderItem.order_id)
+        .where(col(Order.status).in_(PAID_STATUSES))
+        .distinct()
+    )
+    for order_id, product_id in session.exec(pairs.execution_options(yield_per=batch_size)):
+        order_ids.append(order_id)
+        product_ids.append(product_id)
+
+    session.exec(delete(RelatedProduct))
+    if not product_ids:
+        session.commit()
+        bus.publish(TOPIC)
+        return 0
+
+    products, product_index = np.unique(np.frombuffer(product_ids, dtype=np.int64), return_inverse=True)
+    _, order_index = np.unique(np.frombuffer(order_ids, dtype=np.int64), return_inverse=True)
+    baskets = sparse.csr_matrix(
+        (np.ones(len(product_index), dtype=np.int32), (order_index, product_index)),
+        shape=(order_index.max() + 1, len(products)),
+    )
+    co_occurrence = (baskets.T @ baskets).tocoo()
+    orders_per_product = np.asarray(baskets.sum(axis=0)).ravel()
+
+    rows, cols, support = co_occurrence.row, co_occurrence.col, co_occurrence.data
+    keep = (rows != cols) & (support >= min_support)
+    rows, cols, support = rows[keep], cols[keep], support[keep]
+    scores = support / np.sqrt(orders_per_product[rows].astype(np.float64) * orders_per_product[cols])
+
+    # Group by product, best score first (ties broken by id), then rank within each group
+    order = np.lexsort((cols, -scores, rows))
+    rows, cols, support, scores = rows[order], cols[order], support[order], scores[order]
+    ranks = np.arange(len(rows)) - np.searchsorted(rows, rows, side="left")
+    top = ranks < top_k
+
+    records = [
+        {"product_id": int(product), "related_product_id": int(related), "rank": int(rank), "score": float(score), "support": int(count)}
+        for product, related, rank, score, count in zip(
+            products[rows[top]], products[cols[top]], ranks[top], scores[top], support[top]
+        )
+    ]
+    for i in range(0, len(records), INSERT_BATCH_SIZE):
+        session.execute(RelatedProduct.__table__.insert(), records[i:i + INSERT_BATCH_SIZE])
+    session.commit()
+    bus.publish(TOPIC)
+    return len(records)
+
+
+class RelatedIndex:
+    def __init__(self):
+        self._neighbours: Dict[int, Tuple[int, ...]] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def invalidate(self, keys: Optional[list] = None):
+        self._loaded_at = None
+
+    def _stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > settings.RELATED_INDEX_TTL
+
+    def ensure(self, session: Session):
+        if not self._stale():
+            return
+        with self._lock:
+            if not self._stale():
+                return
+            neighbours: Dict[int, list] = {}
+            rows = session.exec(
+                select(RelatedProduct.product_id, RelatedProduct.related_product_id)
+                .order_by(RelatedProduct.product_id, RelatedProduct.rank)
+            )
+            for product_id, related_product_id in rows:
+                neighbours.setdefault(product_id, []).append(related_product_id)
+            self._neighbours = {product_id: tuple(ids) for product_id, ids in neighbours.items()}
+            self._loaded_at = time.monotonic()
+
+    def get(self, session: Session, product_id: int) -> Tuple[int, ...]:
+        self.ensure(session)
+        return self._neighbours.get(product_id, ())
+
+
+related_index = RelatedIndex()
+bus.subscribe(TOPIC, related_index.invalidate)
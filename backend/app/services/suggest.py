@@ -0,0 +1,252 @@
+"""
+In-memory prefix index for search-as-you-type suggestions.
+
+Every product title, brand and category name is indexed from each word it
+contains ("Maxi silk top" under "maxi silk top", "silk top" and "top") in one
+sorted list, so the matches for a prefix are a contiguous slice found with two
+bisects. Matches are ranked by `Product.popularity`, the same score the
+"popular" listing sort uses, reloaded every POPULARITY_TTL seconds.
+
+Like the facet index, it is built on first use and kept current from catalog
+change notifications: changed products are re-indexed on the next lookup.
+"""
+import heapq
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from sqlmodel import Session, select, col
+from app.models import Category, Product
+from app.services.cache import on_catalog_change
+
+# Above this share of the catalog a full rebuild is cheaper than per-id reloads
+FULL_REBUILD_RATIO = 0.2
+POPULARITY_TTL = 3600.0
+# Word starts indexed per text; later words rarely start a search
+MAX_WORDS = 8
+RESULT_CACHE_SIZE = 10000
+
+_WORD = re.compile(r"[^\W_]+")
+
+Ref = Tuple[str, Hashable]  # ("product", id) | ("brand", name) | ("category", slug)
+
+
+@dataclass
+class Suggestion:
+    type: str
+    text: str
+    product_id: Optional[int] = None
+    category_slug: Optional[str] = None
+
+
+def normalize(text: str) -> str:
+    return " ".join(_WORD.findall(text.lower()))
+
+
+def index_terms(text: str) -> List[str]:
+    words = normalize(text).split(" ")
+    return [" ".join(words[i:]) for i in range(min(len(words), MAX_WORDS)) if words[i]]
+
+
+class SuggestIndex:
+    def __init__(self):
+        # (term, ref) pairs sorted by term; each ref tuple is shared by all its terms
+        self._entries: List[Tuple[str, Ref]] = []
+        self._products: Dict[int, Tuple[str, str, Optional[str]]] = {}
+        self._brands: Dict[str, Set[int]] = {}
+        self._brand_names: Dict[str, str] = {}
+        self._categories: Dict[str, str] = {}
+        self._category_products: Dict[str, Set[int]] = {}
+        self._popularity: Dict[int, float] = {}
+        self._popularity_loaded_at: Optional[float] = None
+        self._results: Dict[Tuple[str, int], List[Suggestion]] = {}
+        self._group_scores: Dict[Ref, float] = {}
+        self._rank_keys: Dict[Ref, tuple] = {}
+        # Terms touched by an incremental update; only cached results for their prefixes are dropped
+        self._dirty_terms: List[str] = []
+        self._built = False
+        self._pending: Set[int] = set()
+        self._lock = threading.RLock()
+
+    # --- maintenance ---
+
+    def invalidate(self, product_ids: Optional[Iterable[int]] = None):
+        with self._lock:
+            if product_ids is None:
+                self._built = False
+                self._popularity_loaded_at = None
+            else:
+                self._pending.update(product_ids)
+
+    def ensure(self, session: Session):
+        with self._lock:
+            if self._popularity_loaded_at is None or time.monotonic() - self._popularity_loaded_at > POPULARITY_TTL:
+                self._load_popularity(session)
+            if not self._built or len(self._pending) > FULL_REBUILD_RATIO * max(len(self._products), 1):
+                self._rebuild(session)
+            elif self._pending:
+                pending, self._pending = list(self._pending), set()
+                for product_id in pending:
+                    self._remove(product_id)
+                self._load_products(session, pending)
+                self._load_categories(session)
+                dirty, self._dirty_terms = self._dirty_terms, []
+                self._results = {
+                    key: results for key, results in self._results.items()
+                    if not any(term.startswith(key[0]) for term in dirty)
+                }
+                self._group_scores.clear()
+                self._rank_keys.clear()
+
+    def _rebuild(self, session: Session):
+        self._built = False
+        self._entries, self._products, self._brands, self._brand_names = [], {}, {}, {}
+        self._categories, self._category_products = {}, {}
+        self._pending = set()
+        self._load_products(session, None)
+        self._load_categories(session)
+        self._entries.sort()
+        self._clear_results()
+        self._built = True
+
+    def _load_popularity(self, session: Session):
+        rows = session.exec(select(Product.id, Product.popularity).where(Product.popularity > 0))
+        self._popularity = {product_id: float(score) for product_id, score in rows}
+        self._popularity_loaded_at = time.monotonic()
+        self._clear_results()
+
+    def _clear_results(self):
+        self._results.clear()
+        self._group_scores.clear()
+        self._rank_keys.clear()
+
+    def _touch(self, text: Optional[str]):
+        if self._built and text:
+            self._dirty_terms.extend(index_terms(text))
+
+    def _add(self, text: str, ref: Ref):
+        # Bulk loads append and sort once; incremental loads keep the list sorted
+        add = self._entries.append if not self._built else (lambda entry: insort(self._entries, entry))
+        self._touch(text)
+        for term in index_terms(text):
+            add((term, ref))
+
+    def _discard(self, text: str, ref: Ref):
+        for term in index_terms(text):
+            entry = (term, ref)
+            i = bisect_left(self._entries, entry)
+            if i < len(self._entries) and self._entries[i] == entry:
+                del self._entries[i]
+
+    def _load_products(self, session: Session, product_ids: Optional[List[int]]):
+        query = select(Product.id, Product.title, Product.category_slug, Product.brand)
+        if product_ids is not None:
+            query = query.where(col(Product.id).in_(product_ids))
+        for product_id, title, category_slug, brand in session.exec(query):
+            self._products[product_id] = (title, category_slug, brand)
+            self._add(title, ("product", product_id))
+            self._category_products.setdefault(category_slug, set()).add(product_id)
+            # Brand and category rankings depend on their products
+            self._touch(brand)
+            self._touch(self._categories.get(category_slug))
+            if brand:
+                key = normalize(brand)
+                if key not in self._brands:
+                    self._brands[key] = set()
+                    self._brand_names[key] = brand
+                    self._add(brand, ("brand", key))
+                self._brands[key].add(product_id)
+
+    def _load_categories(self, session: Session):
+        categories = dict(session.exec(select(Category.slug, Category.name)).all())
+        for slug, name in categories.items():
+            if self._categories.get(slug) != name:
+                if slug in self._categories:
+                    self._discard(self._categories[slug], ("category", slug))
+                self._categories[slug] = name
+                self._add(name, ("category", slug))
+        for slug in set(self._categories) - set(categories):
+            self._discard(self._categories.pop(slug), ("category", slug))
+
+    def _remove(self, product_id: int):
+        product = self._products.pop(product_id, None)
+        if product is None:
+            return
+        title, category_slug, brand = product
+        self._discard(title, ("product", product_id))
+        self._touch(title)
+        self._touch(brand)
+        self._touch(self._categories.get(category_slug))
+        self._category_products.get(category_slug, set()).discard(product_id)
+        if brand:
+            key = normalize(brand)
+            ids = self._brands.get(key)
+            if ids is not None:
+                ids.discard(product_id)
+                if not ids:
+                    del self._brands[key]
+                    self._discard(self._brand_names.pop(key), ("brand", key))
+
+    # --- queries ---
+
+    def _score(self, kind: str, ref: Hashable) -> float:
+        popularity = self._popularity
+        if kind == "product":
+            return popularity.get(ref, 0.0)
+        score = self._group_scores.get((kind, ref))
+        if score is None:
+            ids = self._brands.get(ref, ()) if kind == "brand" else self._category_products.get(ref, ())
+            # Brands and categories rank above their best seller, and by size when nothing has sold
+            score = sum(popularity.get(i, 0.0) for i in ids) + len(ids) * 1e-6
+            self._group_scores[(kind, ref)] = score
+        return score
+
+    def _text(self, kind: str, ref: Hashable) -> str:
+        if kind == "product":
+            return self._products[ref][0]
+        return self._brand_names[ref] if kind == "brand" else self._categories[ref]
+
+    def _rank_key(self, ref: Ref) -> tuple:
+        key = self._rank_keys.get(ref)
+        if key is None:
+            # Most popular first, then shortest text
+            key = (-self._score(*ref), len(self._text(*ref)), str(ref[1]))
+            self._rank_keys[ref] = key
+        return key
+
+    def _suggestion(self, kind: str, ref: Hashable) -> Suggestion:
+        if kind == "product":
+            return Suggestion(type="product", text=self._products[ref][0], product_id=ref)
+        if kind == "brand":
+            return Suggestion(type="brand", text=self._brand_names[ref])
+        return Suggestion(type="category", text=self._categories[ref], category_slug=ref)
+
+    def suggest(self, session: Session, query: str, limit: int = 8) -> List[Suggestion]:
+        self.ensure(session)
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        key = (prefix, limit)
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None:
+                return cached
+
+            entries = self._entries
+            lo = bisect_left(entries, (prefix,))
+            hi = bisect_left(entries, (prefix + "\uffff",), lo)
+            refs = {ref for _, ref in entries[lo:hi]}
+            best = heapq.nsmallest(limit, refs, key=self._rank_key)
+            results = [self._suggestion(kind, ref) for kind, ref in best]
+
+            if len(self._results) >= RESULT_CACHE_SIZE:
+                self._clear_results()
+            self._results[key] = results
+            return results
+
+
+suggest_index = SuggestIndex()
+on_catalog_change(suggest_index.invalidate)
@@ -0,0 +1,135 @@
+"""
+Background cleanup of data that has outlived its use: expired verification,
+refresh and revoked tokens, carts idle for CART_RETENTION_DAYS (guest carts
+for GUEST_CART_RETENTION_DAYS), and orders
+left `pending` for PENDING_ORDER_TTL_HOURS (archived as `expired`, not deleted).
+
+Every batch is its own short transaction that claims at most
+SWEEPER_BATCH_SIZE rows with `FOR UPDATE SKIP LOCKED`, so the sweeper never
+waits on rows a request is using and several workers can sweep at once
+without stepping on each other.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+from sqlmodel import Session, select, delete, update, col, or_
+from app.config import settings
+from app.metrics import ROWS_SWEPT, SWEEP_DURATION
+from app.models import Cart, CartItem, Order, RefreshToken, RevokedToken
+from app.models.user import EmailVerificationToken
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SweepTask:
+    name: str
+    action: str
+    # Processes one batch of at most `limit` rows and returns how many it handled
+    run_batch: Callable[[Session, int], int]
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def claim_ids(session: Session, model, condition, limit: int) -> List[int]:
+    statement = (
+        select(model.id)
+        .where(condition)
+        .order_by(model.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    return list(session.exec(statement).all())
+
+
+def _delete_expired(model, condition_factory):
+    def run_batch(session: Session, limit: int) -> int:
+        ids = claim_ids(session, model, condition_factory(), limit)
+        if ids:
+            session.exec(delete(model).where(col(model.id).in_(ids)))
+        return len(ids)
+    return run_batch
+
+
+def _sweep_carts(guest: bool):
+    def run_batch(session: Session, limit: int) -> int:
+        days = settings.GUEST_CART_RETENTION_DAYS if guest else settings.CART_RETENTION_DAYS
+        owner = Cart.user_id == None if guest else Cart.user_id != None
+        ids = claim_ids(session, Cart, owner & (Cart.updated_at < _now() - timedelta(days=days)), limit)
+        if ids:
+            session.exec(delete(CartItem).where(col(CartItem.cart_id).in_(ids)))
+            session.exec(delete(Cart).where(col(Cart.id).in_(ids)))
+        return len(ids)
+    return run_batch
+
+
+def _expire_pending_orders(session: Session, limit: int) -> int:
+    cutoff = _now() - timedelta(hours=settings.PENDING_ORDER_TTL_HOURS)
+    ids = claim_ids(session, Order, (Order.status == "pending") & (Order.created_at < cutoff), limit)
+    if ids:
+        session.exec(update(Order).where(col(Order.id).in_(ids)).values(status="expired"))
+    return len(ids)
+
+
+TASKS = [
+    SweepTask("verification_tokens", "deleted", _delete_expired(
+        EmailVerificationToken,
+        lambda: or_(EmailVerificationToken.expires_at < _now(), EmailVerificationToken.is_used == True),
+    )),
+    SweepTask("refresh_tokens", "deleted", _delete_expired(RefreshToken, lambda: RefreshToken.expires_at < _now())),
+    SweepTask("revoked_tokens", "deleted", _delete_expired(RevokedToken, lambda: RevokedToken.expires_at < _now())),
+    SweepTask("carts", "deleted", _sweep_carts(guest=False)),
+    SweepTask("guest_carts", "deleted", _sweep_carts(guest=True)),
+    SweepTask("pending_orders", "archived", _expire_pending_orders),
+]
+
+
+class Sweeper:
+    def __init__(self, tasks: List[SweepTask]):
+        self.tasks = tasks
+        self._thread: Optional[threading.Thread] = None
+
+    def run_task(self, engine, task: SweepTask) -> int:
+        total = 0
+        start = time.perf_counter()
+        while True:
+            with Session(engine) as session:
+                swept = task.run_batch(session, settings.SWEEPER_BATCH_SIZE)
+                session.commit()
+            total += swept
+            ROWS_SWEPT.labels(task.name, task.action).inc(swept)
+            if swept < settings.SWEEPER_BATCH_SIZE:
+                break
+            time.sleep(settings.SWEEPER_BATCH_PAUSE)
+        SWEEP_DURATION.labels(task.name).observe(time.perf_counter() - start)
+        return total
+
+    def run_once(self, engine) -> Dict[str, int]:
+        results = {}
+        for task in self.tasks:
+            try:
+                results[task.name] = self.run_task(engine, task)
+            except Exception:
+                logger.exception("Sweeper task %s failed", task.name)
+        return results
+
+    def start(self, engine):
+        if not settings.SWEEPER_ENABLED or self._thread is not None:
+            return
+
+        def run():
+            while True:
+                self.run_once(engine)
+                time.sleep(settings.SWEEPER_INTERVAL)
+
+        self._thread = threading.Thread(target=run, name="sweeper", daemon=True)
+        self._thread.start()
+
+
+sweeper = Sweeper(TASKS)
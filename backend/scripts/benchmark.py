@@ -0,0 +1,376 @@
+"""
+Benchmarks the API hot paths in-process against a synthetic catalog.
+
+    python -m scripts.benchmark --products 5000 --requests 300 --output bench.json
+    python -m scripts.benchmark --compare bench.json
+    python -m scripts.benchmark --fast-json compare
+
+The database defaults to a throwaway SQLite file; pass --db-url to run
+against a local Postgres instead (its tables are created if missing, and the
+synthetic catalog is added on top of whatever is already there). Razorpay and
+SMTP are replaced by local fakes, so no network access is needed.
+
+`--fast-json compare` runs every scenario with FAST_JSON_RESPONSES off and
+then on, and reports the latency the fast serialization path saves per route.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+# Add backend to sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SIZES = ["S", "M", "L", "XL"]
+COLORS = ["Black", "Steel", "Ghost"]
+BRANDS = ["Aurelle", "Noir Studio", "Maison Vale", "Kora", "Linea", "Sable", "Odette", "Mira"]
+WORDS = ["linen", "silk", "wrap", "midi", "maxi", "tailored", "cropped", "pleated", "satin", "knit", "denim", "cotton"]
+GARMENTS = ["dress", "blazer", "skirt", "shirt", "trousers", "coat", "cardigan", "top"]
+CATEGORIES = ["dresses", "tops", "outerwear", "skirts", "trousers", "knitwear", "denim", "tailoring"]
+
+BENCH_PASSWORD = "benchmark-password"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db-url", help="Database to benchmark against (default: temporary SQLite file)")
+    parser.add_argument("--products", type=int, default=2000, help="Size of the synthetic catalog")
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=1, help="Client threads per scenario")
+    parser.add_argument("--scenarios", help="Comma-separated subset of scenarios to run")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for data and request mix")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="Previous JSON results to compare against")
+    parser.add_argument(
+        "--fast-json", choices=["default", "off", "on", "compare"], default="default",
+        help="Force FAST_JSON_RESPONSES, or measure both settings per scenario",
+    )
+    return parser.parse_args()
+
+
+def configure_environment(args) -> str | None:
+    """Points the app at the benchmark database. Must run before `app` is imported."""
+    tmp_path = None
+    if not args.db_url:
+        fd, tmp_path = tempfile.mkstemp(prefix="womanly-bench-", suffix=".db")
+        os.close(fd)
+        args.db_url = f"sqlite:///{tmp_path}"
+    os.environ["DATABASE_URL"] = args.db_url
+    for var in ("POSTGRES_USER", "POSTGRES_PASSWORD", "POSTGRES_DB"):
+        os.environ.setdefault(var, "benchmark")
+    # Keep background cleanup out of the measurements
+    os.environ.setdefault("SWEEPER_ENABLED", "false")
+    return tmp_path
+
+
+def seed_catalog(engine, n_products: int, rng: random.Random) -> dict:
+    """Bulk-inserts a synthetic catalog plus one verified user."""
+    from sqlalchemy import insert
+    from sqlmodel import Session, select, func
+    from app.models import Category, Product, User
+    from app.models.product import ProductImage, ProductVariant
+    from app.security.hashing import get_password_hash
+
+    run_id = f"{int(time.time())}{rng.randrange(1000):03d}"
+    with Session(engine) as session:
+        existing = set(session.exec(select(Category.slug)).all())
+        new_categories = [
+            {"name": slug.title(), "slug": slug} for slug in CATEGORIES if slug not in existing
+        ]
+        if new_categories:
+            session.execute(insert(Category), new_categories)
+        cat_ids = dict(session.exec(select(Category.slug, Category.id)).all())
+
+        first_id = (session.exec(select(func.max(Product.id))).one() or 0) + 1
+        products, images, variants = [], [], []
+        for i in range(n_products):
+            product_id = first_id + i
+            slug = rng.choice(CATEGORIES)
+            title = f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {rng.choice(GARMENTS)} {product_id}"
+            products.append({
+                "id": product_id,
+                "title": title,
+                "description": " ".join(rng.choice(WORDS) for _ in range(60)),
+                "price": round(rng.uniform(15, 400), 2),
+                "brand": rng.choice(BRANDS),
+                "thumbnail": f"https://cdn.example.com/p/{product_id}/thumb.jpg",
+                "category_slug": slug,
+                "category_id": cat_ids[slug],
+            })
+            for order in range(3):
+                images.append({
+                    "product_id": product_id,
+                    "image_url": f"https://cdn.example.com/p/{product_id}/{order}.jpg",
+                    "display_order": order,
+                    "is_primary": order == 0,
+                })
+            for size in SIZES:
+                for color in COLORS:
+                    variants.append({
+                        "product_id": product_id,
+                        "sku": f"bench-{run_id}-{product_id}-{size}-{color}",
+                        "size": size,
+                        "color": color,
+                        "price_adjustment": 0.0,
+                        "stock_quantity": rng.randint(0, 25),
+                        "is_available": True,
+                    })
+        session.execute(insert(Product), products)
+        session.execute(insert(ProductImage), images)
+        session.execute(insert(ProductVariant), variants)
+
+        email = f"bench-{run_id}@example.com"
+        session.execute(insert(User), [{
+            "email": email,
+            "full_name": "Benchmark User",
+            "hashed_password": get_password_hash(BENCH_PASSWORD),
+            "is_active": True,
+            "is_verified": True,
+            "is_superuser": False,
+        }])
+        session.commit()
+
+        product_ids = [p["id"] for p in products]
+        variant_ids = session.exec(
+            select(ProductVariant.id).where(ProductVariant.product_id.in_(product_ids[:200]))
+        ).all()
+    return {"email": email, "product_ids": product_ids, "variant_ids": variant_ids}
+
+
+def install_fakes():
+    """Replaces Razorpay and SMTP with in-process fakes."""
+    import itertools
+    from app.api import payments
+
+    counter = itertools.count(1)
+
+    def fake_create_order(amount: int, currency: str = "INR", notes: dict = None):
+        return {"id": f"order_bench_{next(counter)}", "amount": amount, "currency": currency}
+
+    async def fake_send(*args, **kwargs):
+        return None
+
+    payments.create_razorpay_order = fake_create_order
+    payments.verify_payment_signature = lambda *args: True
+    payments.send_order_confirmation = fake_send
+
+
+def build_scenarios(client, data: dict, rng: random.Random) -> dict:
+    product_ids = data["product_ids"]
+    variant_ids = data["variant_ids"]
+    login_form = {"username": data["email"], "password": BENCH_PASSWORD}
+
+    response = client.post("/auth/login", data=login_form)
+    response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    pages = max(1, len(product_ids) // 24)
+
+    def products_page():
+        return client.get("/products", params={"skip": rng.randrange(pages) * 24, "limit": 24})
+
+    def products_search():
+        return client.get("/products", params={"q": rng.choice(WORDS)})
+
+    def product_detail():
+        return client.get(f"/products/{rng.choice(product_ids)}")
+
+    def cart_add():
+        return client.post("/cart/items", json={"variant_id": rng.choice(variant_ids), "quantity": 1}, headers=headers)
+
+    def cart_get():
+        return client.get("/cart/", headers=headers)
+
+    def auth_login():
+        return client.post("/auth/login", data=login_form)
+
+    def orders_history():
+        return client.get("/payments/orders/me", headers=headers)
+
+    def checkout():
+        # Measures create-order + verify; the cart is refilled first, unmeasured
+        client.post("/cart/items", json={"variant_id": rng.choice(variant_ids), "quantity": 1}, headers=headers)
+        start = time.perf_counter()
+        order = client.post("/payments/create-order", headers=headers)
+        order.raise_for_status()
+        verify = client.post("/payments/verify", headers=headers, json={
+            "razorpay_order_id": order.json()["id"],
+            "razorpay_payment_id": f"pay_{order.json()['db_order_id']}",
+            "razorpay_signature": "benchmark",
+        })
+        return verify, time.perf_counter() - start
+
+    return {
+        "products_page": products_page,
+        "products_search": products_search,
+        "product_detail": product_detail,
+        "cart_add": cart_add,
+        "cart_get": cart_get,
+        "auth_login": auth_login,
+        "checkout": checkout,
+        "orders_history": orders_history,
+    }
+
+
+def percentile(sorted_values, pct: float) -> float:
+    index = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run_scenario(fn, requests: int, warmup: int, concurrency: int) -> dict:
+    def timed():
+        start = time.perf_counter()
+        result = fn()
+        if isinstance(result, tuple):
+            response, elapsed = result
+        else:
+            response, elapsed = result, time.perf_counter() - start
+        response.raise_for_status()
+        return elapsed
+
+    for _ in range(warmup):
+        timed()
+
+    wall_start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(lambda _: timed(), range(requests)))
+    else:
+        latencies = [timed() for _ in range(requests)]
+    wall = time.perf_counter() - wall_start
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "throughput_rps": round(requests / wall, 2),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def run_fast_json_comparison(fn, args) -> dict:
+    from app.config import settings
+
+    stats = {}
+    for enabled in (False, True):
+        settings.FAST_JSON_RESPONSES = enabled
+        stats["on" if enabled else "off"] = run_scenario(fn, args.requests, args.warmup, args.concurrency)
+    off, on = stats["off"], stats["on"]
+    return {
+        **on,
+        "fast_json_off": off,
+        "fast_json_saved_p50_ms": round(off["p50_ms"] - on["p50_ms"], 3),
+        "fast_json_saved_mean_ms": round(off["mean_ms"] - on["mean_ms"], 3),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: dict, baseline: dict | None):
+    header = f"{'scenario':<18}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    if baseline:
+        header += f"{'p50 vs base':>14}"
+    fast_json = results["params"].get("fast_json") == "compare"
+    if fast_json:
+        header += f"{'fast json saves':>17}"
+    print(header)
+    for name, stats in results["scenarios"].items():
+        line = f"{name:<18}{stats['throughput_rps']:>10}{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}"
+        base = (baseline or {}).get("scenarios", {}).get(name)
+        if base:
+            change = (stats["p50_ms"] - base["p50_ms"]) / base["p50_ms"] * 100
+            line += f"{change:>+13.1f}%"
+        if fast_json:
+            line += f"{stats['fast_json_saved_p50_ms']:>14.3f} ms"
+        print(line)
+
+
+def main():
+    args = parse_args()
+    tmp_path = configure_environment(args)
+    rng = random.Random(args.seed)
+
+    from fastapi.testclient import TestClient
+    from sqlmodel import SQLModel
+    from app.db import engine
+    from app.main import app
+
+    from app.config import settings
+
+    # A log line or two per request (access log, TestClient) would bury the report
+    for name in ("app.access", "httpx"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    if args.fast_json in ("on", "off"):
+        settings.FAST_JSON_RESPONSES = args.fast_json == "on"
+    SQLModel.metadata.create_all(engine)
+    install_fakes()
+
+    try:
+        print(f"Seeding {args.products} products into {engine.dialect.name}...")
+        seed_start = time.perf_counter()
+        data = seed_catalog(engine, args.products, rng)
+        print(f"Seeded in {time.perf_counter() - seed_start:.1f}s")
+
+        with TestClient(app) as client:
+            scenarios = build_scenarios(client, data, rng)
+            selected = args.scenarios.split(",") if args.scenarios else list(scenarios)
+            results = {
+                "commit": git_commit(),
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "database": engine.dialect.name,
+                "params": {
+                    "products": args.products,
+                    "requests": args.requests,
+                    "warmup": args.warmup,
+                    "concurrency": args.concurrency,
+                    "seed": args.seed,
+                    "fast_json": args.fast_json,
+                },
+                "scenarios": {},
+            }
+            for name in selected:
+                print(f"Running {name}...")
+                if args.fast_json == "compare":
+                    results["scenarios"][name] = run_fast_json_comparison(scenarios[name], args)
+                else:
+                    results["scenarios"][name] = run_scenario(
+                        scenarios[name], args.requests, args.warmup, args.concurrency
+                    )
+    finally:
+        engine.dispose()
+        if tmp_path:
+            os.remove(tmp_path)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
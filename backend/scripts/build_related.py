@@ -0,0 +1,27 @@
+import argparse
+import sys
+import os
+import time
+
+# Add backend to sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlmodel import Session, SQLModel
+from app.config import settings
+from app.db import engine
+from app.services.recommendations import build_related
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild 'frequently bought together' recommendations from paid orders.")
+    parser.add_argument("--top-k", type=int, default=settings.RELATED_PRODUCTS_TOP_K, help="Neighbours to keep per product")
+    parser.add_argument("--min-support", type=int, default=2, help="Minimum number of shared orders for a pair")
+    args = parser.parse_args()
+
+    SQLModel.metadata.create_all(engine)
+    start = time.perf_counter()
+    with Session(engine) as session:
+        written = build_related(session, top_k=args.top_k, min_support=args.min_support)
+    print(f"Wrote {written:,} related products in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
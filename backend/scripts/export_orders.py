@@ -0,0 +1,40 @@
+import argparse
+import sys
+import os
+from datetime import datetime, timedelta, timezone
+
+# Add backend to sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlmodel import Session
+from app.db import engine
+from app.services.analytics import as_utc
+from app.services.order_export import FORMATS, encode, iter_order_rows
+
+def parse_date(value: str) -> datetime:
+    # Dates without an offset are UTC; explicit offsets are respected
+    return as_utc(datetime.fromisoformat(value))
+
+def main():
+    parser = argparse.ArgumentParser(description="Export orders (one row per item) for reconciliation against payment settlements.")
+    parser.add_argument("--start", type=parse_date, help="First day (YYYY-MM-DD, UTC, or an ISO timestamp with offset); defaults to 7 days ago")
+    parser.add_argument("--end", type=parse_date, help="Day after the last one (YYYY-MM-DD, UTC, or an ISO timestamp with offset); defaults to now")
+    parser.add_argument("--by", choices=["created", "paid"], default="created", help="Which timestamp the range applies to")
+    parser.add_argument("--status", help="Only orders with this status, e.g. paid")
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--output", help="File to write (default: stdout)")
+    args = parser.parse_args()
+
+    end = args.end or datetime.now(timezone.utc)
+    start = args.start or end - timedelta(days=7)
+    out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    try:
+        with Session(engine) as session:
+            for chunk in encode(iter_order_rows(session, start, end, by=args.by, status=args.status), args.format):
+                out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+import argparse
+import sys
+import os
+
+# Add backend to sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlmodel import Session, SQLModel
+from app.db import engine
+from app.services.catalog_import import DEFAULT_BATCH_SIZE, import_catalog, iter_records
+
+def main():
+    parser = argparse.ArgumentParser(description="Import a product catalog from JSON, NDJSON or CSV files.")
+    parser.add_argument("paths", nargs="+", help="Catalog files to import")
+    parser.add_argument("--format", choices=["json", "ndjson", "jsonl", "csv"], help="Override the format detected from the file extension")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--incremental", action="store_true", help="Skip unchanged products and write only changed variants/images")
+    args = parser.parse_args()
+
+    SQLModel.metadata.create_all(engine)
+
+    def progress(stats):
+        print(f"  {stats.products:,} products ({stats.products_per_second:,.0f}/s)", flush=True)
+
+    with Session(engine) as session:
+        for path in args.paths:
+            print(f"Importing {path}...")
+            stats = import_catalog(session, iter_records(path, args.format), args.batch_size, on_batch=progress, incremental=args.incremental)
+            print(f"Done: {stats.summary()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+import argparse
+import sys
+import os
+from datetime import datetime, timedelta, timezone
+
+# Add backend to sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlmodel import Session
+from app.db import engine
+from app.services.analytics import rebuild_rollups, rebuild_popularity
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute the sales rollups from the order tables (backfill or repair).")
+    parser.add_argument("--days", type=int, default=7, help="Number of days back from today to recompute")
+    parser.add_argument("--popularity", action="store_true", help="Also recompute product popularity scores from all paid orders")
+    args = parser.parse_args()
+
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(days=args.days)
+    with Session(engine) as session:
+        written = rebuild_rollups(session, start, end)
+        print(f"Rebuilt rollups from {start:%Y-%m-%d}: {written:,} rows")
+        if args.popularity:
+            print(f"Rebuilt popularity: {rebuild_popularity(session):,} products with sales")
+
+if __name__ == "__main__":
+    main()
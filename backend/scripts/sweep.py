@@ -0,0 +1,22 @@
+import argparse
+import sys
+import os
+
+# Add backend to sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db import engine
+from app.services.sweeper import sweeper
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the maintenance sweeper once (e.g. from cron with SWEEPER_ENABLED=false).")
+    parser.add_argument("--task", action="append", choices=[task.name for task in sweeper.tasks], help="Only run these tasks")
+    args = parser.parse_args()
+
+    for task in sweeper.tasks:
+        if args.task and task.name not in args.task:
+            continue
+        print(f"{task.name}: {sweeper.run_task(engine, task):,} rows {task.action}")
+
+if __name__ == "__main__":
+    main()
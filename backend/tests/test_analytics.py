@@ -0,0 +1,16 @@
+from datetime import datetime, timedelta, timezone
+
+from app.services.analytics import bucket_start, popularity_weight
+
+
+def test_naive_timestamps_are_utc():
+    naive = datetime(2026, 3, 1, 23, 30)
+    aware = naive.replace(tzinfo=timezone.utc)
+    assert bucket_start(naive, "hour") == datetime(2026, 3, 1, 23, tzinfo=timezone.utc)
+    assert bucket_start(naive, "day") == bucket_start(aware, "day")
+    assert popularity_weight(naive) == popularity_weight(aware)
+
+
+def test_offsets_are_converted_to_utc():
+    ist = timezone(timedelta(hours=5, minutes=30))
+    assert bucket_start(datetime(2026, 3, 2, 3, 0, tzinfo=ist), "day") == datetime(2026, 3, 1, tzinfo=timezone.utc)
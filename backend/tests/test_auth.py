@@ -0,0 +1,56 @@
+from conftest import PASSWORD
+
+
+def login(client, email, password=PASSWORD):
+    return client.post("/auth/login", data={"username": email, "password": password})
+
+
+def test_signup_returns_tokens_and_sends_verification(client, mailer):
+    response = client.post("/auth/signup", json={"email": "new@example.com", "password": "secret-pw", "full_name": "New"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["access_token"] and body["refresh_token"]
+    assert body["user"]["email"] == "new@example.com"
+    assert [kind for kind, email, _ in mailer.sent] == ["verification"]
+
+    token = mailer.sent[0][2]
+    assert client.post("/auth/verify-email", params={"token": token}).status_code == 200
+    me = client.get("/auth/me", headers={"Authorization": f"Bearer {body['access_token']}"})
+    assert me.json()["is_verified"] is True
+
+
+def test_login_rejects_wrong_password(client, make_user):
+    user = make_user()
+    assert login(client, user.email, "wrong").status_code == 400
+    assert login(client, user.email).status_code == 200
+
+
+def test_refresh_rotates_and_detects_reuse(client, make_user):
+    user = make_user()
+    first = login(client, user.email).json()["refresh_token"]
+
+    rotated = client.post("/auth/refresh", json={"refresh_token": first})
+    assert rotated.status_code == 200
+    second = rotated.json()["refresh_token"]
+    assert second != first
+
+    # Presenting the rotated token again revokes the whole family, including the new one
+    assert client.post("/auth/refresh", json={"refresh_token": first}).status_code == 401
+    assert client.post("/auth/refresh", json={"refresh_token": second}).status_code == 401
+
+
+def test_logout_revokes_access_token(client, make_user):
+    user = make_user()
+    tokens = login(client, user.email).json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    assert client.get("/auth/me", headers=headers).status_code == 200
+
+    response = client.post("/auth/logout", json={"refresh_token": tokens["refresh_token"]}, headers=headers)
+    assert response.status_code == 200
+    assert client.get("/auth/me", headers=headers).status_code == 401
+    assert client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 401
+
+
+def test_inactive_user_is_rejected(client, make_user, auth_headers):
+    user = make_user(active=False)
+    assert client.get("/auth/me", headers=auth_headers(user)).status_code == 401
@@ -0,0 +1,73 @@
+from app.config import settings
+from conftest import PASSWORD
+
+
+def variant_id(product, size="S"):
+    return next(v.id for v in product.variants if v.size == size)
+
+
+def test_adding_a_variant_twice_adds_quantity(client, make_user, make_product, auth_headers):
+    headers = auth_headers(make_user())
+    product = make_product(price=20.0)
+    for quantity in (1, 2):
+        response = client.post("/cart/items", json={"variant_id": variant_id(product), "quantity": quantity}, headers=headers)
+        assert response.status_code == 200
+    cart = client.get("/cart", headers=headers).json()
+    assert len(cart["items"]) == 1
+    assert cart["count"] == 3
+    assert cart["subtotal"] == 60.0
+
+
+def test_guest_cart_merges_on_login(client, make_user, make_product, auth_headers):
+    user = make_user()
+    shirt, skirt = make_product(), make_product()
+    client.post("/cart/items", json={"variant_id": variant_id(shirt), "quantity": 1}, headers=auth_headers(user))
+
+    guest = client.post("/cart/items", json={"variant_id": variant_id(shirt), "quantity": 2})
+    assert settings.GUEST_CART_COOKIE in guest.cookies
+    client.post("/cart/items", json={"variant_id": variant_id(skirt), "quantity": 1})
+    assert client.get("/cart").json()["count"] == 3
+
+    response = client.post("/auth/login", data={"username": user.email, "password": PASSWORD})
+    assert response.status_code == 200
+    assert settings.GUEST_CART_COOKIE not in client.cookies
+
+    cart = client.get("/cart", headers=auth_headers(user)).json()
+    quantities = {item["variant_id"]: item["quantity"] for item in cart["items"]}
+    assert quantities == {variant_id(shirt): 3, variant_id(skirt): 1}
+
+
+def test_tampered_guest_cookie_is_ignored(client, make_product):
+    product = make_product()
+    client.post("/cart/items", json={"variant_id": variant_id(product), "quantity": 1})
+    value = client.cookies[settings.GUEST_CART_COOKIE]
+    client.cookies.set(settings.GUEST_CART_COOKIE, "9" + value[1:])
+    assert client.get("/cart").json()["items"] == []
+
+
+def test_cannot_remove_another_users_item(client, make_user, make_product, auth_headers):
+    owner, other = make_user(), make_user()
+    product = make_product()
+    cart = client.post("/cart/items", json={"variant_id": variant_id(product), "quantity": 1}, headers=auth_headers(owner)).json()
+    item_id = cart["items"][0]["id"]
+
+    assert client.delete(f"/cart/items/{item_id}", headers=auth_headers(other)).status_code == 403
+    assert client.delete(f"/cart/items/{item_id}").status_code == 403
+    response = client.delete(f"/cart/items/{item_id}", headers=auth_headers(owner))
+    assert response.status_code == 200
+    assert response.json()["items"] == []
+
+
+def test_merge_keeps_guest_options_when_given(client, make_user, make_product, auth_headers):
+    user = make_user()
+    shirt, skirt = make_product(), make_product()
+    for product in (shirt, skirt):
+        client.post("/cart/items", json={"variant_id": variant_id(product), "quantity": 1, "selected_options": "gift wrap"}, headers=auth_headers(user))
+
+    client.post("/cart/items", json={"variant_id": variant_id(shirt), "quantity": 1, "selected_options": "no wrap"})
+    client.post("/cart/items", json={"variant_id": variant_id(skirt), "quantity": 1})
+    client.post("/auth/login", data={"username": user.email, "password": PASSWORD})
+
+    cart = client.get("/cart", headers=auth_headers(user)).json()
+    options = {item["variant_id"]: item["selected_options"] for item in cart["items"]}
+    assert options == {variant_id(shirt): "no wrap", variant_id(skirt): "gift wrap"}
@@ -0,0 +1,49 @@
+import io
+import json
+
+from sqlmodel import select
+
+from app.models import Product
+from app.models.product import ProductVariant
+from app.services.catalog_import import CatalogImporter, _iter_json
+
+
+def record(external_id, title, sku, stock=10):
+    return {
+        "external_id": external_id,
+        "title": title,
+        "price": 30,
+        "category": "tops",
+        "images": ["https://img.test/a.jpg"],
+        "variants": [{"sku": sku, "size": "M", "color": "Black", "stock_quantity": stock}],
+    }
+
+
+def test_reimport_updates_products_in_place(session):
+    importer = CatalogImporter(session)
+    first = importer.import_batch([record("feed-1", "Ribbed tank", "ribbed-tank-M")])
+    second = importer.import_batch([record("feed-1", "Ribbed tank", "ribbed-tank-M", stock=3)])
+    assert first == second
+    variant = session.exec(select(ProductVariant).where(ProductVariant.sku == "ribbed-tank-M")).one()
+    assert (variant.product_id, variant.stock_quantity) == (first["feed-1"], 3)
+
+
+def test_products_without_external_id_are_matched_by_title(session):
+    legacy = Product(title="Wrap blouse", description="", price=30, category_slug="tops")
+    session.add(legacy)
+    session.commit()
+    session.add(ProductVariant(product_id=legacy.id, sku="wrap-blouse-M-Black", size="M", color="Black", stock_quantity=10))
+    session.commit()
+
+    ids = CatalogImporter(session).import_batch([record("dummyjson-7", "Wrap blouse", "wrap-blouse-M-Black")])
+    assert ids == {"dummyjson-7": legacy.id}
+    assert len(session.exec(select(Product.id).where(Product.title == "Wrap blouse")).all()) == 1
+    variant = session.exec(select(ProductVariant).where(ProductVariant.sku == "wrap-blouse-M-Black")).one()
+    assert variant.product_id == legacy.id
+
+
+def test_json_array_streams_across_chunks():
+    records = [record(f"ext-{i}", f"Title {i}", f"sku-{i}") for i in range(20)]
+    text = " [\n" + ",\n".join(json.dumps(r) for r in records) + "\n]\n"
+    for chunk_size in (7, 64, 1 << 16):
+        assert list(_iter_json(io.StringIO(text), chunk_size)) == records
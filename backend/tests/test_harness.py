@@ -0,0 +1,37 @@
+from fastapi import Depends
+from sqlmodel import Session, select
+from app.db import get_session
+from app.main import app
+from app.models import User
+
+
+def test_commits_are_rolled_back_between_tests_a(session, make_user):
+    make_user(email="isolated@example.com")
+    assert session.exec(select(User).where(User.email == "isolated@example.com")).first() is not None
+
+
+def test_commits_are_rolled_back_between_tests_b(session):
+    assert session.exec(select(User).where(User.email == "isolated@example.com")).first() is None
+
+
+def test_app_rollback_only_undoes_its_savepoint(client, session, make_user):
+    user = make_user(email="taken@example.com")
+
+    # Writes, then rolls back, as a route does when it loses a race
+    def write_then_roll_back(session: Session = Depends(get_session)):
+        renamed = session.get(User, user.id)
+        renamed.full_name = "Renamed"
+        session.add(renamed)
+        session.add(User(email="rolled-back@example.com", full_name="X", hashed_password="x"))
+        session.flush()
+        session.rollback()
+
+    app.add_api_route("/_test/rollback", write_then_roll_back, methods=["POST"])
+    try:
+        assert client.post("/_test/rollback").status_code == 200
+    finally:
+        app.router.routes.pop()
+
+    session.expire_all()
+    assert session.get(User, user.id).full_name == "Test User"
+    assert session.exec(select(User).where(User.email == "rolled-back@example.com")).first() is None
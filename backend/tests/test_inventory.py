@@ -0,0 +1,43 @@
+def test_bulk_update_reports_unknown_skus(client, make_user, make_product, auth_headers):
+    admin = auth_headers(make_user(superuser=True))
+    product = make_product(stock=5)
+    body = "\n".join([
+        '{"sku": "%d-S", "stock_quantity": 0}' % product.id,
+        '{"sku": "%d-M", "stock_quantity": 12}' % product.id,
+        '{"sku": "missing", "stock_quantity": 1}',
+        'not json',
+    ])
+    response = client.post("/inventory/variants", content=body, headers={**admin, "Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    report = response.json()
+    assert (report["received"], report["updated"], report["failed"]) == (4, 2, 2)
+    assert [error["line"] for error in report["errors"]] == [3, 4]
+
+    stock = {v["size"]: v["stock_quantity"] for v in client.get(f"/products/{product.id}").json()["variants"]}
+    assert stock == {"S": 0, "M": 12}
+
+
+def test_csv_header_and_permissions(client, make_user, auth_headers):
+    csv_headers = {"Content-Type": "text/csv"}
+    assert client.post("/inventory/variants", content="sku,stock\n", headers={**auth_headers(make_user()), **csv_headers}).status_code == 403
+    admin = auth_headers(make_user(superuser=True))
+    assert client.post("/inventory/variants", content="colour\nred\n", headers={**admin, **csv_headers}).status_code == 400
+
+
+def test_non_finite_prices_and_fractional_stock_are_rejected(client, make_user, make_product, auth_headers):
+    admin = auth_headers(make_user(superuser=True))
+    product = make_product(stock=5)
+    sku = f"{product.id}-S"
+    body = "\n".join([
+        '{"sku": "%s", "price_adjustment": NaN}' % sku,
+        '{"sku": "%s", "price_adjustment": "Infinity"}' % sku,
+        '{"sku": "%s", "stock_quantity": 5.7}' % sku,
+        '{"sku": "%s", "stock_quantity": true}' % sku,
+        '{"sku": "%s", "stock_quantity": "3.0", "price_adjustment": "2.5"}' % sku,
+    ])
+    report = client.post("/inventory/variants", content=body, headers={**admin, "Content-Type": "application/x-ndjson"}).json()
+    assert (report["updated"], report["failed"]) == (1, 4)
+    assert [error["line"] for error in report["errors"]] == [1, 2, 3, 4]
+
+    variant = next(v for v in client.get(f"/products/{product.id}").json()["variants"] if v["size"] == "S")
+    assert (variant["stock_quantity"], variant["price_adjustment"]) == (3, 2.5)
@@ -0,0 +1,72 @@
+import json
+import logging
+import queue
+import sys
+
+from sqlalchemy import create_engine, text
+
+from app.logging_config import JsonFormatter, _QueueHandler, request_id, track_slow_queries
+from app.metrics import LOG_RECORDS_DROPPED
+
+
+def test_request_id_is_echoed_or_generated(client):
+    assert client.get("/health", headers={"X-Request-ID": "req-42"}).headers["X-Request-ID"] == "req-42"
+    generated = client.get("/health", headers={"X-Request-ID": "not valid!"}).headers["X-Request-ID"]
+    assert generated != "not valid!" and len(generated) == 32
+
+
+def test_access_log_carries_request_id(client, caplog):
+    with caplog.at_level(logging.INFO, logger="app.access"):
+        client.get("/health", params={"access_token": "secret"}, headers={"X-Request-ID": "req-43"})
+    record = next(r for r in caplog.records if r.name == "app.access")
+    assert (record.method, record.path, record.status) == ("GET", "/health", 200)
+    assert "secret" not in record.getMessage()
+
+
+def test_queued_records_are_json_with_request_id():
+    handler = _QueueHandler(queue.Queue())
+    token = request_id.set("req-44")
+    try:
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            record = logging.getLogger("test").makeRecord(
+                "test", logging.ERROR, __file__, 1, "Failed for %s", ("order 7",), sys.exc_info(), extra={"order_id": 7},
+            )
+        prepared = handler.prepare(record)
+    finally:
+        request_id.reset(token)
+
+    entry = json.loads(JsonFormatter().format(prepared))
+    assert entry["message"] == "Failed for order 7"
+    assert entry["request_id"] == "req-44"
+    assert entry["order_id"] == 7
+    assert "ValueError: boom" in entry["exception"]
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = _QueueHandler(queue.Queue(maxsize=1))
+    before = LOG_RECORDS_DROPPED.collect().get((), 0.0)
+    for _ in range(3):
+        handler.emit(logging.makeLogRecord({"msg": "hello"}))
+    assert handler.queue.qsize() == 1
+    assert LOG_RECORDS_DROPPED.collect()[()] == before + 2
+
+
+def test_slow_queries_are_logged_without_parameter_values(caplog):
+    engine = create_engine("sqlite://")
+    track_slow_queries(engine, threshold_ms=0, sample_rate=1.0)
+    with caplog.at_level(logging.WARNING, logger="app.sql"), engine.connect() as connection:
+        connection.execute(text("SELECT :card"), {"card": "4111111111111111"})
+    record = next(r for r in caplog.records if r.name == "app.sql")
+    assert record.statement == "SELECT ?"
+    assert record.parameters == ["?"]
+    assert "4111" not in JsonFormatter().format(record)
+
+
+def test_sampling_and_threshold_skip_fast_queries(caplog):
+    engine = create_engine("sqlite://")
+    track_slow_queries(engine, threshold_ms=10_000, sample_rate=1.0)
+    with caplog.at_level(logging.WARNING, logger="app.sql"), engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    assert not [r for r in caplog.records if r.name == "app.sql"]
@@ -0,0 +1,158 @@
+import csv
+import io
+
+import pytest
+from sqlmodel import select
+
+from app.models import Product, SalesRollup
+from app.services.analytics import rebuild_popularity, rollup_buffer
+
+
+@pytest.fixture
+def paid_order(client, razorpay, make_user, make_product, auth_headers):
+    """Checks out a cart with two items through the fake Razorpay."""
+    user = make_user()
+    headers = auth_headers(user)
+    product = make_product(price=25.0)
+    client.post("/cart/items", json={"variant_id": product.variants[0].id, "quantity": 2}, headers=headers)
+
+    created = client.post("/payments/create-order", headers=headers).json()
+    assert created["amount"] == 5000
+    verify = {
+        "razorpay_order_id": created["id"],
+        "razorpay_payment_id": "pay_1",
+        "razorpay_signature": razorpay.sign(created["id"], "pay_1"),
+    }
+    response = client.post("/payments/verify", json=verify, headers=headers)
+    assert response.status_code == 200
+    return user, created["db_order_id"], verify
+
+
+def test_checkout_pays_order_and_clears_cart(client, mailer, paid_order, auth_headers):
+    user, order_id, _ = paid_order
+    headers = auth_headers(user)
+    orders = client.get("/payments/orders/me", headers=headers).json()
+    assert [(o["id"], o["status"]) for o in orders] == [(order_id, "paid")]
+    assert client.get("/cart", headers=headers).json()["items"] == []
+    assert ("order_confirmation", user.email, order_id) in mailer.sent
+
+
+def test_empty_cart_and_bad_signature_are_rejected(client, make_user, auth_headers):
+    headers = auth_headers(make_user())
+    assert client.post("/payments/create-order", headers=headers).status_code == 400
+    verify = {"razorpay_order_id": "order_x", "razorpay_payment_id": "pay_x", "razorpay_signature": "forged"}
+    assert client.post("/payments/verify", json=verify, headers=headers).status_code == 400
+
+
+def test_repeated_verify_counts_the_order_once(client, session, paid_order, make_user, auth_headers):
+    user, _, verify = paid_order
+    assert client.post("/payments/verify", json=verify, headers=auth_headers(user)).status_code == 200
+
+    # Requests only buffer the increments; the flusher writes them
+    assert session.exec(select(SalesRollup)).all() == []
+    assert rollup_buffer.flush(session) > 0
+    admin = auth_headers(make_user(superuser=True))
+    report = client.get("/analytics/sales", headers=admin).json()
+    assert report["orders_created"] == 1
+    assert report["orders_paid"] == 1
+    assert report["revenue"] == 50.0
+    assert report["units"] == 2
+
+
+def test_status_transitions(client, paid_order, make_user, auth_headers):
+    user, order_id, _ = paid_order
+    admin = auth_headers(make_user(superuser=True))
+    url = f"/payments/orders/{order_id}/status"
+
+    assert client.patch(url, json={"status": "shipped"}, headers=auth_headers(user)).status_code == 403
+    assert client.patch(url, json={"status": "pending"}, headers=admin).status_code == 409
+    response = client.patch(url, json={"status": "shipped"}, headers=admin)
+    assert response.json() == {"order_id": order_id, "status": "shipped", "previous": "paid"}
+    assert client.patch(url, json={"status": "cancelled"}, headers=admin).status_code == 409
+    assert client.patch(url, json={"status": "delivered"}, headers=admin).status_code == 200
+
+
+def test_export_has_one_row_per_item(client, paid_order, make_user, auth_headers):
+    _, order_id, verify = paid_order
+    admin = auth_headers(make_user(superuser=True))
+    response = client.get("/payments/orders/export", params={"start": "2000-01-01T00:00:00Z"}, headers=admin)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [(int(r["order_id"]), r["status"], r["quantity"]) for r in rows] == [(order_id, "paid", "2")]
+    assert rows[0]["razorpay_payment_id"] == verify["razorpay_payment_id"]
+
+
+def test_replayed_verify_does_not_revive_cancelled_order(client, session, mailer, paid_order, make_user, auth_headers):
+    user, order_id, verify = paid_order
+    admin = auth_headers(make_user(superuser=True))
+    assert client.patch(f"/payments/orders/{order_id}/status", json={"status": "cancelled"}, headers=admin).status_code == 200
+
+    def report():
+        # The window ends "now", so compare everything but its bounds
+        rollup_buffer.flush(session)
+        body = client.get("/analytics/sales", headers=admin).json()
+        return {key: value for key, value in body.items() if key not in ("start", "end")}
+
+    before = report()
+    sent = len(mailer.sent)
+
+    assert client.post("/payments/verify", json=verify, headers=auth_headers(user)).status_code == 200
+    orders = client.get("/payments/orders/me", headers=auth_headers(user)).json()
+    assert [(o["id"], o["status"]) for o in orders] == [(order_id, "cancelled")]
+    assert report() == before
+    assert len(mailer.sent) == sent
+
+
+def test_cancelling_paid_order_takes_it_out_of_rollups(client, session, razorpay, make_user, make_product, auth_headers):
+    user = make_user()
+    headers = auth_headers(user)
+    admin = auth_headers(make_user(superuser=True))
+    product = make_product(price=25.0)
+    client.post("/cart/items", json={"variant_id": product.variants[0].id, "quantity": 2}, headers=headers)
+    created = client.post("/payments/create-order", headers=headers).json()
+
+    def report():
+        rollup_buffer.flush(session)
+        body = client.get("/analytics/sales", headers=admin).json()
+        return {key: value for key, value in body.items() if key not in ("start", "end")}
+
+    before = report()
+    verify = {
+        "razorpay_order_id": created["id"],
+        "razorpay_payment_id": "pay_1",
+        "razorpay_signature": razorpay.sign(created["id"], "pay_1"),
+    }
+    assert client.post("/payments/verify", json=verify, headers=headers).status_code == 200
+    assert report()["orders_paid"] == 1
+    url = f"/payments/orders/{created['db_order_id']}/status"
+    assert client.patch(url, json={"status": "cancelled"}, headers=admin).status_code == 200
+
+    assert report() == before
+    session.refresh(product)
+    assert product.popularity == 0
+    # The incremental numbers agree with a rebuild from the orders
+    rebuild_popularity(session)
+    session.refresh(product)
+    assert product.popularity == 0
+
+
+def test_replayed_verify_leaves_new_cart_alone(client, paid_order, make_product, auth_headers):
+    user, _, verify = paid_order
+    headers = auth_headers(user)
+    client.post("/cart/items", json={"variant_id": make_product().variants[0].id, "quantity": 1}, headers=headers)
+
+    assert client.post("/payments/verify", json=verify, headers=headers).status_code == 200
+    assert len(client.get("/cart", headers=headers).json()["items"]) == 1
+
+
+def test_verify_of_another_users_order_is_rejected(client, mailer, paid_order, make_user, make_product, auth_headers):
+    _, _, verify = paid_order
+    other = make_user()
+    headers = auth_headers(other)
+    client.post("/cart/items", json={"variant_id": make_product().variants[0].id, "quantity": 1}, headers=headers)
+    sent = len(mailer.sent)
+
+    assert client.post("/payments/verify", json=verify, headers=headers).status_code == 404
+    assert len(client.get("/cart", headers=headers).json()["items"]) == 1
+    assert len(mailer.sent) == sent
@@ -0,0 +1,149 @@
+from app.api import products
+from app.services.cache import category_cache, invalidate_categories
+from app.services.facets import FacetFilters, facet_index
+
+
+def test_product_detail_and_missing(client, make_product):
+    product = make_product(title="Silk wrap dress")
+    response = client.get(f"/products/{product.id}")
+    assert response.status_code == 200
+    assert response.json()["title"] == "Silk wrap dress"
+    assert [v["size"] for v in response.json()["variants"]] == ["S", "M"]
+    assert client.get("/products/999999").status_code == 404
+
+
+def test_listing_filters_and_facets(client, make_product):
+    make_product(brand="Kora", category="tops", stock=0)
+    make_product(brand="Kora", category="tops")
+    make_product(brand="Linea", category="skirts")
+
+    body = client.get("/products", params={"category": "tops"}).json()
+    assert body["total"] == 2
+    assert body["facets"]["brand"] == {"Kora": 2}
+    assert body["facets"]["in_stock"] == 1
+
+    in_stock = client.get("/products", params={"category": "tops", "in_stock": True}).json()
+    assert [item["in_stock"] for item in in_stock["items"]] == [True]
+
+
+def test_sorted_cursor_pagination_visits_every_product_once(client, make_product):
+    prices = [30.0, 10.0, 20.0, 10.0, 40.0, 20.0, 10.0]
+    for price in prices:
+        make_product(price=price, category="denim")
+
+    for sort, expected in (("price_asc", sorted(prices)), ("price_desc", sorted(prices, reverse=True))):
+        seen, cursor = [], None
+        while True:
+            params = {"category": "denim", "sort": sort, "limit": 3}
+            if cursor:
+                params["cursor"] = cursor
+            body = client.get("/products", params=params).json()
+            seen += body["items"]
+            cursor = body["next_cursor"]
+            if cursor is None:
+                break
+        assert [item["price"] for item in seen] == expected
+        assert len({item["id"] for item in seen}) == len(prices)
+
+
+def test_cursor_from_another_sort_is_rejected(client, make_product):
+    for _ in range(3):
+        make_product()
+    cursor = client.get("/products", params={"sort": "newest", "limit": 1}).json()["next_cursor"]
+    assert client.get("/products", params={"sort": "price_asc", "cursor": cursor}).status_code == 400
+
+
+def test_cursor_values_of_the_wrong_type_are_rejected(client):
+    for sort, value, product_id in (("price_asc", "x", 1), ("popular", True, 1), ("popular", float("nan"), 1), ("price_desc", 10.0, False)):
+        cursor = products.encode_cursor(sort, value, product_id)
+        assert client.get("/products", params={"sort": sort, "cursor": cursor}).status_code == 400, (sort, value)
+
+
+def test_categories_include_counts(client, make_product):
+    make_product(category="knitwear")
+    make_product(category="knitwear", stock=0)
+    categories = {c["slug"]: c for c in client.get("/categories").json()}
+    assert categories["knitwear"]["product_count"] == 2
+    assert categories["knitwear"]["in_stock_count"] == 1
+
+    # Served from cache until the catalog changes
+    make_product(category="knitwear")
+    categories = {c["slug"]: c for c in client.get("/categories").json()}
+    assert categories["knitwear"]["product_count"] == 3
+
+
+
+def test_categories_computed_during_a_change_are_not_cached(client, make_product, monkeypatch):
+    make_product(category="knitwear")
+    load = products.load_category_counts
+
+    def load_then_change(session):
+        counts = load(session)
+        # A stock change commits and invalidates while the counts are computed
+        invalidate_categories()
+        return counts
+
+    monkeypatch.setattr(products, "load_category_counts", load_then_change)
+    assert client.get("/categories").status_code == 200
+    assert category_cache.get("all") is None
+
+def test_batch_reports_missing_ids(client, make_product):
+    product = make_product()
+    body = client.get("/products/batch", params={"ids": f"{product.id},999999"}).json()
+    assert [item["id"] for item in body["items"]] == [product.id]
+    assert body["missing"] == [999999]
+
+
+def test_suggest_matches_word_prefixes(client, make_product):
+    make_product(title="Pleated satin skirt", brand="Odette")
+    texts = [s["text"] for s in client.get("/products/suggest", params={"q": "sat"}).json()]
+    assert "Pleated satin skirt" in texts
+    assert client.get("/products/suggest", params={"q": "odet"}).json()[0]["type"] == "brand"
+
+
+def test_suggestions_rank_by_product_popularity(client, session, make_product):
+    make_product(title="Velvet blazer", brand="Odette")
+    popular = make_product(title="Velvet slip dress", brand="Odette")
+    popular.popularity = 3.0
+    session.add(popular)
+    session.commit()
+    texts = [s["text"] for s in client.get("/products/suggest", params={"q": "velv"}).json() if s["type"] == "product"]
+    assert texts == ["Velvet slip dress", "Velvet blazer"]
+
+
+def test_query_total_matches_items(client, make_product):
+    make_product(title="100% Silk camisole")
+    make_product(title="Silk_blend scarf")
+    make_product(title="Cotton tee")
+    for q, expected in (("SILK", 2), ("0% s", 1), ("_", 1), ("%", 1)):
+        body = client.get("/products", params={"q": q}).json()
+        assert body["total"] == len(body["items"]) == expected, q
+
+
+def test_facet_counts_refresh_after_catalog_change(client, make_product):
+    make_product(brand="Kora", category="coats")
+    assert client.get("/products", params={"category": "coats"}).json()["facets"]["brand"] == {"Kora": 1}
+    make_product(brand="Kora", category="coats")
+    make_product(brand="Linea", category="coats")
+    body = client.get("/products", params={"category": "coats"}).json()
+    assert body["total"] == 3
+    assert body["facets"]["brand"] == {"Kora": 2, "Linea": 1}
+
+
+def test_facet_refresher_swaps_in_the_next_snapshot(session, make_product, monkeypatch):
+    for _ in range(5):
+        make_product()
+    make_product(brand="Kora", category="coats")
+    filters = FacetFilters(category="coats")
+    assert facet_index.search(session, filters).counts["brand"] == {"Kora": 1}
+
+    # With the refresher running, searches keep using the published snapshot until it swaps in the next
+    monkeypatch.setattr(facet_index, "_refresher", object())
+    previous = facet_index._snapshot
+    make_product(brand="Linea", category="coats")
+    assert facet_index.search(session, filters).counts["brand"] == {"Kora": 1}
+    facet_index.refresh(session)
+    assert facet_index.search(session, filters).counts["brand"] == {"Kora": 1, "Linea": 1}
+    # Sets the change didn't touch are shared, and the old snapshot was left as it was
+    assert facet_index._snapshot.postings["brand"]["Aurelle"] is previous.postings["brand"]["Aurelle"]
+    assert previous.search(filters).counts["brand"] == {"Kora": 1}
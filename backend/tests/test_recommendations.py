@@ -0,0 +1,18 @@
+from app.services import recommendations
+from app.services.cache import bus
+from app.services.invalidation import InMemoryBus
+from app.services.recommendations import build_related, related_index
+
+
+def test_build_reloads_the_index_in_every_worker(session, monkeypatch):
+    related_index.ensure(session)
+    assert related_index._loaded_at is not None
+
+    # Build in "another process" (e.g. scripts/build_related.py) sharing the bus with this worker
+    other_worker = InMemoryBus(bus.hub)
+    monkeypatch.setattr(recommendations, "bus", other_worker)
+    try:
+        build_related(session)
+    finally:
+        bus.hub.remove(other_worker)
+    assert related_index._loaded_at is None
@@ -0,0 +1,31 @@
+import gzip
+
+from app.compression import compress
+from app.responses import CachedPayload, _recompressor
+
+
+def wait_for_recompression():
+    # One worker: once this no-op has run, every earlier job has too
+    _recompressor.submit(lambda: None).result()
+
+
+def test_cached_body_is_compressed_cheaply_then_upgraded():
+    payload = CachedPayload({"items": [{"id": i, "title": f"Product {i}"} for i in range(200)]})
+    identity = payload.body()
+
+    first = payload.body("gzip")
+    assert first == compress(identity, "gzip")
+    wait_for_recompression()
+    upgraded = payload.body("gzip")
+    assert upgraded == compress(identity, "gzip", cached=True)
+    assert gzip.decompress(upgraded) == identity
+
+
+def test_detail_served_compressed_from_cache(client, make_product):
+    product = make_product(title="Linen shirt " * 100)
+    headers = {"Accept-Encoding": "gzip"}
+    first = client.get(f"/products/{product.id}", headers=headers)
+    wait_for_recompression()
+    second = client.get(f"/products/{product.id}", headers=headers)
+    assert first.headers["Content-Encoding"] == second.headers["Content-Encoding"] == "gzip"
+    assert first.json() == second.json()
@@ -0,0 +1,20 @@
+def test_add_list_and_remove(client, make_user, make_product, auth_headers):
+    headers = auth_headers(make_user())
+    first, second = make_product(), make_product()
+
+    for product in (first, second, first):
+        response = client.put(f"/wishlist/items/{product.id}", headers=headers)
+        assert response.json() == {"product_id": product.id, "in_wishlist": True}
+
+    page = client.get("/wishlist", headers=headers).json()
+    assert page["total"] == 2
+    assert [item["id"] for item in page["items"]] == [second.id, first.id]
+
+    client.delete(f"/wishlist/items/{first.id}", headers=headers)
+    contains = client.get("/wishlist/contains", params={"ids": f"{first.id},{second.id}"}, headers=headers)
+    assert contains.json() == {"product_ids": [second.id]}
+
+
+def test_unknown_product_and_anonymous_access(client, make_user, auth_headers):
+    assert client.put("/wishlist/items/999999", headers=auth_headers(make_user())).status_code == 404
+    assert client.get("/wishlist").status_code == 401